@@ -0,0 +1,27 @@
+# Generated by Django 5.2.12 on 2026-10-18 22:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_no_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=60)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('unidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versoes_dados', to='core.no')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('escopo', 'unidade'), name='uq_versao_dados_escopo_unidade')],
+            },
+        ),
+    ]
@@ -69,3 +69,20 @@ class Policy(models.Model):
 
     def __str__(self):
         return f"Policy for {self.user_profile.user.username}"
+
+
+class VersaoDados(models.Model):
+    """Contador de versao por (escopo, unidade) usado para invalidar caches derivados."""
+
+    escopo = models.CharField(max_length=60)
+    unidade = models.ForeignKey(No, on_delete=models.CASCADE, related_name='versoes_dados')
+    versao = models.PositiveBigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['escopo', 'unidade'], name='uq_versao_dados_escopo_unidade'),
+        ]
+
+    def __str__(self):
+        return f"{self.escopo} (unidade={self.unidade_id}) v{self.versao}"
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
+from calendar import monthrange
 from datetime import date, timedelta
 from typing import List
 
 from django.conf import settings
-from django.db.models import Count, Sum, Q, IntegerField, Value, Exists, OuterRef
+from django.db.models import Count, F, Sum, Q, IntegerField, Value, Exists, OuterRef
 from django.db.models.functions import Coalesce, TruncMonth, TruncWeek, ExtractYear, ExtractMonth
 from django.utils import timezone
 
 from atividades.models import Area, Atividade
-from metas.models import Meta, MetaAlocacao, ProgressoMeta
-from plantao.models import SemanaServidor
+from descanso.services import capacidade
+from metas.models import Meta, MetaAlocacao, ProgressoMeta, ProgressoMetaAgregado
+from plantao.models import PlantaoDia
 from programar.models import ProgramacaoItem, ProgramacaoItemServidor
 from servidores.models import Servidor
 
@@ -191,6 +193,14 @@ def get_dashboard_kpis(user, unidade_ids=None) -> dict:
     servidores_qs = _filter_by_unidades(Servidor.objects.all(), unidade_ids, "unidade_id")
     servidores_ativos = servidores_qs.filter(ativo=True).count()
 
+    # capacidade do restante do mes: dias uteis livres de descanso, menos folgas de plantao
+    fim_mes = hoje.replace(day=monthrange(hoje.year, hoje.month)[1])
+    if unidade_ids is None:
+        unidade_ids_capacidade = servidores_qs.filter(ativo=True).order_by().values_list("unidade_id", flat=True)
+    else:
+        unidade_ids_capacidade = unidade_ids
+    resumo_capacidade = capacidade(unidade_ids_capacidade, hoje, fim_mes)
+
     percentual_concluidas = 0.0
     if total_metas:
         percentual_concluidas = round((metas_concluidas / total_metas) * 100, 2)
@@ -200,6 +210,8 @@ def get_dashboard_kpis(user, unidade_ids=None) -> dict:
         "percentual_metas_concluidas": percentual_concluidas,
         "atividades_concluidas_hoje": atividades_concluidas_hoje,
         "servidores_ativos": servidores_ativos,
+        "pessoa_dias_restantes_mes": resumo_capacidade.pessoa_dias,
+        "capacidade_liquida_mes": resumo_capacidade.capacidade_liquida,
     }
 
 
@@ -296,6 +308,13 @@ def get_atividades_por_area(
     }
 
 
+def _is_whole_months(start_date: date, end_date: date | None) -> bool:
+    """Intervalo cobre meses inteiros e pode ser lido dos baldes de ProgressoMetaAgregado."""
+    if start_date.day != 1:
+        return False
+    return end_date is None or end_date.day == monthrange(end_date.year, end_date.month)[1]
+
+
 def get_progresso_mensal(
     user,
     *,
@@ -314,14 +333,30 @@ def get_progresso_mensal(
 
         if is_current_month:
             weeks = _week_sequence_for_range(start_date, end_date)
-            qs = (
-                _filter_by_unidades(ProgressoMeta.objects.all(), unidade_ids, "alocacao__unidade_id")
-                .filter(data__range=(start_date, end_date))
-                .annotate(semana_inicio=TruncWeek("data"))
-                .values("semana_inicio")
-                .annotate(total=Coalesce(Sum("quantidade"), Value(0), output_field=IntegerField()))
-                .order_by("semana_inicio")
-            )
+            if _is_whole_months(start_date, end_date):
+                # Baldes semanais ja recortados ao mes (ProgressoMetaAgregado).
+                qs = (
+                    _filter_by_unidades(
+                        ProgressoMetaAgregado.objects.filter(
+                            periodo=ProgressoMetaAgregado.PERIODO_SEMANA,
+                            mes=start_date,
+                        ),
+                        unidade_ids,
+                        "unidade_id",
+                    )
+                    .values(semana_inicio=F("inicio"))
+                    .annotate(total=Coalesce(Sum("total"), Value(0), output_field=IntegerField()))
+                    .order_by("semana_inicio")
+                )
+            else:
+                qs = (
+                    _filter_by_unidades(ProgressoMeta.objects.all(), unidade_ids, "alocacao__unidade_id")
+                    .filter(data__range=(start_date, end_date))
+                    .annotate(semana_inicio=TruncWeek("data"))
+                    .values("semana_inicio")
+                    .annotate(total=Coalesce(Sum("quantidade"), Value(0), output_field=IntegerField()))
+                    .order_by("semana_inicio")
+                )
 
             week_map = {}
             for item in qs:
@@ -355,16 +390,33 @@ def get_progresso_mensal(
         months = _month_sequence()
         start_date = months[0]
 
-    qs = (
-        _filter_by_unidades(ProgressoMeta.objects.all(), unidade_ids, "alocacao__unidade_id")
-        .filter(data__gte=start_date)
-        .annotate(mes=TruncMonth("data"))
-        .values("mes")
-        .annotate(total=Coalesce(Sum("quantidade"), Value(0), output_field=IntegerField()))
-        .order_by("mes")
-    )
-    if start_date and end_date:
-        qs = qs.filter(data__range=(start_date, end_date))
+    if _is_whole_months(start_date, end_date):
+        qs = (
+            _filter_by_unidades(
+                ProgressoMetaAgregado.objects.filter(
+                    periodo=ProgressoMetaAgregado.PERIODO_MES,
+                    mes__gte=start_date,
+                ),
+                unidade_ids,
+                "unidade_id",
+            )
+            .values("mes")
+            .annotate(total=Coalesce(Sum("total"), Value(0), output_field=IntegerField()))
+            .order_by("mes")
+        )
+        if end_date:
+            qs = qs.filter(mes__lte=end_date)
+    else:
+        qs = (
+            _filter_by_unidades(ProgressoMeta.objects.all(), unidade_ids, "alocacao__unidade_id")
+            .filter(data__gte=start_date)
+            .annotate(mes=TruncMonth("data"))
+            .values("mes")
+            .annotate(total=Coalesce(Sum("quantidade"), Value(0), output_field=IntegerField()))
+            .order_by("mes")
+        )
+        if start_date and end_date:
+            qs = qs.filter(data__range=(start_date, end_date))
 
     mapped = {}
     for item in qs:
@@ -569,20 +621,21 @@ def get_plantao_heatmap(
         weeks = _week_sequence()
         start_date = weeks[0]
 
+    # Escala materializada por dia: conta os plantonistas escalados em cada semana.
     qs = (
         _filter_by_unidades(
-            SemanaServidor.objects.select_related("semana", "servidor").filter(servidor__ativo=True),
+            PlantaoDia.objects.filter(servidor__ativo=True),
             unidade_ids,
             "servidor__unidade_id",
         )
-        .filter(semana__inicio__gte=start_date)
-        .annotate(semana_inicio=TruncWeek("semana__inicio"))
+        .filter(data__gte=start_date)
+        .annotate(semana_inicio=TruncWeek("data"))
         .values("semana_inicio")
-        .annotate(total=Count("id"))
+        .annotate(total=Count("item_id", distinct=True))
         .order_by("semana_inicio")
     )
     if start_date and end_date:
-        qs = qs.filter(semana__inicio__range=(start_date, end_date))
+        qs = qs.filter(data__range=(start_date, end_date))
 
     week_map = {
         item["semana_inicio"]: item["total"]
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Any, Callable, Iterable
+
+from django.core.cache import cache
+from django.db.models import F
+
+from core.models import VersaoDados
+
+ESCOPO_PROGRAMACAO = "programacao"
+ESCOPO_DESCANSO = "descanso"
+ESCOPO_FERIADOS = "feriados"
+# Nomes e situacao de servidores, veiculos, metas e atividades exibidos nos relatorios.
+ESCOPO_CADASTROS = "cadastros"
+# Metas, alocacoes e progresso registrados (listas de metas disponiveis por unidade).
+ESCOPO_METAS = "metas"
+
+VERSAO_CACHE_TTL = 60 * 30
+# Acima disso a chave usa a versao da unidade inteira em vez de uma por dia.
+ESCOPOS_DIA_MAX = 62
+
+
+def escopo_dia(escopo: str, data_ref: date) -> str:
+    return f"{escopo}:{data_ref.isoformat()}"
+
+
+def escopos_periodo(escopo: str, data_inicial: date, data_final: date) -> list[str]:
+    """Escopos por dia do periodo; em periodos longos, o escopo agregado da unidade."""
+    if data_final < data_inicial or (data_final - data_inicial).days >= ESCOPOS_DIA_MAX:
+        return [escopo]
+    total_dias = (data_final - data_inicial).days + 1
+    return [escopo_dia(escopo, data_inicial + timedelta(days=offset)) for offset in range(total_dias)]
+
+
+def versoes_dados(unidade_id: int | None, escopos: Iterable[str]) -> dict[str, int]:
+    """Versao atual de cada escopo da unidade (0 quando nunca houve escrita), em uma consulta."""
+    chaves = list(dict.fromkeys(escopos))
+    versoes = {escopo: 0 for escopo in chaves}
+    if not unidade_id or not chaves:
+        return versoes
+    for escopo, versao in VersaoDados.objects.filter(
+        unidade_id=unidade_id,
+        escopo__in=chaves,
+    ).values_list("escopo", "versao"):
+        versoes[escopo] = int(versao or 0)
+    return versoes
+
+
+def versao_dados(unidade_id: int | None, escopo: str) -> int:
+    return versoes_dados(unidade_id, [escopo])[escopo]
+
+
+def versoes_dados_unidades(unidade_ids: Iterable[int | None], escopo: str) -> dict[int, int]:
+    """Versao atual do escopo em cada unidade (0 quando nunca houve escrita), em uma consulta."""
+    ids = {int(unidade_id) for unidade_id in unidade_ids if unidade_id}
+    versoes = {unidade_id: 0 for unidade_id in ids}
+    if not ids:
+        return versoes
+    for unidade_id, versao in VersaoDados.objects.filter(unidade_id__in=ids, escopo=escopo).values_list(
+        "unidade_id", "versao"
+    ):
+        versoes[unidade_id] = int(versao or 0)
+    return versoes
+
+
+def incrementar_versao_dados(unidade_id: int | None, escopo: str, *, datas: Iterable[date] = ()) -> None:
+    """
+    Incrementa a versao do escopo da unidade e, quando informadas, das datas
+    afetadas (escopo:AAAA-MM-DD). Deve ser chamada na mesma transacao da escrita.
+    """
+    if not unidade_id:
+        return
+    chaves = [escopo] + [escopo_dia(escopo, data_ref) for data_ref in dict.fromkeys(datas) if data_ref]
+    qs = VersaoDados.objects.filter(unidade_id=unidade_id, escopo__in=chaves)
+    existentes = set(qs.values_list("escopo", flat=True))
+    faltantes = [
+        VersaoDados(unidade_id=unidade_id, escopo=chave, versao=0)
+        for chave in chaves
+        if chave not in existentes
+    ]
+    if faltantes:
+        VersaoDados.objects.bulk_create(faltantes, ignore_conflicts=True)
+    qs.update(versao=F("versao") + 1)
+
+
+def _cache_key(nome: str, payload: dict[str, Any]) -> str:
+    digest = hashlib.sha1(
+        json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    ).hexdigest()
+    return f"versao:v1:{nome}:{digest}"
+
+
+def cached_por_versao(
+    nome: str,
+    builder: Callable[[], Any],
+    *,
+    unidade_id: int | None,
+    escopos: Iterable[str],
+    extra: dict[str, Any] | None = None,
+    ttl: int = VERSAO_CACHE_TTL,
+):
+    """
+    Memoiza ``builder()`` por (nome, unidade, versoes dos escopos, extra).
+    Qualquer escrita que incremente um dos escopos gera uma nova chave.
+    """
+    if not unidade_id:
+        return builder()
+    versoes = versoes_dados(unidade_id, escopos)
+    cache_key = _cache_key(
+        nome,
+        {"unidade": int(unidade_id), "versoes": versoes, "extra": extra or {}},
+    )
+    cached_value = cache.get(cache_key)
+    if cached_value is not None:
+        return cached_value
+    value = builder()
+    cache.set(cache_key, value, ttl)
+    return value
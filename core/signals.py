@@ -1,9 +1,108 @@
 # app/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import UserProfile, Policy
+
+from atividades.models import Atividade
+from descanso.models import Descanso, Feriado, FeriadoCadastro
+from metas.models import Meta, MetaAlocacao, ProgressoMeta
+from servidores.models import Servidor
+from veiculos.models import Veiculo
+
+from .models import No, UserProfile, Policy
+from .services.versoes import (
+    ESCOPO_CADASTROS,
+    ESCOPO_DESCANSO,
+    ESCOPO_FERIADOS,
+    ESCOPO_METAS,
+    incrementar_versao_dados,
+)
 
 @receiver(post_save, sender=UserProfile)
 def create_policy_for_user_profile(sender, instance, created, **kwargs):
     if created and not hasattr(instance, 'policy'):
-        Policy.objects.create(user_profile=instance)
\ No newline at end of file
+        Policy.objects.create(user_profile=instance)
+
+
+# ---------------------------------------------------------------------------
+# Versao dos dados exibidos nos relatorios (ver core.services.versoes)
+# ---------------------------------------------------------------------------
+def _exclusao_da_unidade(kwargs) -> bool:
+    # Na exclusao em cascata de uma unidade nao ha o que versionar (e a linha de versao iria junto).
+    return isinstance(kwargs.get("origin"), No)
+
+
+def _unidades_das_metas(**filtros) -> set[int]:
+    unidades = set(Meta.objects.filter(**filtros).values_list("unidade_criadora_id", flat=True))
+    unidades.update(
+        MetaAlocacao.objects.filter(**{f"meta__{campo}": valor for campo, valor in filtros.items()})
+        .values_list("unidade_id", flat=True)
+    )
+    return {int(unidade_id) for unidade_id in unidades if unidade_id}
+
+
+@receiver([post_save, post_delete], sender=Servidor)
+@receiver([post_save, post_delete], sender=Veiculo)
+def versao_cadastro_da_unidade(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    incrementar_versao_dados(instance.unidade_id, ESCOPO_CADASTROS)
+
+
+@receiver(post_save, sender=Meta)
+def versao_cadastro_da_meta(sender, instance, **kwargs):
+    for unidade_id in _unidades_das_metas(pk=instance.pk):
+        incrementar_versao_dados(unidade_id, ESCOPO_CADASTROS)
+        incrementar_versao_dados(unidade_id, ESCOPO_METAS)
+
+
+@receiver(post_delete, sender=Meta)
+def versao_metas_exclusao_da_meta(sender, instance, **kwargs):
+    # As alocacoes removidas em cascata versionam as unidades que receberam a meta.
+    if _exclusao_da_unidade(kwargs):
+        return
+    incrementar_versao_dados(instance.unidade_criadora_id, ESCOPO_METAS)
+
+
+@receiver(post_save, sender=Atividade)
+def versao_cadastro_da_atividade(sender, instance, **kwargs):
+    for unidade_id in _unidades_das_metas(atividade_id=instance.pk):
+        incrementar_versao_dados(unidade_id, ESCOPO_CADASTROS)
+        incrementar_versao_dados(unidade_id, ESCOPO_METAS)
+
+
+@receiver([post_save, post_delete], sender=MetaAlocacao)
+def versao_metas_da_alocacao(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    incrementar_versao_dados(instance.unidade_id, ESCOPO_METAS)
+
+
+@receiver([post_save, post_delete], sender=ProgressoMeta)
+def versao_metas_do_progresso(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    unidade_id = MetaAlocacao.objects.filter(pk=instance.alocacao_id).values_list("unidade_id", flat=True).first()
+    incrementar_versao_dados(unidade_id, ESCOPO_METAS)
+
+
+@receiver([post_save, post_delete], sender=Descanso)
+def versao_descanso(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    unidade_id = Servidor.objects.filter(pk=instance.servidor_id).values_list("unidade_id", flat=True).first()
+    incrementar_versao_dados(unidade_id, ESCOPO_DESCANSO)
+
+
+@receiver([post_save, post_delete], sender=FeriadoCadastro)
+def versao_feriados_cadastro(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    incrementar_versao_dados(instance.unidade_id, ESCOPO_FERIADOS)
+
+
+@receiver([post_save, post_delete], sender=Feriado)
+def versao_feriados(sender, instance, **kwargs):
+    if _exclusao_da_unidade(kwargs):
+        return
+    unidade_id = FeriadoCadastro.objects.filter(pk=instance.cadastro_id).values_list("unidade_id", flat=True).first()
+    incrementar_versao_dados(unidade_id, ESCOPO_FERIADOS)
@@ -14,7 +14,7 @@ from core.services.dashboard_queries import (
     get_progresso_mensal,
     get_programacoes_status_mensal,
 )
-from metas.models import Meta, MetaAlocacao, ProgressoMeta
+from metas.models import Meta, MetaAlocacao, ProgressoMeta, ProgressoMetaAgregado
 from programar.models import Programacao, ProgramacaoItem
 from servidores.models import Servidor
 from atividades.models import Area, Atividade
@@ -396,3 +396,55 @@ class DashboardProgressoMensalTest(TestCase):
         self.assertEqual(result["datasets"][0]["label"], "Progresso acumulado")
         self.assertEqual(result["labels"], ["Jan/2026"])
         self.assertEqual(result["datasets"][0]["data"], [8])
+
+    def _baldes(self, periodo):
+        return list(
+            ProgressoMetaAgregado.objects.filter(unidade=self.root, meta=self.meta, periodo=periodo)
+            .order_by("inicio")
+            .values_list("inicio", "total")
+        )
+
+    @patch("core.services.dashboard_queries.timezone.localdate", return_value=date(2026, 2, 20))
+    def test_rollup_acompanha_edicao_e_exclusao_de_progresso(self, _mock_today):
+        progresso = ProgressoMeta.objects.create(
+            alocacao=self.alocacao,
+            data=date(2026, 1, 30),
+            quantidade=3,
+            registrado_por=self.user,
+        )
+        ProgressoMeta.objects.create(
+            alocacao=self.alocacao,
+            data=date(2026, 2, 1),
+            quantidade=2,
+            registrado_por=self.user,
+        )
+        semana = ProgressoMetaAgregado.PERIODO_SEMANA
+        mes = ProgressoMetaAgregado.PERIODO_MES
+        # A semana de 26/01 fica dividida entre janeiro e fevereiro.
+        self.assertEqual(self._baldes(semana), [(date(2026, 1, 26), 3), (date(2026, 1, 26), 2)])
+        self.assertEqual(self._baldes(mes), [(date(2026, 1, 1), 3), (date(2026, 2, 1), 2)])
+
+        progresso.data = date(2026, 2, 10)
+        progresso.quantidade = 5
+        progresso.save()
+        self.assertEqual(self._baldes(semana), [(date(2026, 1, 26), 2), (date(2026, 2, 9), 5)])
+        self.assertEqual(self._baldes(mes), [(date(2026, 2, 1), 7)])
+
+        with self.assertNumQueries(1):
+            result = get_progresso_mensal(
+                self.user,
+                unidade_ids=[self.root.id],
+                start_date=date(2026, 2, 1),
+                end_date=date(2026, 2, 28),
+            )
+        self.assertEqual(result["datasets"][0]["data"], [2, 0, 5, 0, 0])
+
+        progresso.delete()
+        self.assertEqual(self._baldes(mes), [(date(2026, 2, 1), 2)])
+        result = get_progresso_mensal(
+            self.user,
+            unidade_ids=[self.root.id],
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 2, 28),
+        )
+        self.assertEqual(result["datasets"][0]["data"], [0, 2])
@@ -0,0 +1,64 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.models import No, VersaoDados
+from core.services.versoes import (
+    ESCOPO_CADASTROS,
+    ESCOPO_DESCANSO,
+    ESCOPO_PROGRAMACAO,
+    cached_por_versao,
+    escopo_dia,
+    incrementar_versao_dados,
+    versoes_dados,
+)
+from descanso.models import Descanso
+from servidores.models import Servidor
+
+
+class VersaoDadosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.unidade = No.objects.create(nome="Unidade Versao", tipo="setor")
+
+    def test_incremento_atualiza_escopo_da_unidade_e_dos_dias(self):
+        dia = date(2026, 3, 10)
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO, datas=[dia, dia])
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO)
+
+        versoes = versoes_dados(self.unidade.id, [ESCOPO_PROGRAMACAO, escopo_dia(ESCOPO_PROGRAMACAO, dia)])
+        self.assertEqual(versoes, {ESCOPO_PROGRAMACAO: 2, "programacao:2026-03-10": 1})
+        self.assertEqual(VersaoDados.objects.filter(unidade=self.unidade).count(), 2)
+
+    def test_cache_renova_apenas_apos_incremento(self):
+        chamadas = []
+
+        def builder():
+            chamadas.append(1)
+            return len(chamadas)
+
+        kwargs = {"unidade_id": self.unidade.id, "escopos": [ESCOPO_PROGRAMACAO]}
+        self.assertEqual(cached_por_versao("teste", builder, **kwargs), 1)
+        self.assertEqual(cached_por_versao("teste", builder, **kwargs), 1)
+
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO)
+        self.assertEqual(cached_por_versao("teste", builder, **kwargs), 2)
+
+    def test_sinais_versionam_descansos_e_cadastros_da_unidade(self):
+        servidor = Servidor.objects.create(unidade=self.unidade, nome="Servidor Versao")
+        Descanso.objects.create(
+            servidor=servidor,
+            tipo=Descanso.Tipo.FERIAS,
+            data_inicio=date(2026, 3, 2),
+            data_fim=date(2026, 3, 6),
+        )
+
+        versoes = versoes_dados(self.unidade.id, [ESCOPO_CADASTROS, ESCOPO_DESCANSO])
+        self.assertEqual(versoes, {ESCOPO_CADASTROS: 1, ESCOPO_DESCANSO: 1})
+
+        outra = No.objects.create(nome="Outra unidade", tipo="setor")
+        Servidor.objects.create(unidade=outra, nome="Servidor removido")
+        VersaoDados.objects.all().delete()
+        outra.delete()
+        self.assertFalse(VersaoDados.objects.filter(unidade_id=outra.id).exists())
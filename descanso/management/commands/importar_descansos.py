@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import No
+from descanso.services import ImportacaoInvalida, importar_descansos, ler_planilha, validar_importacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa descansos de um CSV/XLSX (colunas: servidor_id, matricula ou servidor; tipo; "
+        "data_inicio; data_fim; observacoes opcional). Grava tudo ou nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do arquivo .csv ou .xlsx.")
+        parser.add_argument("--unidade", type=int, required=True, help="Unidade dos servidores do arquivo.")
+        parser.add_argument(
+            "--remover-vinculos",
+            action="store_true",
+            help="Remove os vinculos com programacoes no periodo dos descansos (padrao: apenas relata e nao grava).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Apenas valida o arquivo, sem gravar.")
+
+    def handle(self, *args, **options):
+        unidade_id = options["unidade"]
+        if not No.objects.filter(pk=unidade_id).exists():
+            raise CommandError(f"Unidade {unidade_id} nao encontrada.")
+
+        try:
+            with open(options["arquivo"], "rb") as arquivo:
+                linhas = ler_planilha(arquivo, options["arquivo"])
+        except OSError as exc:
+            raise CommandError(f"Nao foi possivel ler {options['arquivo']}: {exc}") from exc
+        except ImportacaoInvalida as exc:
+            raise CommandError(str(exc)) from exc
+
+        resultado = validar_importacao(linhas, unidade_id)
+        for linha, mensagem in resultado.erros:
+            self.stdout.write(f"linha {linha}: {mensagem}")
+        for linha, vinculo in resultado.conflitos_programacao:
+            self.stdout.write(
+                f"linha {linha}: programacao em {vinculo.item.programacao.data:%d/%m/%Y} (item {vinculo.item_id})"
+            )
+
+        if resultado.erros:
+            raise CommandError(f"{len(resultado.erros)} linha(s) com erro; nada foi gravado.")
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(resultado.validas)} descanso(s) validos (dry-run)."))
+            return
+        if resultado.conflitos_programacao and not options["remover_vinculos"]:
+            raise CommandError(
+                f"{len(resultado.conflitos_programacao)} vinculo(s) com programacoes no periodo; "
+                "use --remover-vinculos para remove-los. Nada foi gravado."
+            )
+
+        importar_descansos(resultado, unidade_id, remover_vinculos=options["remover_vinculos"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{resultado.criados} descanso(s) importado(s); {resultado.vinculos_removidos} vinculo(s) removido(s)."
+            )
+        )
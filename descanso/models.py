@@ -46,12 +46,16 @@ class Descanso(models.Model):
             raise ValidationError("A data final não pode ser anterior à data inicial.")
 
         # Validação de sobreposição de períodos para o mesmo servidor
-        qs = Descanso.objects.filter(servidor=self.servidor)
-        if self.pk:
-            qs = qs.exclude(pk=self.pk)
-        # Sobrepõe quando inicio <= fim_existente e fim >= inicio_existente
-        overlap = qs.filter(data_inicio__lte=self.data_fim, data_fim__gte=self.data_inicio).exists()
-        if overlap:
+        from .services.conflitos_service import ORIGEM_DESCANSO, carregar_conflitos
+
+        mapa = carregar_conflitos(
+            [self.servidor_id],
+            self.data_inicio,
+            self.data_fim,
+            origens=(ORIGEM_DESCANSO,),
+            excluir_descanso_id=self.pk,
+        )
+        if mapa.bloqueado(self.servidor_id, self.data_inicio, self.data_fim, origens=(ORIGEM_DESCANSO,)):
             raise ValidationError("Já existe um descanso cadastrado que sobrepõe este período para esse servidor.")
 
     @property
@@ -0,0 +1,79 @@
+from .capacidade_service import (
+    CapacidadeServidor,
+    ResumoCapacidade,
+    capacidade,
+    dias_uteis,
+    mascaras_dias_uteis,
+)
+from .conflitos_service import (
+    ORIGEM_DESCANSO,
+    ORIGEM_PLANTAO,
+    ORIGEM_PROGRAMACAO,
+    ORIGENS,
+    MapaConflitos,
+    Ocupacao,
+    carregar_conflitos,
+    remover_vinculos_programacao,
+)
+from .feriados_service import (
+    CalendarioFeriados,
+    calendario_feriados,
+    calendarios_feriados,
+    feriados_do_periodo,
+    invalidar_calendario_feriados,
+)
+from .importacao_service import (
+    ImportacaoInvalida,
+    LinhaDescanso,
+    ResultadoImportacao,
+    importar_descansos,
+    ler_planilha,
+    validar_importacao,
+)
+from .mapa_anual_service import (
+    DIAS_SEMANA,
+    bits_do_mes,
+    dias_do_mes,
+    facetas_descansos_ano,
+    fins_de_semana_do_ano,
+    mapa_descansos_ano,
+    mapa_feriados_ano,
+    periodo_do_mes,
+    pintar_periodo,
+)
+
+__all__ = [
+    "ORIGEM_DESCANSO",
+    "ORIGEM_PLANTAO",
+    "ORIGEM_PROGRAMACAO",
+    "ORIGENS",
+    "MapaConflitos",
+    "Ocupacao",
+    "carregar_conflitos",
+    "remover_vinculos_programacao",
+    "DIAS_SEMANA",
+    "bits_do_mes",
+    "dias_do_mes",
+    "facetas_descansos_ano",
+    "fins_de_semana_do_ano",
+    "mapa_descansos_ano",
+    "mapa_feriados_ano",
+    "periodo_do_mes",
+    "pintar_periodo",
+    "CalendarioFeriados",
+    "calendario_feriados",
+    "feriados_do_periodo",
+    "invalidar_calendario_feriados",
+    "ImportacaoInvalida",
+    "LinhaDescanso",
+    "ResultadoImportacao",
+    "importar_descansos",
+    "ler_planilha",
+    "validar_importacao",
+    "calendarios_feriados",
+    "CapacidadeServidor",
+    "ResumoCapacidade",
+    "capacidade",
+    "dias_uteis",
+    "mascaras_dias_uteis",
+]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable
+
+from servidores.models import Servidor
+
+from .conflitos_service import ORIGEM_DESCANSO, ORIGEM_PLANTAO, carregar_conflitos
+from .feriados_service import calendarios_feriados
+from .mapa_anual_service import fins_de_semana_do_ano
+
+
+@dataclass
+class CapacidadeServidor:
+    """
+    Dias de um servidor no periodo. ``plantao_nao_util`` sao os dias de
+    plantao em fim de semana ou feriado, que geram folga a compensar e por
+    isso saem da capacidade liquida.
+    """
+
+    servidor_id: int
+    nome: str
+    unidade_id: int
+    dias_uteis: int = 0
+    dias_descanso: int = 0
+    dias_disponiveis: int = 0
+    plantao_nao_util: int = 0
+    capacidade_liquida: int = 0
+
+
+@dataclass
+class ResumoCapacidade:
+    inicio: date
+    fim: date
+    dias_uteis: dict[int, int] = field(default_factory=dict)  # por unidade
+    servidores: list[CapacidadeServidor] = field(default_factory=list)
+
+    @property
+    def pessoa_dias(self) -> int:
+        return sum(s.dias_disponiveis for s in self.servidores)
+
+    @property
+    def capacidade_liquida(self) -> int:
+        return sum(s.capacidade_liquida for s in self.servidores)
+
+
+def _pintar(bits: int, inicio: date, fim: date, de: date, ate: date) -> int:
+    """Marca [de, ate] no bitset do periodo (bit 0 = ``inicio``), recortando a ele."""
+    de, ate = max(de, inicio), min(ate, fim)
+    if ate < de:
+        return bits
+    deslocamento = (de - inicio).days
+    return bits | (((1 << ((ate - de).days + 1)) - 1) << deslocamento)
+
+
+def _recorte_anual(inicio: date, fim: date, bits_por_ano) -> int:
+    """Compoe o bitset do periodo a partir de bitsets anuais (bit 0 = 1/jan)."""
+    bits = 0
+    for ano in range(inicio.year, fim.year + 1):
+        de, ate = max(inicio, date(ano, 1, 1)), min(fim, date(ano, 12, 31))
+        largura = (ate - de).days + 1
+        recorte = (bits_por_ano(ano) >> (de - date(ano, 1, 1)).days) & ((1 << largura) - 1)
+        bits |= recorte << (de - inicio).days
+    return bits
+
+
+def mascaras_dias_uteis(unidade_ids: Iterable[int], inicio: date, fim: date) -> dict[int, int]:
+    """
+    Bitset dos dias uteis do periodo (bit 0 = ``inicio``) por unidade: exclui
+    fins de semana e os feriados dos calendarios em cache da unidade.
+    """
+    ids = sorted({int(unidade_id) for unidade_id in unidade_ids if unidade_id})
+    if not ids or fim < inicio:
+        return {}
+    anos = range(inicio.year, fim.year + 1)
+    calendarios = calendarios_feriados(ids, anos)
+    fins_de_semana = _recorte_anual(inicio, fim, fins_de_semana_do_ano)
+    todos = (1 << ((fim - inicio).days + 1)) - 1
+    mascaras = {}
+    for unidade_id in ids:
+        feriados = _recorte_anual(inicio, fim, lambda ano: calendarios[(unidade_id, ano)].bits)
+        mascaras[unidade_id] = todos & ~fins_de_semana & ~feriados
+    return mascaras
+
+
+def dias_uteis(unidade_id: int, inicio: date, fim: date) -> int:
+    """Dias uteis da unidade em [inicio, fim]."""
+    return mascaras_dias_uteis([unidade_id], inicio, fim).get(int(unidade_id), 0).bit_count()
+
+
+def capacidade(
+    unidade_ids: Iterable[int],
+    inicio: date,
+    fim: date,
+    *,
+    compensar_plantao: bool = True,
+) -> ResumoCapacidade:
+    """
+    Dias uteis, pessoa-dias disponiveis e capacidade liquida dos servidores
+    ativos das unidades em [inicio, fim]. Uma consulta de servidores, uma de
+    descansos e uma de plantoes; feriados vem dos calendarios em cache. Cada
+    servidor custa operacoes sobre bitsets do tamanho do periodo.
+    """
+    resumo = ResumoCapacidade(inicio, fim)
+    ids = sorted({int(unidade_id) for unidade_id in unidade_ids if unidade_id})
+    if not ids or fim < inicio:
+        return resumo
+
+    mascaras = mascaras_dias_uteis(ids, inicio, fim)
+    resumo.dias_uteis = {unidade_id: mascara.bit_count() for unidade_id, mascara in mascaras.items()}
+    todos = (1 << ((fim - inicio).days + 1)) - 1
+
+    servidores = list(
+        Servidor.objects.filter(unidade_id__in=ids, ativo=True).order_by("nome", "id").values_list(
+            "id", "nome", "unidade_id"
+        )
+    )
+    mapa = carregar_conflitos(
+        [sid for sid, _, _ in servidores], inicio, fim, origens=(ORIGEM_DESCANSO, ORIGEM_PLANTAO)
+    )
+    ocupados: dict[tuple[int, str], int] = defaultdict(int)
+    for sid, _, _ in servidores:
+        for ocupacao in mapa.conflitos(sid, inicio, fim):
+            chave = (sid, ocupacao.origem)
+            ocupados[chave] = _pintar(ocupados[chave], inicio, fim, ocupacao.inicio, ocupacao.fim)
+
+    for sid, nome, unidade_id in servidores:
+        uteis = mascaras[unidade_id]
+        descanso = ocupados.get((sid, ORIGEM_DESCANSO), 0)
+        disponiveis = uteis & ~descanso
+        plantao_nao_util = ocupados.get((sid, ORIGEM_PLANTAO), 0) & (todos & ~uteis) & ~descanso
+        item = CapacidadeServidor(
+            servidor_id=sid,
+            nome=nome,
+            unidade_id=unidade_id,
+            dias_uteis=uteis.bit_count(),
+            dias_descanso=(uteis & descanso).bit_count(),
+            dias_disponiveis=disponiveis.bit_count(),
+            plantao_nao_util=plantao_nao_util.bit_count(),
+        )
+        folgas = item.plantao_nao_util if compensar_plantao else 0
+        item.capacidade_liquida = max(0, item.dias_disponiveis - folgas)
+        resumo.servidores.append(item)
+    return resumo
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable
+
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
+from descanso.models import Descanso
+from plantao.models import SemanaServidor
+from programar.models import ProgramacaoItemServidor
+
+ORIGEM_DESCANSO = "descanso"
+ORIGEM_PLANTAO = "plantao"
+ORIGEM_PROGRAMACAO = "programacao"
+ORIGENS = (ORIGEM_DESCANSO, ORIGEM_PLANTAO, ORIGEM_PROGRAMACAO)
+
+
+@dataclass(frozen=True)
+class Ocupacao:
+    """Periodo em que o servidor esta ocupado; ``obj`` e o registro de origem."""
+
+    servidor_id: int
+    inicio: date
+    fim: date
+    origem: str
+    obj: Any = None
+
+
+class _Intervalos:
+    """
+    Intervalos de um servidor/origem ordenados pelo inicio, com o maior fim
+    acumulado: como esse maximo nunca diminui, os candidatos que intersectam
+    [inicio, fim] ficam entre duas buscas binarias.
+    """
+
+    def __init__(self, ocupacoes: list[Ocupacao]):
+        self.ocupacoes = sorted(ocupacoes, key=lambda o: (o.inicio, o.fim))
+        self.inicios = [o.inicio for o in self.ocupacoes]
+        self.max_fins = []
+        maior = None
+        for o in self.ocupacoes:
+            maior = o.fim if maior is None or o.fim > maior else maior
+            self.max_fins.append(maior)
+
+    def sobrepostos(self, inicio: date, fim: date) -> list[Ocupacao]:
+        de = bisect_left(self.max_fins, inicio)
+        ate = bisect_right(self.inicios, fim)
+        return [o for o in self.ocupacoes[de:ate] if o.fim >= inicio]
+
+
+class MapaConflitos:
+    """
+    Ocupacoes (descansos, semanas de plantao e programacoes) de um lote de
+    servidores, carregadas uma vez; as consultas por servidor e periodo sao
+    resolvidas em memoria por busca binaria.
+    """
+
+    def __init__(self, ocupacoes: Iterable[Ocupacao] = ()):
+        brutos: dict[tuple[int, str], list[Ocupacao]] = defaultdict(list)
+        for ocupacao in ocupacoes:
+            brutos[(ocupacao.servidor_id, ocupacao.origem)].append(ocupacao)
+        self._indice = {chave: _Intervalos(lista) for chave, lista in brutos.items()}
+
+    def conflitos(
+        self,
+        servidor_id: int,
+        inicio: date,
+        fim: date | None = None,
+        *,
+        origens: Iterable[str] = ORIGENS,
+    ) -> list[Ocupacao]:
+        """Ocupacoes do servidor que intersectam [inicio, fim], pela ordem de inicio."""
+        fim = fim or inicio
+        origens = tuple(origens)
+        encontrados = []
+        for origem in origens:
+            intervalos = self._indice.get((servidor_id, origem))
+            if intervalos:
+                encontrados.extend(intervalos.sobrepostos(inicio, fim))
+        if len(origens) > 1:
+            encontrados.sort(key=lambda o: o.inicio)
+        return encontrados
+
+    def bloqueado(self, servidor_id: int, inicio: date, fim: date | None = None, **kwargs) -> bool:
+        return bool(self.conflitos(servidor_id, inicio, fim, **kwargs))
+
+    def sobreposicoes(self) -> list[tuple[Ocupacao, Ocupacao]]:
+        """
+        Pares de ocupacoes de origens diferentes que se sobrepoem para o mesmo
+        servidor, por varredura dos intervalos ordenados pelo inicio.
+        """
+        por_servidor: dict[int, list[Ocupacao]] = defaultdict(list)
+        for (servidor_id, _), intervalos in self._indice.items():
+            por_servidor[servidor_id].extend(intervalos.ocupacoes)
+
+        pares = []
+        for servidor_id in sorted(por_servidor):
+            ativos: list[Ocupacao] = []
+            for ocupacao in sorted(por_servidor[servidor_id], key=lambda o: (o.inicio, o.fim)):
+                ativos = [a for a in ativos if a.fim >= ocupacao.inicio]
+                pares.extend((a, ocupacao) for a in ativos if a.origem != ocupacao.origem)
+                ativos.append(ocupacao)
+        return pares
+
+
+def _descansos(ids, inicio, fim, unidade_id, excluir_descanso_id):
+    qs = (
+        Descanso.objects.filter(servidor_id__in=ids, data_inicio__lte=fim, data_fim__gte=inicio)
+        .select_related("servidor")
+        .order_by("data_inicio", "id")
+    )
+    if unidade_id:
+        qs = qs.filter(servidor__unidade_id=unidade_id)
+    if excluir_descanso_id:
+        qs = qs.exclude(pk=excluir_descanso_id)
+    for d in qs:
+        yield Ocupacao(d.servidor_id, d.data_inicio, d.data_fim, ORIGEM_DESCANSO, d)
+
+
+def _semanas_plantao(ids, inicio, fim, unidade_id):
+    qs = (
+        SemanaServidor.objects.filter(
+            servidor_id__in=ids,
+            semana__inicio__lte=fim,
+            semana__fim__gte=inicio,
+        )
+        .select_related("semana__plantao")
+        .order_by("semana__inicio", "id")
+    )
+    if unidade_id:
+        qs = qs.filter(semana__plantao__unidade_id=unidade_id)
+    for item in qs:
+        semana = item.semana
+        # mesmo recorte de dias_do_item: a semana limitada ao periodo do plantao
+        ini = max(semana.inicio, semana.plantao.inicio)
+        fim_item = min(semana.fim, semana.plantao.fim)
+        if ini <= fim_item:
+            yield Ocupacao(item.servidor_id, ini, fim_item, ORIGEM_PLANTAO, item)
+
+
+def _programacoes(ids, inicio, fim):
+    qs = (
+        ProgramacaoItemServidor.objects.select_related("item", "item__programacao", "item__meta")
+        .filter(
+            servidor_id__in=ids,
+            item__programacao__data__gte=inicio,
+            item__programacao__data__lte=fim,
+        )
+        .order_by("item__programacao__data", "item_id")
+    )
+    for vinculo in qs:
+        data = vinculo.item.programacao.data
+        yield Ocupacao(vinculo.servidor_id, data, data, ORIGEM_PROGRAMACAO, vinculo)
+
+
+def carregar_conflitos(
+    servidor_ids: Iterable[int | None],
+    inicio: date,
+    fim: date,
+    *,
+    origens: Iterable[str] = ORIGENS,
+    unidade_id: int | None = None,
+    excluir_descanso_id: int | None = None,
+) -> MapaConflitos:
+    """
+    Carrega, com uma consulta por origem, as ocupacoes dos servidores que
+    intersectam [inicio, fim]. ``unidade_id`` restringe descansos e plantoes
+    a unidade; programacoes sao consideradas em qualquer unidade.
+    """
+    ids = sorted({int(sid) for sid in servidor_ids if sid})
+    if not ids or not inicio or not fim or fim < inicio:
+        return MapaConflitos()
+
+    origens = set(origens)
+    ocupacoes: list[Ocupacao] = []
+    if ORIGEM_DESCANSO in origens:
+        ocupacoes.extend(_descansos(ids, inicio, fim, unidade_id, excluir_descanso_id))
+    if ORIGEM_PLANTAO in origens:
+        ocupacoes.extend(_semanas_plantao(ids, inicio, fim, unidade_id))
+    if ORIGEM_PROGRAMACAO in origens:
+        ocupacoes.extend(_programacoes(ids, inicio, fim))
+    return MapaConflitos(ocupacoes)
+
+
+def remover_vinculos_programacao(unidade_id: int, vinculos: Iterable[Any]) -> int:
+    """
+    Remove os vinculos (ProgramacaoItemServidor com item__programacao
+    carregado) e incrementa a versao de programacao dos dias afetados.
+    Devolve quantos vinculos foram removidos.
+    """
+    vinculos = list(vinculos)
+    ids = {vinculo.pk for vinculo in vinculos}
+    if not ids:
+        return 0
+    ProgramacaoItemServidor.objects.filter(pk__in=ids).delete()
+    incrementar_versao_dados(
+        unidade_id,
+        ESCOPO_PROGRAMACAO,
+        datas=[vinculo.item.programacao.data for vinculo in vinculos],
+    )
+    return len(ids)
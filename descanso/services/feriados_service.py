@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Iterable
+
+from core.services.versoes import ESCOPO_FERIADOS, versao_dados, versoes_dados_unidades
+from descanso.models import Feriado
+
+from .mapa_anual_service import pintar_periodo
+
+# Calendarios (unidade, ano) mantidos por processo; cada um guarda a versao de
+# feriados com que foi montado e e descartado quando a versao da unidade muda.
+CALENDARIOS_MAX = 256
+_calendarios: OrderedDict[tuple[int, int], tuple[int, "CalendarioFeriados"]] = OrderedDict()
+_lock = threading.Lock()
+
+
+class CalendarioFeriados:
+    """
+    Feriados de uma unidade em um ano, indexados por data. Os registros sao
+    dicts somente leitura: id, data, descricao, cadastro_id e cadastro.
+    """
+
+    def __init__(self, ano: int, feriados: list[dict[str, Any]]):
+        self.ano = ano
+        self._por_data: dict[date, list[dict[str, Any]]] = {}
+        self.bits = 0  # bitset do ano (bit 0 = 1/jan) com os dias de feriado
+        for feriado in sorted(feriados, key=lambda f: (f["data"], f["id"])):
+            self._por_data.setdefault(feriado["data"], []).append(feriado)
+            self.bits = pintar_periodo(self.bits, ano, feriado["data"], feriado["data"])
+
+    def is_feriado(self, dia: date, cadastro_id: int | None = None) -> bool:
+        return bool(self.do_dia(dia, cadastro_id))
+
+    def do_dia(self, dia: date, cadastro_id: int | None = None) -> list[dict[str, Any]]:
+        feriados = self._por_data.get(dia, [])
+        if cadastro_id:
+            return [f for f in feriados if f["cadastro_id"] == cadastro_id]
+        return list(feriados)
+
+    def no_periodo(
+        self,
+        inicio: date | None = None,
+        fim: date | None = None,
+        cadastro_id: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Feriados em [inicio, fim] (limites opcionais), pela ordem de data e id."""
+        encontrados = []
+        for dia in sorted(self._por_data):
+            if (inicio and dia < inicio) or (fim and dia > fim):
+                continue
+            encontrados.extend(self.do_dia(dia, cadastro_id))
+        return encontrados
+
+
+def _carregar(unidade_ids: set[int], anos: set[int]) -> dict[tuple[int, int], CalendarioFeriados]:
+    """Calendarios de todos os pares (unidade, ano) pedidos, em uma consulta."""
+    linhas = Feriado.objects.filter(
+        cadastro__unidade_id__in=unidade_ids,
+        data__gte=date(min(anos), 1, 1),
+        data__lte=date(max(anos), 12, 31),
+    ).values("id", "data", "descricao", "cadastro_id", "cadastro__descricao", "cadastro__unidade_id")
+    por_chave: dict[tuple[int, int], list[dict[str, Any]]] = {
+        (unidade_id, ano): [] for unidade_id in unidade_ids for ano in anos
+    }
+    for linha in linhas:
+        chave = (linha["cadastro__unidade_id"], linha["data"].year)
+        if chave in por_chave:
+            por_chave[chave].append(
+                {
+                    "id": linha["id"],
+                    "data": linha["data"],
+                    "descricao": linha["descricao"] or "",
+                    "cadastro_id": linha["cadastro_id"],
+                    "cadastro": linha["cadastro__descricao"] or "",
+                }
+            )
+    return {chave: CalendarioFeriados(chave[1], feriados) for chave, feriados in por_chave.items()}
+
+
+def _guardar(calendarios: dict[tuple[int, int], CalendarioFeriados], versoes: dict[int, int]) -> None:
+    with _lock:
+        for chave, calendario in calendarios.items():
+            _calendarios[chave] = (versoes.get(chave[0], 0), calendario)
+            _calendarios.move_to_end(chave)
+        while len(_calendarios) > CALENDARIOS_MAX:
+            _calendarios.popitem(last=False)
+
+
+def calendario_feriados(unidade_id: int | None, ano: int, *, versao: int | None = None) -> CalendarioFeriados:
+    """
+    Calendario de feriados da unidade no ano. Reaproveita o calendario do
+    processo enquanto a versao de feriados da unidade nao mudar.
+    """
+    if not unidade_id:
+        return CalendarioFeriados(ano, [])
+    unidade_id = int(unidade_id)
+    if versao is None:
+        versao = versao_dados(unidade_id, ESCOPO_FERIADOS)
+    chave = (unidade_id, int(ano))
+    with _lock:
+        entrada = _calendarios.get(chave)
+        if entrada and entrada[0] == versao:
+            _calendarios.move_to_end(chave)
+            return entrada[1]
+
+    calendario = _carregar({unidade_id}, {int(ano)})[chave]
+    _guardar({chave: calendario}, {unidade_id: versao})
+    return calendario
+
+
+def calendarios_feriados(
+    unidade_ids: Iterable[int | None],
+    anos: Iterable[int],
+) -> dict[tuple[int, int], CalendarioFeriados]:
+    """
+    Calendarios de varias unidades e anos: uma consulta de versoes e, para os
+    que nao estao no processo ou mudaram de versao, uma consulta de feriados.
+    """
+    ids = {int(unidade_id) for unidade_id in unidade_ids if unidade_id}
+    anos = {int(ano) for ano in anos}
+    if not ids or not anos:
+        return {}
+    versoes = versoes_dados_unidades(ids, ESCOPO_FERIADOS)
+
+    calendarios: dict[tuple[int, int], CalendarioFeriados] = {}
+    with _lock:
+        for chave in ((unidade_id, ano) for unidade_id in ids for ano in anos):
+            entrada = _calendarios.get(chave)
+            if entrada and entrada[0] == versoes.get(chave[0], 0):
+                _calendarios.move_to_end(chave)
+                calendarios[chave] = entrada[1]
+    faltantes = {(unidade_id, ano) for unidade_id in ids for ano in anos} - set(calendarios)
+    if faltantes:
+        carregados = _carregar({u for u, _ in faltantes}, {a for _, a in faltantes})
+        novos = {chave: carregados[chave] for chave in faltantes}
+        _guardar(novos, versoes)
+        calendarios.update(novos)
+    return calendarios
+
+
+def feriados_do_periodo(
+    unidade_id: int | None,
+    inicio: date | None = None,
+    fim: date | None = None,
+    *,
+    cadastro_id: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Feriados da unidade em [inicio, fim], pela ordem de data e id. Sem algum dos
+    limites, considera todos os anos com feriados cadastrados.
+    """
+    if not unidade_id:
+        return []
+    if inicio and fim:
+        anos = range(inicio.year, fim.year + 1)
+    else:
+        anos = [
+            d.year
+            for d in Feriado.objects.filter(cadastro__unidade_id=unidade_id).dates("data", "year")
+            if (not inicio or d.year >= inicio.year) and (not fim or d.year <= fim.year)
+        ]
+    versao = versao_dados(unidade_id, ESCOPO_FERIADOS)
+    feriados = []
+    for ano in anos:
+        feriados.extend(calendario_feriados(unidade_id, ano, versao=versao).no_periodo(inicio, fim, cadastro_id))
+    return feriados
+
+
+def invalidar_calendario_feriados(unidade_id: int | None = None) -> None:
+    """Descarta os calendarios do processo (da unidade ou todos)."""
+    with _lock:
+        if unidade_id is None:
+            _calendarios.clear()
+            return
+        for chave in [chave for chave in _calendarios if chave[0] == int(unidade_id)]:
+            del _calendarios[chave]
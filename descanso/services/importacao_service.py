@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from django.db import transaction
+
+from core.services.versoes import ESCOPO_DESCANSO, incrementar_versao_dados
+from descanso.models import Descanso
+from servidores.models import Servidor
+
+from .conflitos_service import ORIGEM_DESCANSO, ORIGEM_PROGRAMACAO, carregar_conflitos, remover_vinculos_programacao
+
+# Cabecalhos aceitos (normalizados para minusculas, sem espacos nas pontas).
+COLUNAS_SERVIDOR = ("servidor_id", "matricula", "servidor")
+COLUNAS_OBRIGATORIAS = ("tipo", "data_inicio", "data_fim")
+FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+class ImportacaoInvalida(ValueError):
+    """Arquivo que nao pode ser lido como planilha de descansos."""
+
+
+@dataclass
+class LinhaDescanso:
+    linha: int
+    servidor_id: int
+    tipo: str
+    data_inicio: date
+    data_fim: date
+    observacoes: str = ""
+
+
+@dataclass
+class ResultadoImportacao:
+    validas: list[LinhaDescanso] = field(default_factory=list)
+    erros: list[tuple[int, str]] = field(default_factory=list)
+    # (linha, ProgramacaoItemServidor) de programacoes no periodo importado
+    conflitos_programacao: list[tuple[int, Any]] = field(default_factory=list)
+    criados: int = 0
+    vinculos_removidos: int = 0
+
+
+def ler_planilha(arquivo, nome: str = "") -> list[dict[str, str]]:
+    """
+    Le um CSV (separado por virgula ou ponto e virgula) ou XLSX e devolve as
+    linhas como dicts com os cabecalhos em minusculas.
+    """
+    if (nome or getattr(arquivo, "name", "")).lower().endswith(".xlsx"):
+        return _ler_xlsx(arquivo)
+
+    conteudo = arquivo.read()
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode("latin-1")
+    primeira_linha = conteudo.split("\n", 1)[0]
+    delimitador = ";" if primeira_linha.count(";") > primeira_linha.count(",") else ","
+    leitor = csv.DictReader(io.StringIO(conteudo), delimiter=delimitador)
+    if not leitor.fieldnames:
+        raise ImportacaoInvalida("Arquivo vazio.")
+    return [
+        {(chave or "").strip().lower(): (valor or "").strip() for chave, valor in linha.items()}
+        for linha in leitor
+    ]
+
+
+def _ler_xlsx(arquivo) -> list[dict[str, str]]:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as exc:
+        raise ImportacaoInvalida("Arquivo XLSX invalido.") from exc
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if not cabecalho:
+        raise ImportacaoInvalida("Arquivo vazio.")
+    chaves = [str(celula or "").strip().lower() for celula in cabecalho]
+    resultado = []
+    for valores in linhas:
+        if not any(valor not in (None, "") for valor in valores):
+            continue
+        linha = {}
+        for chave, valor in zip(chaves, valores):
+            if isinstance(valor, datetime):
+                valor = valor.date()
+            if isinstance(valor, date):
+                valor = valor.isoformat()
+            linha[chave] = str(valor if valor is not None else "").strip()
+        resultado.append(linha)
+    return resultado
+
+
+def _parse_data(valor: str) -> date | None:
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(valor[:10], formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _tipos() -> dict[str, str]:
+    tipos = {}
+    for valor, rotulo in Descanso.Tipo.choices:
+        tipos[valor.lower()] = valor
+        tipos[str(rotulo).lower()] = valor
+    return tipos
+
+
+def _resolvedor_servidores(unidade_id: int):
+    por_id, por_matricula, por_nome = {}, {}, {}
+    for sid, nome, matricula in Servidor.objects.filter(unidade_id=unidade_id).values_list("id", "nome", "matricula"):
+        por_id[str(sid)] = sid
+        if matricula:
+            por_matricula[matricula.strip().lower()] = sid
+        por_nome.setdefault((nome or "").strip().lower(), []).append(sid)
+
+    def resolver(linha: dict[str, str]) -> tuple[int | None, str]:
+        if linha.get("servidor_id"):
+            sid = por_id.get(linha["servidor_id"])
+            return sid, "" if sid else f"servidor_id {linha['servidor_id']} nao pertence a unidade."
+        if linha.get("matricula"):
+            sid = por_matricula.get(linha["matricula"].lower())
+            return sid, "" if sid else f"matricula {linha['matricula']} nao encontrada na unidade."
+        nome = (linha.get("servidor") or "").lower()
+        encontrados = por_nome.get(nome, [])
+        if len(encontrados) == 1:
+            return encontrados[0], ""
+        if encontrados:
+            return None, f"nome '{linha.get('servidor')}' e ambiguo; informe servidor_id ou matricula."
+        return None, f"servidor '{linha.get('servidor')}' nao encontrado na unidade."
+
+    return resolver
+
+
+def validar_importacao(linhas: Iterable[dict[str, str]], unidade_id: int) -> ResultadoImportacao:
+    """
+    Valida as linhas de descanso de uma unidade. Servidores, descansos
+    existentes e programacoes sao carregados uma vez para o periodo do
+    arquivo; sobreposicoes com o banco saem do mapa de conflitos e as internas
+    ao arquivo de uma varredura por servidor ordenada pelo inicio.
+    """
+    resultado = ResultadoImportacao()
+    linhas = list(linhas)
+    if not linhas:
+        resultado.erros.append((0, "Arquivo sem linhas."))
+        return resultado
+    colunas = set(linhas[0])
+    faltantes = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if faltantes or not colunas.intersection(COLUNAS_SERVIDOR):
+        faltantes = faltantes or ["servidor_id, matricula ou servidor"]
+        resultado.erros.append((1, f"Colunas obrigatorias ausentes: {', '.join(faltantes)}."))
+        return resultado
+
+    resolver = _resolvedor_servidores(unidade_id)
+    tipos = _tipos()
+    candidatas: list[LinhaDescanso] = []
+    for numero, linha in enumerate(linhas, start=2):  # linha 1 e o cabecalho
+        servidor_id, erro = resolver(linha)
+        tipo = tipos.get((linha.get("tipo") or "").lower())
+        inicio = _parse_data(linha.get("data_inicio") or "")
+        fim = _parse_data(linha.get("data_fim") or "")
+        if erro:
+            resultado.erros.append((numero, erro))
+        elif not tipo:
+            resultado.erros.append((numero, f"tipo '{linha.get('tipo')}' invalido."))
+        elif not inicio or not fim:
+            resultado.erros.append((numero, "datas devem estar em AAAA-MM-DD ou DD/MM/AAAA."))
+        elif fim < inicio:
+            resultado.erros.append((numero, "A data final não pode ser anterior à data inicial."))
+        else:
+            candidatas.append(LinhaDescanso(numero, servidor_id, tipo, inicio, fim, linha.get("observacoes") or ""))
+
+    if not candidatas:
+        return resultado
+
+    mapa = carregar_conflitos(
+        [c.servidor_id for c in candidatas],
+        min(c.data_inicio for c in candidatas),
+        max(c.data_fim for c in candidatas),
+        origens=(ORIGEM_DESCANSO, ORIGEM_PROGRAMACAO),
+    )
+
+    anterior: LinhaDescanso | None = None
+    for candidata in sorted(candidatas, key=lambda c: (c.servidor_id, c.data_inicio, c.linha)):
+        if anterior and anterior.servidor_id != candidata.servidor_id:
+            anterior = None
+        existentes = mapa.conflitos(
+            candidata.servidor_id, candidata.data_inicio, candidata.data_fim, origens=(ORIGEM_DESCANSO,)
+        )
+        if existentes:
+            d = existentes[0].obj
+            resultado.erros.append(
+                (
+                    candidata.linha,
+                    f"sobrepoe o descanso cadastrado de {d.data_inicio:%d/%m/%Y} a {d.data_fim:%d/%m/%Y}.",
+                )
+            )
+        elif anterior and candidata.data_inicio <= anterior.data_fim:
+            resultado.erros.append((candidata.linha, f"sobrepoe a linha {anterior.linha} do arquivo."))
+        else:
+            resultado.validas.append(candidata)
+            # a linha valida com o fim mais distante decide as proximas sobreposicoes
+            if anterior is None or candidata.data_fim > anterior.data_fim:
+                anterior = candidata
+
+    for valida in resultado.validas:
+        for ocupacao in mapa.conflitos(
+            valida.servidor_id, valida.data_inicio, valida.data_fim, origens=(ORIGEM_PROGRAMACAO,)
+        ):
+            resultado.conflitos_programacao.append((valida.linha, ocupacao.obj))
+
+    resultado.validas.sort(key=lambda c: c.linha)
+    resultado.erros.sort()
+    resultado.conflitos_programacao.sort(key=lambda par: (par[0], par[1].pk))
+    return resultado
+
+
+def importar_descansos(
+    resultado: ResultadoImportacao,
+    unidade_id: int,
+    *,
+    criado_por=None,
+    remover_vinculos: bool = False,
+) -> ResultadoImportacao:
+    """
+    Grava as linhas validas com bulk_create, tudo ou nada: nao grava se houver
+    erros, nem se houver programacoes no periodo sem ``remover_vinculos``.
+    bulk_create nao dispara os sinais; as versoes sao incrementadas aqui.
+    """
+    if resultado.erros or not resultado.validas:
+        return resultado
+    if resultado.conflitos_programacao and not remover_vinculos:
+        return resultado
+
+    with transaction.atomic():
+        resultado.vinculos_removidos = remover_vinculos_programacao(
+            unidade_id, [vinculo for _, vinculo in resultado.conflitos_programacao]
+        )
+        criados = Descanso.objects.bulk_create(
+            [
+                Descanso(
+                    servidor_id=linha.servidor_id,
+                    tipo=linha.tipo,
+                    data_inicio=linha.data_inicio,
+                    data_fim=linha.data_fim,
+                    observacoes=linha.observacoes,
+                    criado_por=criado_por,
+                )
+                for linha in resultado.validas
+            ],
+            batch_size=500,
+        )
+        incrementar_versao_dados(unidade_id, ESCOPO_DESCANSO)
+    resultado.criados = len(criados)
+    return resultado
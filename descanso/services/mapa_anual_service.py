@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from calendar import isleap, monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+
+from django.db.models import Count, Q
+
+from core.services.versoes import ESCOPO_CADASTROS, ESCOPO_DESCANSO, ESCOPO_FERIADOS, cached_por_versao
+from descanso.models import Descanso, Feriado
+
+DIAS_SEMANA = ["Segunda", "Terca", "Quarta", "Quinta", "Sexta", "Sabado", "Domingo"]
+
+
+def _offset(ano: int, dia: date) -> int:
+    return (dia - date(ano, 1, 1)).days
+
+
+def pintar_periodo(bits: int, ano: int, inicio: date, fim: date) -> int:
+    """Marca no bitset do ano (bit 0 = 1/jan) os dias de [inicio, fim] de uma vez."""
+    inicio = max(inicio, date(ano, 1, 1))
+    fim = min(fim, date(ano, 12, 31))
+    if fim < inicio:
+        return bits
+    de, ate = _offset(ano, inicio), _offset(ano, fim)
+    return bits | (((1 << (ate - de + 1)) - 1) << de)
+
+
+def bits_do_mes(bits: int, ano: int, mes: int) -> int:
+    """Recorte do bitset anual no mes (bit 0 = dia 1)."""
+    ndias = monthrange(ano, mes)[1]
+    return (bits >> _offset(ano, date(ano, mes, 1))) & ((1 << ndias) - 1)
+
+
+def dias_do_mes(bits: int, ano: int, mes: int) -> list[bool]:
+    recorte = bits_do_mes(bits, ano, mes)
+    return [bool(recorte >> dia & 1) for dia in range(monthrange(ano, mes)[1])]
+
+
+@lru_cache(maxsize=16)
+def fins_de_semana_do_ano(ano: int) -> int:
+    inicio = date(ano, 1, 1)
+    bits = 0
+    for offset in range(366 if isleap(ano) else 365):
+        if (inicio + timedelta(days=offset)).weekday() >= 5:
+            bits |= 1 << offset
+    return bits
+
+
+def mapa_descansos_ano(unidade_id: int | None, ano: int) -> dict:
+    """
+    Descansos do ano dos servidores ativos da unidade como um bitset por
+    servidor, em uma consulta: {"servidores": [(id, nome, bits)], "anos": [...]}.
+    Memoizado pela versao de descansos e cadastros da unidade.
+    """
+
+    def build():
+        inicio_ano, fim_ano = date(ano, 1, 1), date(ano, 12, 31)
+        servidor_filter = {"servidor__ativo": True}
+        if unidade_id:
+            servidor_filter["servidor__unidade_id"] = unidade_id
+
+        bits_por_servidor: dict[int, list] = {}
+        linhas = (
+            Descanso.objects.filter(data_inicio__lte=fim_ano, data_fim__gte=inicio_ano, **servidor_filter)
+            .order_by()
+            .values_list("servidor_id", "servidor__nome", "data_inicio", "data_fim")
+        )
+        for servidor_id, nome, inicio, fim in linhas:
+            entrada = bits_por_servidor.setdefault(servidor_id, [nome, 0])
+            entrada[1] = pintar_periodo(entrada[1], ano, inicio, fim)
+
+        anos = {ano}
+        for ini, fim in (
+            Descanso.objects.filter(**servidor_filter)
+            .order_by()
+            .values_list("data_inicio__year", "data_fim__year")
+            .distinct()
+        ):
+            anos.update(valor for valor in (ini, fim) if valor)
+
+        servidores = sorted(
+            ((sid, nome, bits) for sid, (nome, bits) in bits_por_servidor.items()),
+            key=lambda linha: linha[1].lower(),
+        )
+        return {"servidores": servidores, "anos": sorted(anos)}
+
+    return cached_por_versao(
+        "descanso_mapa_anual",
+        build,
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_DESCANSO, ESCOPO_CADASTROS],
+        extra={"ano": ano},
+    )
+
+
+def periodo_do_mes(ano: int, mes: int) -> tuple[date, date]:
+    return date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1])
+
+
+def facetas_descansos_ano(unidade_id: int | None, ano: int) -> dict:
+    """
+    Contagem de descansos da unidade que tocam cada mes do ano, em uma
+    consulta com um COUNT filtrado por sobreposicao de intervalo por mes:
+    {"meses": {1: n, ...}, "total": n, "anos": [...]}. Memoizado pela versao
+    de descansos e cadastros da unidade.
+    """
+
+    def build():
+        qs = Descanso.objects.filter(servidor__unidade_id=unidade_id).order_by()
+        contagens = {"total": Count("id", filter=Q(data_inicio__lte=date(ano, 12, 31), data_fim__gte=date(ano, 1, 1)))}
+        for mes in range(1, 13):
+            inicio, fim = periodo_do_mes(ano, mes)
+            contagens[f"m{mes}"] = Count("id", filter=Q(data_inicio__lte=fim, data_fim__gte=inicio))
+        totais = qs.aggregate(**contagens)
+
+        anos = {ano}
+        for ini, fim in qs.values_list("data_inicio__year", "data_fim__year").distinct():
+            anos.update(valor for valor in (ini, fim) if valor)
+        return {
+            "meses": {mes: totais[f"m{mes}"] for mes in range(1, 13)},
+            "total": totais["total"],
+            "anos": sorted(anos),
+        }
+
+    return cached_por_versao(
+        "descanso_facetas_anuais",
+        build,
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_DESCANSO, ESCOPO_CADASTROS],
+        extra={"ano": ano},
+    )
+
+
+def mapa_feriados_ano(unidade_id: int, ano: int, cadastro_id: int | None = None) -> dict:
+    """
+    Feriados do ano da unidade (ou de um cadastro) como um bitset unico, com a
+    legenda por mes: {"bits": int, "legenda": {mes: [...]}, "anos": [...]}.
+    Memoizado pela versao de feriados da unidade.
+    """
+
+    def build():
+        qs = Feriado.objects.filter(cadastro__unidade_id=unidade_id)
+        if cadastro_id:
+            qs = qs.filter(cadastro_id=cadastro_id)
+
+        bits = 0
+        legenda: dict[int, list[dict]] = {}
+        for data_ref, descricao, cadastro_descricao in (
+            qs.filter(data__year=ano).order_by("data", "id").values_list("data", "descricao", "cadastro__descricao")
+        ):
+            bits = pintar_periodo(bits, ano, data_ref, data_ref)
+            legenda.setdefault(data_ref.month, []).append(
+                {
+                    "data": data_ref.strftime("%d/%m/%Y"),
+                    "descricao": descricao or "Feriado",
+                    "cadastro": cadastro_descricao or "",
+                }
+            )
+
+        anos = {valor for valor in qs.order_by().values_list("data__year", flat=True).distinct() if valor}
+        return {"bits": bits, "legenda": legenda, "anos": sorted(anos | {ano})}
+
+    return cached_por_versao(
+        "feriados_mapa_anual",
+        build,
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_FERIADOS],
+        extra={"ano": ano, "cadastro": cadastro_id},
+    )
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, datetime
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook
+
+from atividades.models import Area, Atividade
+from core.models import No
+from metas.models import Meta
+from plantao.models import Plantao, Semana, SemanaServidor
+from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
+from servidores.models import Servidor
+
+from .models import Descanso, Feriado, FeriadoCadastro
+from .services import (
+    ORIGEM_DESCANSO,
+    ORIGEM_PLANTAO,
+    ORIGEM_PROGRAMACAO,
+    bits_do_mes,
+    calendario_feriados,
+    capacidade,
+    carregar_conflitos,
+    dias_do_mes,
+    dias_uteis,
+    facetas_descansos_ano,
+    fins_de_semana_do_ano,
+    invalidar_calendario_feriados,
+    pintar_periodo,
+)
+
+
+class ConflitosServidoresTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="conflitos", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Conflitos", tipo="setor")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana")
+        self.bruno = Servidor.objects.create(unidade=self.unidade, nome="Bruno")
+
+        self.ferias = Descanso.objects.create(
+            servidor=self.ana,
+            tipo=Descanso.Tipo.FERIAS,
+            data_inicio=date(2026, 3, 2),
+            data_fim=date(2026, 3, 20),
+        )
+        self.folga = Descanso.objects.create(
+            servidor=self.ana,
+            tipo=Descanso.Tipo.FOLGA_COMP,
+            data_inicio=date(2026, 3, 25),
+            data_fim=date(2026, 3, 25),
+        )
+
+        plantao = Plantao.objects.create(inicio=date(2026, 3, 7), fim=date(2026, 3, 18), unidade=self.unidade)
+        semana = Semana.objects.create(plantao=plantao, inicio=date(2026, 3, 7), fim=date(2026, 3, 13), ordem=1)
+        self.item_plantao = SemanaServidor.objects.create(semana=semana, servidor=self.ana, ordem=1)
+        semana_final = Semana.objects.create(plantao=plantao, inicio=date(2026, 3, 14), fim=date(2026, 3, 20), ordem=2)
+        self.item_bruno = SemanaServidor.objects.create(semana=semana_final, servidor=self.bruno, ordem=1)
+
+        area = Area.objects.create(code="AREA_CONF", nome="Area Conflitos")
+        atividade = Atividade.objects.create(
+            titulo="Atividade", descricao="", area=area, unidade_origem=self.unidade, criado_por=self.user
+        )
+        meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            atividade=atividade,
+            titulo="Meta",
+            descricao="",
+            quantidade_alvo=1,
+            criado_por=self.user,
+        )
+        programacao = Programacao.objects.create(data=date(2026, 3, 10), unidade=self.unidade, criado_por=self.user)
+        item = ProgramacaoItem.objects.create(programacao=programacao, meta=meta, observacao="Vistoria")
+        self.vinculo = ProgramacaoItemServidor.objects.create(item=item, servidor=self.ana)
+
+    def test_mapa_carrega_lote_uma_vez_e_responde_por_periodo(self):
+        with self.assertNumQueries(3):
+            mapa = carregar_conflitos(
+                [self.ana.id, self.bruno.id], date(2026, 3, 1), date(2026, 3, 31), unidade_id=self.unidade.id
+            )
+
+        with self.assertNumQueries(0):
+            semana_1 = mapa.conflitos(self.ana.id, date(2026, 3, 9), date(2026, 3, 11))
+            fim_do_mes = mapa.conflitos(self.ana.id, date(2026, 3, 21), date(2026, 3, 31))
+            bruno = mapa.conflitos(self.bruno.id, date(2026, 3, 1), date(2026, 3, 31))
+
+        self.assertEqual(
+            [(o.origem, o.obj) for o in semana_1],
+            [
+                (ORIGEM_DESCANSO, self.ferias),
+                (ORIGEM_PLANTAO, self.item_plantao),
+                (ORIGEM_PROGRAMACAO, self.vinculo),
+            ],
+        )
+        self.assertEqual([o.obj for o in fim_do_mes], [self.folga])
+        # a semana do Bruno e recortada ao fim do plantao
+        self.assertEqual([(o.inicio, o.fim) for o in bruno], [(date(2026, 3, 14), date(2026, 3, 18))])
+        self.assertFalse(mapa.bloqueado(self.bruno.id, date(2026, 3, 19)))
+
+        pares = {(a.origem, b.origem) for a, b in mapa.sobreposicoes()}
+        self.assertEqual(
+            pares,
+            {
+                (ORIGEM_DESCANSO, ORIGEM_PLANTAO),
+                (ORIGEM_DESCANSO, ORIGEM_PROGRAMACAO),
+                (ORIGEM_PLANTAO, ORIGEM_PROGRAMACAO),
+            },
+        )
+
+    def test_clean_de_descanso_ignora_o_proprio_registro(self):
+        self.ferias.data_fim = date(2026, 3, 22)
+        self.ferias.clean()
+
+        novo = Descanso(
+            servidor=self.ana,
+            tipo=Descanso.Tipo.LICENCA,
+            data_inicio=date(2026, 3, 24),
+            data_fim=date(2026, 3, 26),
+        )
+        with self.assertRaises(ValidationError):
+            novo.clean()
+
+    def test_verificar_descanso_lista_impedimentos_do_servidor(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+        url = reverse("plantao:verificar_descanso")
+        response = self.client.get(url, {"servidor_id": self.ana.id, "inicio": "2026-03-14", "fim": "2026-03-27"})
+        self.assertEqual(
+            response.json(),
+            {
+                "bloqueado": True,
+                "impedimentos": [
+                    {"data_inicio": "2026-03-02", "data_fim": "2026-03-20", "tipo": "Férias", "observacoes": ""},
+                    {
+                        "data_inicio": "2026-03-25",
+                        "data_fim": "2026-03-25",
+                        "tipo": "Folga compensatória",
+                        "observacoes": "",
+                    },
+                ],
+            },
+        )
+
+        response = self.client.get(url, {"servidor_id": self.bruno.id, "inicio": "2026-03-14", "fim": "2026-03-20"})
+        self.assertEqual(response.json(), {"bloqueado": False})
+
+
+class BitsetAnualTests(SimpleTestCase):
+    def test_pintar_periodo_recorta_ao_ano_e_aos_meses(self):
+        bits = pintar_periodo(0, 2024, date(2023, 12, 20), date(2024, 1, 3))
+        bits = pintar_periodo(bits, 2024, date(2024, 2, 28), date(2024, 3, 1))
+        bits = pintar_periodo(bits, 2024, date(2024, 12, 31), date(2025, 1, 10))
+
+        self.assertEqual(dias_do_mes(bits, 2024, 1)[:4], [True, True, True, False])
+        self.assertEqual(dias_do_mes(bits, 2024, 2)[-3:], [False, True, True])
+        self.assertEqual(dias_do_mes(bits, 2024, 3)[:2], [True, False])
+        self.assertEqual(bits_do_mes(bits, 2024, 6), 0)
+        self.assertEqual(dias_do_mes(bits, 2024, 12)[-1], True)
+        self.assertEqual(bin(bits).count("1"), 3 + 3 + 1)
+
+    def test_fins_de_semana_do_ano(self):
+        # 2026-01-01 e quinta; sabado 3 e domingo 4
+        self.assertEqual(dias_do_mes(fins_de_semana_do_ano(2026), 2026, 1)[:5], [False, False, True, True, False])
+
+
+class MapaAnualViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="mapa", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Mapa", tipo="setor")
+        self.bia = Servidor.objects.create(unidade=self.unidade, nome="bia")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana")
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def test_relatorio_mapa_pinta_periodos_e_recalcula_apos_escrita(self):
+        Descanso.objects.create(
+            servidor=self.bia,
+            tipo=Descanso.Tipo.FERIAS,
+            data_inicio=date(2025, 12, 29),
+            data_fim=date(2026, 1, 2),
+        )
+        url = reverse("descanso:relatorio_mapa")
+
+        response = self.client.get(url, {"ano": 2026})
+        meses = response.context["meses_data"]
+        self.assertEqual(len(meses), 12)
+        _, _, janeiro = meses[0]
+        self.assertEqual([row["servidor"]["nome"] for row in janeiro], ["bia"])
+        self.assertEqual(janeiro[0]["dias"][:3], [True, True, False])
+        self.assertEqual(meses[1][2], [])
+        self.assertEqual(response.context["anos_opcoes"], [2025, 2026])
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url, {"ano": 2026})
+        # sem escrita nova o mapa vem do cache
+        self.assertFalse([q for q in consultas.captured_queries if "descanso_descanso" in q["sql"]])
+
+        Descanso.objects.create(
+            servidor=self.ana,
+            tipo=Descanso.Tipo.LICENCA,
+            data_inicio=date(2026, 1, 31),
+            data_fim=date(2026, 2, 1),
+        )
+        response = self.client.get(url, {"ano": 2026})
+        _, _, janeiro = response.context["meses_data"][0]
+        self.assertEqual([row["servidor"]["nome"] for row in janeiro], ["Ana", "bia"])
+        self.assertEqual(janeiro[0]["dias"][-1], True)
+        self.assertEqual(response.context["meses_data"][1][2][0]["dias"][:2], [True, False])
+
+    def test_feriados_relatorio_mapa_marca_feriados_e_fins_de_semana(self):
+        cadastro = FeriadoCadastro.objects.create(unidade=self.unidade, descricao="Municipais")
+        Feriado.objects.create(cadastro=cadastro, data=date(2026, 4, 21), descricao="Tiradentes")
+        Feriado.objects.create(cadastro=cadastro, data=date(2027, 1, 1))
+
+        response = self.client.get(reverse("descanso:feriados_relatorio_mapa"), {"ano": 2026})
+
+        (abril,) = response.context["meses_data"]
+        self.assertEqual(abril["mes_num"], 4)
+        self.assertEqual(
+            abril["dias"][20], {"num": 21, "marked": True, "weekend": False, "weekday": "Terca"}
+        )
+        self.assertEqual(abril["dias"][3], {"num": 4, "marked": False, "weekend": True, "weekday": "Sabado"})
+        self.assertEqual(
+            abril["legenda"], [{"data": "21/04/2026", "descricao": "Tiradentes", "cadastro": "Municipais"}]
+        )
+        self.assertEqual(response.context["anos_opcoes"], [2026, 2027])
+
+
+class ListaDescansosUnidadeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="lista", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Lista", tipo="setor")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana")
+        self.bia = Servidor.objects.create(unidade=self.unidade, nome="Bia")
+        periodos = [
+            (self.ana, date(2025, 12, 20), date(2026, 1, 5)),
+            (self.ana, date(2026, 2, 25), date(2026, 3, 3)),
+            (self.bia, date(2026, 3, 10), date(2026, 3, 12)),
+            (self.bia, date(2026, 3, 20), date(2026, 3, 21)),
+            (self.bia, date(2027, 1, 10), date(2027, 1, 11)),
+        ]
+        self.descansos = [
+            Descanso.objects.create(servidor=servidor, tipo=Descanso.Tipo.FERIAS, data_inicio=ini, data_fim=fim)
+            for servidor, ini, fim in periodos
+        ]
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def test_facetas_contam_meses_sobrepostos_e_vem_do_cache(self):
+        facetas = facetas_descansos_ano(self.unidade.id, 2026)
+        self.assertEqual(facetas["total"], 4)
+        self.assertEqual([facetas["meses"][mes] for mes in (1, 2, 3, 4)], [1, 1, 3, 0])
+        self.assertEqual(facetas["anos"], [2025, 2026, 2027])
+
+        with CaptureQueriesContext(connection) as consultas:
+            facetas_descansos_ano(self.unidade.id, 2026)
+        self.assertFalse([q for q in consultas.captured_queries if "descanso_descanso" in q["sql"]])
+
+        self.descansos[2].delete()
+        self.assertEqual(facetas_descansos_ano(self.unidade.id, 2026)["meses"][3], 2)
+
+    def test_lista_filtra_mes_no_banco_e_pagina(self):
+        url = reverse("descanso:lista_servidores")
+
+        response = self.client.get(url, {"ano": 2026, "month": "2026-03"})
+        self.assertEqual(response.context["month_default"], "2026-03")
+        self.assertEqual(
+            [d.pk for d in response.context["descansos"]],
+            [self.descansos[3].pk, self.descansos[2].pk, self.descansos[1].pk],
+        )
+        self.assertEqual(response.context["month_filters"][2]["count"], 3)
+        self.assertEqual(response.context["total_descansos"], 4)
+
+        with mock.patch("descanso.views.DESCANSOS_POR_PAGINA", 3):
+            response = self.client.get(url, {"ano": 2026, "month": "todos", "page": 2})
+        self.assertEqual(response.context["month_default"], "")
+        self.assertEqual(response.context["page_obj"].paginator.num_pages, 2)
+        self.assertEqual([d.pk for d in response.context["descansos"]], [self.descansos[0].pk])
+        self.assertContains(response, "?ano=2026&month=todos&page=1", count=1)
+
+
+class CalendarioFeriadosTests(TestCase):
+    def setUp(self):
+        invalidar_calendario_feriados()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="feriados", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Feriados", tipo="setor")
+        self.estaduais = FeriadoCadastro.objects.create(unidade=self.unidade, descricao="Estaduais")
+        self.municipais = FeriadoCadastro.objects.create(unidade=self.unidade, descricao="Municipais")
+        self.tiradentes = Feriado.objects.create(
+            cadastro=self.estaduais, data=date(2026, 4, 21), descricao="Tiradentes"
+        )
+        Feriado.objects.create(cadastro=self.municipais, data=date(2026, 4, 21), descricao="")
+        Feriado.objects.create(cadastro=self.municipais, data=date(2027, 1, 1), descricao="Ano novo")
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def test_calendario_e_reaproveitado_ate_mudar_a_versao(self):
+        calendario = calendario_feriados(self.unidade.id, 2026)
+        self.assertTrue(calendario.is_feriado(date(2026, 4, 21)))
+        self.assertFalse(calendario.is_feriado(date(2026, 4, 22)))
+        self.assertEqual(
+            [f["cadastro"] for f in calendario.do_dia(date(2026, 4, 21))], ["Estaduais", "Municipais"]
+        )
+        municipais_abril = calendario.no_periodo(date(2026, 4, 1), date(2026, 4, 30), self.municipais.id)
+        self.assertEqual([f["descricao"] for f in municipais_abril], [""])
+
+        with self.assertNumQueries(1):
+            # apenas a versao de feriados da unidade
+            self.assertIs(calendario_feriados(self.unidade.id, 2026), calendario)
+
+        response = self.client.post(
+            reverse("descanso:feriados_registrar"),
+            data=json.dumps({"cadastro_id": self.estaduais.id, "data": "2026-04-21", "descricao": "Tiradentes (MG)"}),
+            content_type="application/json",
+        )
+        self.assertFalse(response.json()["created"])
+        atualizado = calendario_feriados(self.unidade.id, 2026)
+        self.assertEqual(atualizado.do_dia(date(2026, 4, 21))[0]["descricao"], "Tiradentes (MG)")
+
+    def test_feed_agrupa_por_dia_ou_lista_o_cadastro(self):
+        url = reverse("descanso:feriados_feed")
+        response = self.client.get(url, {"start": "2026-04-01", "end": "2027-01-31"})
+        eventos = response.json()
+        self.assertEqual([e["start"] for e in eventos], ["2026-04-21", "2027-01-01"])
+        self.assertEqual(eventos[0]["title"], "Feriado: Tiradentes; Feriado")
+        self.assertEqual(eventos[0]["extendedProps"]["cadastros"], ["Estaduais", "Municipais"])
+        self.assertEqual(eventos[0]["extendedProps"]["cadastro_id"], "")
+
+        response = self.client.get(url, {"cadastro_id": self.estaduais.id})
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "id": self.tiradentes.id,
+                    "title": "Tiradentes",
+                    "start": "2026-04-21",
+                    "allDay": True,
+                    "isHoliday": 1,
+                    "extendedProps": {
+                        "kind": "feriado",
+                        "descricao": "Tiradentes",
+                        "cadastro": "Estaduais",
+                        "cadastro_id": self.estaduais.id,
+                    },
+                }
+            ],
+        )
+
+        self.client.post(reverse("descanso:feriados_excluir"), data={"feriado_id": self.tiradentes.id})
+        response = self.client.get(url, {"start": "2026-04-01", "end": "2026-04-30"})
+        self.assertEqual(response.json()[0]["title"], "Feriado: Feriado")
+
+
+class ImportacaoDescansosTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="importador", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Importacao", tipo="setor")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana", matricula="M-1")
+        self.bruno = Servidor.objects.create(unidade=self.unidade, nome="Bruno")
+        Descanso.objects.create(
+            servidor=self.bruno,
+            tipo=Descanso.Tipo.FERIAS,
+            data_inicio=date(2026, 7, 1),
+            data_fim=date(2026, 7, 10),
+        )
+        area = Area.objects.create(code="AREA_IMP", nome="Area Importacao")
+        atividade = Atividade.objects.create(
+            titulo="Atividade", descricao="", area=area, unidade_origem=self.unidade, criado_por=self.user
+        )
+        meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            atividade=atividade,
+            titulo="Meta",
+            descricao="",
+            quantidade_alvo=1,
+            criado_por=self.user,
+        )
+        programacao = Programacao.objects.create(data=date(2026, 8, 4), unidade=self.unidade, criado_por=self.user)
+        item = ProgramacaoItem.objects.create(programacao=programacao, meta=meta, observacao="Vistoria")
+        self.vinculo = ProgramacaoItemServidor.objects.create(item=item, servidor=self.ana)
+
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def _enviar(self, conteudo, **extra):
+        arquivo = SimpleUploadedFile("descansos.csv", conteudo.encode("utf-8"), content_type="text/csv")
+        return self.client.post(reverse("descanso:importar_descansos"), data={"arquivo": arquivo, **extra})
+
+    def test_sobreposicoes_com_banco_e_no_arquivo_impedem_a_gravacao(self):
+        response = self._enviar(
+            "servidor;tipo;data_inicio;data_fim\n"
+            "Ana;Férias;01/06/2026;15/06/2026\n"
+            "Bruno;FERIAS;2026-07-08;2026-07-12\n"
+            "Ana;LICENCA;2026-06-10;2026-06-11\n"
+            "Carla;FERIAS;2026-06-01;2026-06-02\n"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["erros"],
+            [
+                {"linha": 3, "mensagem": "sobrepoe o descanso cadastrado de 01/07/2026 a 10/07/2026."},
+                {"linha": 4, "mensagem": "sobrepoe a linha 2 do arquivo."},
+                {"linha": 5, "mensagem": "servidor 'Carla' nao encontrado na unidade."},
+            ],
+        )
+        self.assertEqual(Descanso.objects.count(), 1)
+
+    def test_conflito_com_programacao_exige_confirmacao(self):
+        conteudo = (
+            "servidor_id,matricula,tipo,data_inicio,data_fim,observacoes\n"
+            ",M-1,FERIAS,2026-08-03,2026-08-14,ferias anuais\n"
+            f"{self.bruno.id},,FOLGA_COMP,2026-08-03,2026-08-03,\n"
+        )
+
+        response = self._enviar(conteudo)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertTrue(payload["requer_confirmacao"])
+        self.assertEqual(
+            [(c["linha"], c["id"], c["data"]) for c in payload["conflitos_programacao"]],
+            [(2, self.vinculo.id, "2026-08-04")],
+        )
+        self.assertEqual(Descanso.objects.count(), 1)
+
+        response = self._enviar(conteudo, confirm_remove_assignments="1")
+        self.assertEqual(response.json()["criados"], 2)
+        self.assertEqual(response.json()["vinculos_removidos"], 1)
+        self.assertFalse(ProgramacaoItemServidor.objects.filter(pk=self.vinculo.pk).exists())
+        ferias = Descanso.objects.get(servidor=self.ana)
+        self.assertEqual((ferias.tipo, ferias.observacoes, ferias.criado_por), ("FERIAS", "ferias anuais", self.user))
+
+    def test_xlsx_com_datas_e_numeros_nas_celulas(self):
+        planilha = Workbook()
+        folha = planilha.active
+        folha.append(["Servidor_ID", "Tipo", "Data_Inicio", "Data_Fim"])
+        folha.append([self.bruno.id, "Férias", datetime(2026, 9, 1), date(2026, 9, 10)])
+        folha.append([None, None, None, None])
+        conteudo = BytesIO()
+        planilha.save(conteudo)
+        arquivo = SimpleUploadedFile(
+            "descansos.xlsx",
+            conteudo.getvalue(),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+        response = self.client.post(reverse("descanso:importar_descansos"), data={"arquivo": arquivo})
+
+        self.assertEqual(response.json()["criados"], 1)
+        ferias = Descanso.objects.get(servidor=self.bruno, tipo=Descanso.Tipo.FERIAS, data_inicio=date(2026, 9, 1))
+        self.assertEqual(ferias.data_fim, date(2026, 9, 10))
+
+    def test_comando_valida_e_importa(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8") as arquivo:
+            arquivo.write("servidor_id,tipo,data_inicio,data_fim\n")
+            arquivo.write(f"{self.bruno.id},Licença,2026-09-01,2026-09-30\n")
+            arquivo.flush()
+
+            saida = StringIO()
+            argumentos = [arquivo.name, "--unidade", str(self.unidade.id)]
+            call_command("importar_descansos", *argumentos, "--dry-run", stdout=saida)
+            self.assertIn("1 descanso(s) validos (dry-run).", saida.getvalue())
+            self.assertEqual(Descanso.objects.count(), 1)
+
+            call_command("importar_descansos", *argumentos, stdout=saida)
+            self.assertTrue(Descanso.objects.filter(servidor=self.bruno, tipo="LICENCA").exists())
+
+            with self.assertRaisesMessage(CommandError, "1 linha(s) com erro"):
+                call_command("importar_descansos", *argumentos, stdout=saida)
+
+
+class CapacidadeTests(TestCase):
+    def setUp(self):
+        invalidar_calendario_feriados()
+        self.unidade = No.objects.create(nome="Unidade Capacidade", tipo="setor")
+        cadastro = FeriadoCadastro.objects.create(unidade=self.unidade, descricao="Nacionais")
+        Feriado.objects.create(cadastro=cadastro, data=date(2026, 4, 21), descricao="Tiradentes")
+        Feriado.objects.create(cadastro=cadastro, data=date(2026, 1, 1), descricao="Confraternizacao")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana")
+        self.bruno = Servidor.objects.create(unidade=self.unidade, nome="Bruno")
+        Servidor.objects.create(unidade=self.unidade, nome="Carla", ativo=False)
+
+        Descanso.objects.create(
+            servidor=self.ana,
+            tipo=Descanso.Tipo.FERIAS,
+            data_inicio=date(2026, 4, 16),
+            data_fim=date(2026, 4, 20),
+        )
+        plantao = Plantao.objects.create(inicio=date(2026, 4, 18), fim=date(2026, 4, 24), unidade=self.unidade)
+        semana = Semana.objects.create(plantao=plantao, inicio=date(2026, 4, 18), fim=date(2026, 4, 24), ordem=1)
+        SemanaServidor.objects.create(semana=semana, servidor=self.bruno, ordem=1)
+
+    def test_dias_uteis_descontam_fins_de_semana_e_feriados(self):
+        self.assertEqual(dias_uteis(self.unidade.id, date(2026, 4, 13), date(2026, 4, 26)), 9)
+        self.assertEqual(dias_uteis(self.unidade.id, date(2025, 12, 29), date(2026, 1, 4)), 4)
+
+    def test_capacidade_por_servidor_e_unidade(self):
+        with self.assertNumQueries(5):
+            # versoes de feriados, feriados, servidores, descansos e plantoes
+            resumo = capacidade([self.unidade.id], date(2026, 4, 13), date(2026, 4, 26))
+
+        self.assertEqual(resumo.dias_uteis, {self.unidade.id: 9})
+        self.assertEqual(
+            [
+                (s.nome, s.dias_uteis, s.dias_descanso, s.dias_disponiveis, s.plantao_nao_util, s.capacidade_liquida)
+                for s in resumo.servidores
+            ],
+            [("Ana", 9, 3, 6, 0, 6), ("Bruno", 9, 0, 9, 3, 6)],
+        )
+        self.assertEqual((resumo.pessoa_dias, resumo.capacidade_liquida), (15, 12))
+
+        sem_compensacao = capacidade(
+            [self.unidade.id], date(2026, 4, 13), date(2026, 4, 26), compensar_plantao=False
+        )
+        self.assertEqual(sem_compensacao.capacidade_liquida, 15)
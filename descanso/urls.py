@@ -15,6 +15,7 @@ urlpatterns = [
     path("feriados/registrar/", views.feriados_registrar, name="feriados_registrar"),
     path("feriados/excluir/", views.feriados_excluir, name="feriados_excluir"),
     path("novo/", views.criar_descanso, name="criar_descanso"),
+    path("importar/", views.importar_descansos_view, name="importar_descansos"),
     path("todos/", views.descansos_unidade, name="descansos_unidade"),
     path("servidor/<int:servidor_id>/", views.descansos_servidor, name="descansos_servidor"),
     path("editar/<int:pk>/", views.editar_descanso, name="editar_descanso"),
@@ -1,11 +1,10 @@
 # descanso/views.py
-from calendar import monthrange
-from collections import Counter
 from datetime import date
 import json
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404, redirect, render
@@ -18,25 +17,37 @@ from django.views.decorators.csrf import csrf_protect
 from servidores.models import Servidor
 from .models import Descanso, Feriado, FeriadoCadastro
 from .forms import DescansoForm
+from .services import (
+    DIAS_SEMANA,
+    ORIGEM_PROGRAMACAO,
+    bits_do_mes,
+    carregar_conflitos,
+    dias_do_mes,
+    facetas_descansos_ano,
+    ImportacaoInvalida,
+    feriados_do_periodo,
+    fins_de_semana_do_ano,
+    importar_descansos,
+    invalidar_calendario_feriados,
+    ler_planilha,
+    mapa_descansos_ano,
+    mapa_feriados_ano,
+    periodo_do_mes,
+    remover_vinculos_programacao,
+    validar_importacao,
+)
+from core.services.versoes import ESCOPO_FERIADOS, incrementar_versao_dados
 from core.utils import get_unidade_atual_id
 from core.utils.security import safe_next_url
-from programar.models import ProgramacaoItemServidor
 
 
 def _get_programacao_conflicts(servidor, data_inicio, data_fim):
     if not servidor or not data_inicio or not data_fim:
         return []
 
-    qs = (
-        ProgramacaoItemServidor.objects.select_related("item", "item__programacao", "item__meta")
-        .filter(
-            servidor=servidor,
-            item__programacao__data__gte=data_inicio,
-            item__programacao__data__lte=data_fim,
-        )
-        .order_by("item__programacao__data", "item_id")
-    )
-    return list(qs)
+    origens = (ORIGEM_PROGRAMACAO,)
+    mapa = carregar_conflitos([servidor.pk], data_inicio, data_fim, origens=origens)
+    return [ocupacao.obj for ocupacao in mapa.conflitos(servidor.pk, data_inicio, data_fim, origens=origens)]
 
 
 def _format_conflicts(conflicts):
@@ -72,102 +83,58 @@ def _get_requested_year(request):
         return timezone.localdate().year
 
 
-def _build_descanso_month_filters(year, include_nodate=False):
-    filters = [
-        {"key": f"{year}-{month:02d}", "label": f"{MONTH_NAMES_PT[month - 1]} {year}"}
+DESCANSOS_POR_PAGINA = 25
+MES_TODOS = "todos"
+
+
+def _build_descanso_month_filters(year, month_counts=None):
+    month_counts = month_counts or {}
+    return [
+        {
+            "key": f"{year}-{month:02d}",
+            "label": f"{MONTH_NAMES_PT[month - 1]} {year}",
+            "count": month_counts.get(month, 0),
+        }
         for month in range(1, 13)
     ]
-    if include_nodate:
-        filters.append({"key": "nodate", "label": "Sem data"})
-    return filters
-
-
-def _get_descanso_month_keys(descanso, year):
-    inicio = getattr(descanso, "data_inicio", None)
-    fim = getattr(descanso, "data_fim", None)
-    if not inicio or not fim:
-        return ["nodate"]
-
-    ano_inicio = date(year, 1, 1)
-    ano_fim = date(year, 12, 31)
-    inicio_filtrado = max(inicio, ano_inicio)
-    fim_filtrado = min(fim, ano_fim)
-    if inicio_filtrado > fim_filtrado:
-        return []
 
-    keys = []
-    mes_atual = inicio_filtrado.month
-    ano_atual = inicio_filtrado.year
-    while True:
-        keys.append(f"{ano_atual}-{mes_atual:02d}")
-        if ano_atual == fim_filtrado.year and mes_atual == fim_filtrado.month:
-            break
-        if mes_atual == 12:
-            mes_atual = 1
-            ano_atual += 1
-        else:
-            mes_atual += 1
-    return keys
-
-
-def _build_descansos_unidade_context(unidade_id, hoje, ano, month_param=""):
-    inicio_ano = date(ano, 1, 1)
-    fim_ano = date(ano, 12, 31)
 
+def _build_descansos_unidade_context(unidade_id, hoje, ano, month_param="", page=None):
+    facetas = facetas_descansos_ano(unidade_id, ano)
+    month_filters = _build_descanso_month_filters(ano, facetas["meses"])
+    month_keys = [month_filter["key"] for month_filter in month_filters]
+
+    month_param = (month_param or "").strip().lower()
+    if month_param == MES_TODOS:
+        month_default = ""
+    elif month_param in month_keys:
+        month_default = month_param
+    else:
+        today_key = f"{hoje.year}-{hoje.month:02d}"
+        month_default = today_key if ano == hoje.year else month_keys[0]
+
+    if month_default:
+        inicio, fim = periodo_do_mes(ano, int(month_default[5:]))
+    else:
+        inicio, fim = date(ano, 1, 1), date(ano, 12, 31)
     qs = (
         Descanso.objects
         .select_related("servidor", "servidor__unidade")
         .filter(servidor__unidade_id=unidade_id)
-        .filter(data_inicio__lte=fim_ano, data_fim__gte=inicio_ano)
+        .filter(data_inicio__lte=fim, data_fim__gte=inicio)
         .order_by("-data_inicio", "-id")
     )
-    descansos = list(qs)
-
-    has_nodate = False
-    for descanso in descansos:
-        keys = _get_descanso_month_keys(descanso, ano)
-        descanso.month_keys = keys
-        if "nodate" in keys:
-            has_nodate = True
-
-    month_filters = _build_descanso_month_filters(ano, include_nodate=has_nodate)
-    month_counts = Counter()
-    for descanso in descansos:
-        for key in descanso.month_keys:
-            month_counts[key] += 1
-    for month_filter in month_filters:
-        month_filter["count"] = month_counts.get(month_filter["key"], 0)
-
-    month_keys = [month_filter["key"] for month_filter in month_filters]
-    month_default = ""
-    month_param = (month_param or "").strip()
-    if month_param and month_param in month_keys:
-        month_default = month_param
-    elif month_keys:
-        today_key = f"{hoje.year}-{hoje.month:02d}"
-        if ano == hoje.year and today_key in month_keys:
-            month_default = today_key
-        else:
-            month_default = month_keys[0]
-
-    anos_disponiveis = set()
-    q_anos = Descanso.objects.filter(servidor__unidade_id=unidade_id).values_list(
-        "data_inicio__year", "data_fim__year"
-    )
-    for inicio_ano_val, fim_ano_val in q_anos:
-        if inicio_ano_val:
-            anos_disponiveis.add(inicio_ano_val)
-        if fim_ano_val:
-            anos_disponiveis.add(fim_ano_val)
-    anos_disponiveis.add(ano)
+    page_obj = Paginator(qs, DESCANSOS_POR_PAGINA).get_page(page)
 
     return {
-        "descansos": descansos,
+        "descansos": page_obj.object_list,
+        "page_obj": page_obj,
         "month_filters": month_filters,
         "month_default": month_default,
+        "month_todos": MES_TODOS,
         "ano": ano,
-        "anos_opcoes": sorted(anos_disponiveis),
-        "total_descansos": len(descansos),
+        "anos_opcoes": facetas["anos"],
+        "total_descansos": facetas["total"],
     }
 
 @login_required
@@ -201,6 +168,7 @@ def lista_servidores(request):
     cadastros_por_ano = []
     descanso_ctx = {
         "descansos": [],
+        "page_obj": None,
         "month_filters": [],
         "month_default": "",
         "ano": ano,
@@ -213,6 +181,7 @@ def lista_servidores(request):
             hoje=hoje,
             ano=ano,
             month_param=month_param,
+            page=request.GET.get("page"),
         )
         cadastros = list(
             FeriadoCadastro.objects.filter(unidade_id=unidade_id).order_by("-criado_em", "-id")
@@ -280,46 +249,44 @@ def feriados_feed(request):
     start = _parse_iso_date(request.GET.get("start") or "")
     end = _parse_iso_date(request.GET.get("end") or "")
 
-    qs = Feriado.objects.select_related("cadastro").filter(cadastro__unidade_id=unidade_id)
-    if cadastro_id:
-        qs = qs.filter(cadastro_id=cadastro_id)
-    if start:
-        qs = qs.filter(data__gte=start)
-    if end:
-        qs = qs.filter(data__lte=end)
+    try:
+        cadastro_id = int(cadastro_id) if cadastro_id else None
+    except (TypeError, ValueError):
+        return JsonResponse([], safe=False)
+    feriados = feriados_do_periodo(unidade_id, start, end, cadastro_id=cadastro_id)
 
     if cadastro_id:
         data = [
             {
-                "id": f.id,
-                "title": f.descricao or "Feriado",
-                "start": f.data.isoformat(),
+                "id": f["id"],
+                "title": f["descricao"] or "Feriado",
+                "start": f["data"].isoformat(),
                 "allDay": True,
                 "isHoliday": 1,
                 "extendedProps": {
                     "kind": "feriado",
-                    "descricao": f.descricao,
-                    "cadastro": f.cadastro.descricao,
-                    "cadastro_id": f.cadastro_id,
+                    "descricao": f["descricao"],
+                    "cadastro": f["cadastro"],
+                    "cadastro_id": f["cadastro_id"],
                 },
             }
-            for f in qs
+            for f in feriados
         ]
         return JsonResponse(data, safe=False)
 
     by_date = {}
-    for f in qs:
-        key = f.data
+    for f in feriados:
+        key = f["data"]
         entry = by_date.setdefault(key, {"descricoes": [], "cadastros": []})
-        label = f.descricao or "Feriado"
+        label = f["descricao"] or "Feriado"
         if label not in entry["descricoes"]:
             entry["descricoes"].append(label)
-        cadastro_label = f.cadastro.descricao
+        cadastro_label = f["cadastro"]
         if cadastro_label not in entry["cadastros"]:
             entry["cadastros"].append(cadastro_label)
         entry.setdefault("cadastro_ids", [])
-        if f.cadastro_id not in entry["cadastro_ids"]:
-            entry["cadastro_ids"].append(f.cadastro_id)
+        if f["cadastro_id"] not in entry["cadastro_ids"]:
+            entry["cadastro_ids"].append(f["cadastro_id"])
 
     data = []
     for day, entry in sorted(by_date.items(), key=lambda x: x[0]):
@@ -412,7 +379,9 @@ def feriados_registrar(request):
     )
     if not created and feriado.descricao != descricao:
         Feriado.objects.filter(pk=feriado.pk).update(descricao=descricao)
+        incrementar_versao_dados(unidade_id, ESCOPO_FERIADOS)
         feriado.descricao = descricao
+    invalidar_calendario_feriados(unidade_id)
     return JsonResponse({"ok": True, "created": created, "feriado_id": feriado.id})
 
 
@@ -440,6 +409,7 @@ def feriados_excluir(request):
 
     feriado = get_object_or_404(Feriado, pk=feriado_id, cadastro__unidade_id=unidade_id)
     feriado.delete()
+    invalidar_calendario_feriados(unidade_id)
     return JsonResponse({"ok": True})
 
 
@@ -457,6 +427,7 @@ def feriados_cadastro_excluir(request, cadastro_id: int):
     if request.method == "POST":
         descricao = cadastro.descricao
         cadastro.delete()
+        invalidar_calendario_feriados(unidade_id)
         messages.success(
             request,
             f"Cadastro '{descricao}' excluido com sucesso. {feriados_count} feriado(s) removido(s).",
@@ -504,19 +475,8 @@ def feriados_relatorio_mapa(request):
                     "Cadastro de feriado informado nao foi encontrado nesta unidade.",
                 )
 
-    qs = (
-        Feriado.objects.select_related("cadastro")
-        .filter(cadastro__unidade_id=unidade_id, data__year=ano)
-        .order_by("data", "id")
-    )
-    if cadastro:
-        qs = qs.filter(cadastro=cadastro)
-
-    feriados = list(qs)
-    month_map = {}
-    for f in feriados:
-        month_map.setdefault(f.data.month, [])
-        month_map[f.data.month].append(f)
+    mapa = mapa_feriados_ano(unidade_id, ano, cadastro.id if cadastro else None)
+    fins_de_semana = fins_de_semana_do_ano(ano)
 
     meses_label = [
         (1, "Janeiro"), (2, "Fevereiro"), (3, "Marco"), (4, "Abril"),
@@ -526,47 +486,23 @@ def feriados_relatorio_mapa(request):
 
     meses_data = []
     for mes, nome in meses_label:
-        feriados_mes = month_map.get(mes) or []
-        if not feriados_mes:
+        legenda = mapa["legenda"].get(mes)
+        if not legenda:
             continue
-        dias_marcados = {f.data.day for f in feriados_mes if f.data}
-        ndias = monthrange(ano, mes)[1]
-        dias = []
-        dias_semana = ["Segunda", "Terca", "Quarta", "Quinta", "Sexta", "Sabado", "Domingo"]
-        for d in range(1, ndias + 1):
-            dia_data = date(ano, mes, d)
-            dias.append({
-                "num": d,
-                "marked": d in dias_marcados,
-                "weekend": dia_data.weekday() >= 5,
-                "weekday": dias_semana[dia_data.weekday()],
-            })
-        legenda = []
-        for f in feriados_mes:
-            data_label = f.data.strftime("%d/%m/%Y")
-            descricao = f.descricao or "Feriado"
-            cadastro_label = f.cadastro.descricao if f.cadastro else ""
-            legenda.append({
-                "data": data_label,
-                "descricao": descricao,
-                "cadastro": cadastro_label,
-            })
+        marcados = dias_do_mes(mapa["bits"], ano, mes)
+        weekends = dias_do_mes(fins_de_semana, ano, mes)
+        primeiro_dia = date(ano, mes, 1).weekday()
+        dias = [
+            {
+                "num": indice + 1,
+                "marked": marcado,
+                "weekend": weekend,
+                "weekday": DIAS_SEMANA[(primeiro_dia + indice) % 7],
+            }
+            for indice, (marcado, weekend) in enumerate(zip(marcados, weekends))
+        ]
         meses_data.append({"mes_num": mes, "mes_nome": nome, "dias": dias, "legenda": legenda})
-
-    anos_set = set(
-        Feriado.objects.filter(cadastro__unidade_id=unidade_id)
-        .values_list("data__year", flat=True)
-    )
-    if cadastro:
-        anos_set = set(
-            Feriado.objects.filter(cadastro=cadastro)
-            .values_list("data__year", flat=True)
-        )
-    anos_set.discard(None)
-    anos_opcoes = sorted(anos_set) if anos_set else [ano]
-    if ano not in anos_opcoes:
-        anos_opcoes.append(ano)
-        anos_opcoes.sort()
+    anos_opcoes = mapa["anos"]
 
     return render(
         request,
@@ -614,7 +550,7 @@ def criar_descanso(request):
 
             with transaction.atomic():
                 if conflicts:
-                    ProgramacaoItemServidor.objects.filter(pk__in=[c.pk for c in conflicts]).delete()
+                    remover_vinculos_programacao(unidade_id, conflicts)
                 if request.user.is_authenticated:
                     obj.criado_por = request.user
                 obj.save()
@@ -698,6 +634,49 @@ def descansos_servidor(request, servidor_id: int):
             "filtros": {"tipo": tipo, "inicio": inicio, "fim": fim, "q": q},
         },
     )
+
+
+@login_required
+@require_POST
+@csrf_protect
+def importar_descansos_view(request):
+    unidade_id = get_unidade_atual_id(request)
+    if not unidade_id:
+        return JsonResponse({"ok": False, "error": "Unidade nao definida."}, status=400)
+
+    arquivo = request.FILES.get("arquivo")
+    if not arquivo:
+        return JsonResponse({"ok": False, "error": "Envie o arquivo CSV ou XLSX no campo 'arquivo'."}, status=400)
+    try:
+        linhas = ler_planilha(arquivo, arquivo.name)
+    except ImportacaoInvalida as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=400)
+
+    confirm_remove = request.POST.get("confirm_remove_assignments") == "1"
+    resultado = validar_importacao(linhas, unidade_id)
+    importar_descansos(
+        resultado,
+        unidade_id,
+        criado_por=request.user if request.user.is_authenticated else None,
+        remover_vinculos=confirm_remove,
+    )
+
+    conflitos = _format_conflicts([vinculo for _, vinculo in resultado.conflitos_programacao])
+    for (linha, _), conflito in zip(resultado.conflitos_programacao, conflitos):
+        conflito["linha"] = linha
+        conflito["data"] = conflito["data"].isoformat() if conflito["data"] else None
+    payload = {
+        "ok": bool(resultado.criados),
+        "criados": resultado.criados,
+        "vinculos_removidos": resultado.vinculos_removidos,
+        "erros": [{"linha": linha, "mensagem": mensagem} for linha, mensagem in resultado.erros],
+        "conflitos_programacao": conflitos,
+        "requer_confirmacao": bool(conflitos) and not resultado.erros and not confirm_remove,
+    }
+    status = 200 if resultado.criados or payload["requer_confirmacao"] else 400
+    return JsonResponse(payload, status=status)
+
+
 @login_required
 def editar_descanso(request, pk: int):
     unidade_id = get_unidade_atual_id(request)
@@ -731,7 +710,7 @@ def editar_descanso(request, pk: int):
 
             with transaction.atomic():
                 if conflicts:
-                    ProgramacaoItemServidor.objects.filter(pk__in=[c.pk for c in conflicts]).delete()
+                    remover_vinculos_programacao(unidade_id, conflicts)
                 updated.save()
 
             if conflicts:
@@ -775,23 +754,10 @@ def relatorio_mapa(request):
         ano = timezone.localdate().year
 
     unidade_id = get_unidade_atual_id(request)
-    servidores_qs = Servidor.objects.select_related("unidade").filter(ativo=True)
-    if unidade_id:
-        servidores_qs = servidores_qs.filter(unidade_id=unidade_id)
-    else:
+    if not unidade_id:
         messages.warning(request, "Contexto de unidade não definido. Exibindo todas as unidades.")
-    servidores_qs = servidores_qs.order_by("nome")
-
-    # janela do ano
-    inicio_ano = date(ano, 1, 1)
-    fim_ano = date(ano, 12, 31)
 
-    # descansos que tocam o ano selecionado
-    descansos = (
-        Descanso.objects
-        .filter(servidor__in=servidores_qs, data_inicio__lte=fim_ano, data_fim__gte=inicio_ano)
-        .select_related("servidor")
-    )
+    mapa = mapa_descansos_ano(unidade_id, ano)
 
     meses_label = [
         (1, "Janeiro"), (2, "Fevereiro"), (3, "Março"), (4, "Abril"),
@@ -799,50 +765,17 @@ def relatorio_mapa(request):
         (9, "Setembro"), (10, "Outubro"), (11, "Novembro"), (12, "Dezembro"),
     ]
 
-    # mes_mapa[mes] = {"ndias": N, "rows": {servidor_id: {"servidor": Servidor, "dias":[bool]*N}}}
-    mes_mapa = {}
-    for mes, _ in meses_label:
-        mes_mapa[mes] = {"ndias": monthrange(ano, mes)[1], "rows": {}}
-
-    # marca os dias de cada descanso nos meses correspondentes
-    for d in descansos:
-        inicio = max(d.data_inicio, inicio_ano)
-        fim = min(d.data_fim, fim_ano)
-        for mes, _ in meses_label:
-            ndias = mes_mapa[mes]["ndias"]
-            mes_inicio = date(ano, mes, 1)
-            mes_fim = date(ano, mes, ndias)
-            s = max(inicio, mes_inicio)
-            e = min(fim, mes_fim)
-            if s <= e:
-                rows = mes_mapa[mes]["rows"]
-                row = rows.get(d.servidor_id)
-                if row is None:
-                    row = {"servidor": d.servidor, "dias": [False] * ndias}
-                for dia in range(s.day, e.day + 1):
-                    row["dias"][dia - 1] = True
-                rows[d.servidor_id] = row
-
-    # prepara dados ordenados por nome p/ template (lista, não dict)
+    # meses_data: [(mes, nome, [{"servidor": {"id", "nome"}, "dias": [bool]*N}])], ja ordenado por nome;
+    # so expande em lista os meses em que o servidor tem algum dia marcado.
     meses_data = []
     for mes, nome in meses_label:
-        rows_dict = mes_mapa[mes]["rows"]
-        rows = list(rows_dict.values())
-        rows.sort(key=lambda r: r["servidor"].nome.lower())
+        rows = [
+            {"servidor": {"id": sid, "nome": nome_servidor}, "dias": dias_do_mes(bits, ano, mes)}
+            for sid, nome_servidor, bits in mapa["servidores"]
+            if bits_do_mes(bits, ano, mes)
+        ]
         meses_data.append((mes, nome, rows))
-
-    anos_disponiveis = set()
-    q_anos = Descanso.objects.filter(servidor__in=servidores_qs).values_list("data_inicio__year", "data_fim__year")
-    for inicio_ano_val, fim_ano_val in q_anos:
-        if inicio_ano_val:
-            anos_disponiveis.add(inicio_ano_val)
-        if fim_ano_val:
-            anos_disponiveis.add(fim_ano_val)
-    if not anos_disponiveis:
-        anos_disponiveis.add(ano)
-    else:
-        anos_disponiveis.add(ano)
-    anos_opcoes = sorted(anos_disponiveis)
+    anos_opcoes = mapa["anos"]
 
     ctx = {"ano": ano, "anos_opcoes": anos_opcoes, "meses_data": meses_data}
     return render(request, "descanso/relatorio_mapa.html", ctx)
@@ -1,14 +1,219 @@
-from django.core.management.base import BaseCommand
-from django.db.models import F, Q
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
+
+from core.models import No
+from core.services.versoes import ESCOPO_CADASTROS, ESCOPO_METAS, incrementar_versao_dados
+from metas.models import Meta, MetaAlocacao
 
-from metas.models import Meta
+CAMPOS_SAIDA = (
+    "meta_id",
+    "atividade_id",
+    "unidade_meta",
+    "unidade_atividade",
+    "status",
+    "motivos",
+    "meta_titulo",
+    "atividade_titulo",
+)
+FASES = ("consulta", "analise", "correcao", "saida")
 
 
 def _norm(value):
     return (value or "").strip().casefold()
 
 
+def _metas_qs(*, meta_id=None, include_ok=False, include_especiais=False):
+    meta_expediente_id = getattr(settings, "META_EXPEDIENTE_ID", None)
+    qs = Meta.objects.order_by("id")
+    if meta_id:
+        qs = qs.filter(id=meta_id)
+    elif meta_expediente_id and not include_especiais:
+        qs = qs.exclude(id=meta_expediente_id)
+
+    # Filtro inicial para reduzir volume quando nao for incluir "ok".
+    if not include_ok:
+        qs = qs.filter(
+            Q(atividade__isnull=True)
+            | Q(atividade__ativo=False)
+            | ~Q(atividade__unidade_origem_id=F("unidade_criadora_id"))
+            | ~Q(titulo=F("atividade__titulo"))
+        )
+    return qs
+
+
+def _motivos(meta):
+    atividade = meta.atividade
+    if atividade is None:
+        return ["SEM_ATIVIDADE"]
+    motivos = []
+    if not atividade.ativo:
+        motivos.append("ATIVIDADE_INATIVA")
+    if atividade.unidade_origem_id != meta.unidade_criadora_id:
+        motivos.append("UNIDADE_DIVERGENTE")
+    if _norm(meta.titulo) != _norm(atividade.titulo):
+        motivos.append("TITULO_DIVERGENTE")
+    return motivos
+
+
+def auditar_metas(*, unidade_ids=None, ate_id=None, lote=500, **filtros):
+    """
+    Audita as metas em lotes por chave (id > ultimo id), sem carregar tudo de uma vez.
+    Com ``unidade_ids`` restringe as metas criadas por essas unidades; com ``ate_id``
+    para no id de corte calculado a partir do --limit.
+    """
+    qs = _metas_qs(**filtros).select_related("atividade").only(
+        "id",
+        "titulo",
+        "unidade_criadora_id",
+        "atividade_id",
+        "atividade__titulo",
+        "atividade__ativo",
+        "atividade__unidade_origem_id",
+    )
+    if unidade_ids is not None:
+        qs = qs.filter(unidade_criadora_id__in=unidade_ids)
+    if ate_id is not None:
+        qs = qs.filter(id__lte=ate_id)
+
+    linhas = []
+    analisadas = 0
+    suspeitas = 0
+    tempos = {"consulta": 0.0, "analise": 0.0}
+    ultimo_id = 0
+    while True:
+        inicio = time.perf_counter()
+        metas = list(qs.filter(id__gt=ultimo_id)[:lote])
+        tempos["consulta"] += time.perf_counter() - inicio
+        if not metas:
+            break
+
+        inicio = time.perf_counter()
+        for meta in metas:
+            motivos = _motivos(meta)
+            if motivos:
+                suspeitas += 1
+            elif not filtros.get("include_ok"):
+                continue
+            atividade = meta.atividade
+            linhas.append(
+                {
+                    "meta_id": meta.id,
+                    "atividade_id": meta.atividade_id,
+                    "unidade_meta": meta.unidade_criadora_id,
+                    "unidade_atividade": atividade.unidade_origem_id if atividade else None,
+                    "status": "SUSPEITA" if motivos else "OK",
+                    "motivos": motivos,
+                    "meta_titulo": (meta.titulo or "").strip(),
+                    "atividade_titulo": ((atividade.titulo if atividade else "") or "").strip(),
+                }
+            )
+        analisadas += len(metas)
+        tempos["analise"] += time.perf_counter() - inicio
+
+        ultimo_id = metas[-1].id
+        if len(metas) < lote:
+            break
+    return {"linhas": linhas, "analisadas": analisadas, "suspeitas": suspeitas, "tempos": tempos}
+
+
+def _iniciar_worker():
+    # Em "spawn" o processo filho chega sem as apps carregadas.
+    import django
+
+    django.setup()
+
+
+def _auditar_ramo(kwargs):
+    try:
+        return auditar_metas(**kwargs)
+    finally:
+        connections.close_all()
+
+
+def ramos_de_unidades(workers):
+    """
+    Divide as unidades em ate ``workers`` grupos de subarvores disjuntas: cada
+    filho direto de uma raiz (com seus descendentes) e um ramo, e os ramos sao
+    distribuidos pelo numero de metas criadas para equilibrar os processos.
+    """
+    pais = dict(No.objects.values_list("id", "parent_id"))
+    ramo_de = {}
+
+    def ramo(unidade_id):
+        caminho = []
+        atual = unidade_id
+        while atual not in ramo_de:
+            pai = pais.get(atual)
+            if pai is None or pais.get(pai) is None:
+                ramo_de[atual] = atual
+                break
+            caminho.append(atual)
+            atual = pai
+        for unidade in caminho:
+            ramo_de[unidade] = ramo_de[atual]
+        return ramo_de[atual]
+
+    ramos = {}
+    for unidade_id in pais:
+        ramos.setdefault(ramo(unidade_id), []).append(unidade_id)
+
+    metas_por_unidade = dict(
+        Meta.objects.order_by()
+        .values("unidade_criadora_id")
+        .annotate(total=Count("id"))
+        .values_list("unidade_criadora_id", "total")
+    )
+    pesos = {
+        raiz: sum(metas_por_unidade.get(unidade_id, 0) for unidade_id in unidades)
+        for raiz, unidades in ramos.items()
+    }
+    grupos = [[] for _ in range(max(1, min(workers, len(ramos))))]
+    cargas = [0] * len(grupos)
+    for raiz in sorted(ramos, key=lambda r: (-pesos[r], r)):
+        indice = cargas.index(min(cargas))
+        grupos[indice].extend(ramos[raiz])
+        cargas[indice] += pesos[raiz]
+    return [sorted(grupo) for grupo in grupos if grupo]
+
+
+def corrigir_titulos(meta_ids, *, dry_run=False):
+    """
+    Copia o titulo da atividade para as metas com TITULO_DIVERGENTE, como faz o
+    sinal de sincronizacao ao salvar a atividade. Retorna [(meta_id, de, para)].
+    """
+    correcoes = []
+    metas = (
+        Meta.objects.filter(id__in=meta_ids, atividade__isnull=False)
+        .select_related("atividade")
+        .only("id", "titulo", "unidade_criadora_id", "atividade__titulo")
+        .order_by("id")
+    )
+    for meta in metas:
+        titulo = (meta.atividade.titulo or "").strip()
+        if titulo and titulo != meta.titulo:
+            correcoes.append((meta, titulo))
+    if dry_run or not correcoes:
+        return [(meta.id, meta.titulo, titulo) for meta, titulo in correcoes]
+
+    ids = [meta.id for meta, _ in correcoes]
+    with transaction.atomic():
+        for meta, titulo in correcoes:
+            Meta.objects.filter(pk=meta.pk).update(titulo=titulo)
+        unidades = {meta.unidade_criadora_id for meta, _ in correcoes}
+        unidades.update(MetaAlocacao.objects.filter(meta_id__in=ids).values_list("unidade_id", flat=True))
+        for unidade_id in sorted(unidades):
+            incrementar_versao_dados(unidade_id, ESCOPO_CADASTROS)
+            incrementar_versao_dados(unidade_id, ESCOPO_METAS)
+    return [(meta.id, meta.titulo, titulo) for meta, titulo in correcoes]
+
+
 class Command(BaseCommand):
     help = "Audita vinculos de metas com atividades e lista possiveis inconsistencias."
 
@@ -23,73 +228,157 @@ class Command(BaseCommand):
             "--limit",
             type=int,
             default=500,
-            help="Limite maximo de metas processadas (padrao: 500).",
+            help="Limite maximo de metas processadas (padrao: 500; 0 = sem limite).",
         )
         parser.add_argument(
             "--include-especiais",
             action="store_true",
             help="Inclui metas especiais conhecidas (ex.: expediente sem atividade).",
         )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=500,
+            help="Quantidade de metas lidas por consulta (padrao: 500).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processos paralelos; cada um audita subarvores de unidades disjuntas (padrao: 1).",
+        )
+        parser.add_argument(
+            "--formato",
+            choices=("texto", "json", "csv"),
+            default="texto",
+            help="Formato da saida (padrao: texto). Em csv os tempos vao para stderr.",
+        )
+        parser.add_argument(
+            "--corrigir",
+            action="store_true",
+            help="Copia o titulo da atividade para as metas com TITULO_DIVERGENTE.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Com --corrigir, apenas lista as correcoes sem gravar.",
+        )
 
     def handle(self, *args, **options):
-        meta_id = options.get("meta_id")
-        include_ok = options.get("include_ok", False)
-        include_especiais = options.get("include_especiais", False)
-        limit = max(1, int(options.get("limit") or 500))
-        meta_expediente_id = getattr(settings, "META_EXPEDIENTE_ID", None)
-
-        qs = Meta.objects.select_related("atividade", "unidade_criadora").order_by("id")
-        if meta_id:
-            qs = qs.filter(id=meta_id)
-        elif meta_expediente_id and not include_especiais:
-            qs = qs.exclude(id=meta_expediente_id)
-
-        # Filtro inicial para reduzir volume quando nao for incluir "ok".
-        if not include_ok:
-            qs = qs.filter(
-                Q(atividade__isnull=True)
-                | Q(atividade__ativo=False)
-                | ~Q(atividade__unidade_origem_id=F("unidade_criadora_id"))
-                | ~Q(titulo=F("atividade__titulo"))
+        inicio_total = time.perf_counter()
+        filtros = {
+            "meta_id": options.get("meta_id"),
+            "include_ok": options.get("include_ok", False),
+            "include_especiais": options.get("include_especiais", False),
+        }
+        limit = max(0, int(options.get("limit") or 0))
+        lote = max(1, int(options.get("lote") or 500))
+        workers = max(1, int(options.get("workers") or 1))
+        formato = options.get("formato") or "texto"
+        corrigir = options.get("corrigir", False)
+        dry_run = options.get("dry_run", False)
+        if dry_run and not corrigir:
+            raise CommandError("--dry-run so se aplica junto com --corrigir.")
+        tempos = dict.fromkeys(FASES, 0.0)
+
+        # O limite vira um id de corte, valido tanto para o modo serial quanto para os processos.
+        ate_id = None
+        if limit:
+            inicio = time.perf_counter()
+            ate_id = _metas_qs(**filtros).values_list("id", flat=True)[limit - 1:limit].first()
+            tempos["consulta"] += time.perf_counter() - inicio
+
+        tarefas = [{**filtros, "ate_id": ate_id, "lote": lote}]
+        if workers > 1 and not filtros["meta_id"]:
+            tarefas = [{**tarefas[0], "unidade_ids": grupo} for grupo in ramos_de_unidades(workers)]
+
+        if len(tarefas) > 1:
+            # Cada processo abre sua propria conexao; nao herdar a do processo pai.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=len(tarefas), initializer=_iniciar_worker) as executor:
+                resultados = list(executor.map(_auditar_ramo, tarefas))
+        else:
+            resultados = [auditar_metas(**tarefas[0])]
+
+        linhas = sorted((linha for r in resultados for linha in r["linhas"]), key=lambda linha: linha["meta_id"])
+        analisadas = sum(r["analisadas"] for r in resultados)
+        suspeitas = sum(r["suspeitas"] for r in resultados)
+        for resultado in resultados:
+            for fase, segundos in resultado["tempos"].items():
+                tempos[fase] += segundos
+
+        correcoes = []
+        if corrigir:
+            inicio = time.perf_counter()
+            divergentes = [linha["meta_id"] for linha in linhas if "TITULO_DIVERGENTE" in linha["motivos"]]
+            correcoes = corrigir_titulos(divergentes, dry_run=dry_run)
+            tempos["correcao"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        if formato == "json":
+            tempos["saida"] = time.perf_counter() - inicio
+            tempos["total"] = time.perf_counter() - inicio_total
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "metas": linhas,
+                        "total_analisadas": analisadas,
+                        "total_suspeitas": suspeitas,
+                        "correcoes": [
+                            {"meta_id": meta_id, "de": de, "para": para} for meta_id, de, para in correcoes
+                        ],
+                        "correcoes_gravadas": bool(corrigir and not dry_run),
+                        "tempos": {fase: round(segundos, 4) for fase, segundos in tempos.items()},
+                    },
+                    ensure_ascii=False,
+                )
             )
+            return
 
-        metas = list(qs[:limit])
-        if not metas:
+        if formato == "csv":
+            writer = csv.writer(self.stdout, lineterminator="\n")
+            writer.writerow(CAMPOS_SAIDA)
+            for linha in linhas:
+                writer.writerow(
+                    ["|".join(linha[campo]) if campo == "motivos" else linha[campo] for campo in CAMPOS_SAIDA]
+                )
+            tempos["saida"] = time.perf_counter() - inicio
+            tempos["total"] = time.perf_counter() - inicio_total
+            self._escrever_tempos(tempos, self.stderr)
+            return
+
+        if not analisadas:
             self.stdout.write(self.style.SUCCESS("Nenhuma meta encontrada para os filtros informados."))
             return
 
-        inconsistentes = 0
         self.stdout.write(
             "meta_id | atividade_id | unidade_meta | unidade_atividade | status | motivos | meta_titulo | atividade_titulo"
         )
-        for meta in metas:
-            atividade = meta.atividade
-            motivos = []
-            if atividade is None:
-                motivos.append("SEM_ATIVIDADE")
-            else:
-                if not atividade.ativo:
-                    motivos.append("ATIVIDADE_INATIVA")
-                if atividade.unidade_origem_id != meta.unidade_criadora_id:
-                    motivos.append("UNIDADE_DIVERGENTE")
-                if _norm(meta.titulo) != _norm(atividade.titulo):
-                    motivos.append("TITULO_DIVERGENTE")
-
-            status = "SUSPEITA" if motivos else "OK"
-            if motivos:
-                inconsistentes += 1
-            if include_ok or motivos:
-                self.stdout.write(
-                    f"{meta.id} | "
-                    f"{meta.atividade_id or '-'} | "
-                    f"{meta.unidade_criadora_id or '-'} | "
-                    f"{(atividade.unidade_origem_id if atividade else '-')} | "
-                    f"{status} | "
-                    f"{','.join(motivos) if motivos else '-'} | "
-                    f"{(meta.titulo or '').strip()} | "
-                    f"{((atividade.titulo if atividade else '') or '').strip()}"
-                )
+        for linha in linhas:
+            self.stdout.write(
+                f"{linha['meta_id']} | "
+                f"{linha['atividade_id'] or '-'} | "
+                f"{linha['unidade_meta'] or '-'} | "
+                f"{linha['unidade_atividade'] or '-'} | "
+                f"{linha['status']} | "
+                f"{','.join(linha['motivos']) if linha['motivos'] else '-'} | "
+                f"{linha['meta_titulo']} | "
+                f"{linha['atividade_titulo']}"
+            )
 
         self.stdout.write("")
-        self.stdout.write(f"Total analisadas: {len(metas)}")
-        self.stdout.write(f"Total suspeitas: {inconsistentes}")
+        self.stdout.write(f"Total analisadas: {analisadas}")
+        self.stdout.write(f"Total suspeitas: {suspeitas}")
+        if corrigir:
+            rotulo = "Titulos a corrigir (dry-run)" if dry_run else "Titulos corrigidos"
+            self.stdout.write(self.style.SUCCESS(f"{rotulo}: {len(correcoes)}"))
+            for meta_id, de, para in correcoes:
+                self.stdout.write(f"  meta {meta_id}: {de!r} -> {para!r}")
+        tempos["saida"] = time.perf_counter() - inicio
+        tempos["total"] = time.perf_counter() - inicio_total
+        self.stdout.write("")
+        self._escrever_tempos(tempos, self.stdout)
+
+    def _escrever_tempos(self, tempos, destino):
+        for fase, segundos in tempos.items():
+            destino.write(f"Tempo {fase}: {segundos:.3f}s")
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from metas.models import Meta
+from metas.services import atualizar_contadores_metas, divergencias_contadores_metas
+
+
+class Command(BaseCommand):
+    help = "Compara os contadores de execucao de metas/alocacoes com os itens de programacao e corrige divergencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meta-id", type=int, help="Reconciliar apenas uma meta especifica.")
+        parser.add_argument(
+            "--corrigir",
+            action="store_true",
+            help="Grava os contadores recalculados nas metas divergentes (padrao: apenas relata).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=200,
+            help="Quantidade de metas verificadas por consulta (padrao: 200).",
+        )
+
+    def handle(self, *args, **options):
+        meta_id = options.get("meta_id")
+        corrigir = options.get("corrigir", False)
+        lote = max(1, int(options.get("lote") or 200))
+
+        qs = Meta.objects.order_by("id").values_list("id", flat=True)
+        if meta_id:
+            qs = qs.filter(id=meta_id)
+        meta_ids = list(qs)
+        if not meta_ids:
+            self.stdout.write(self.style.SUCCESS("Nenhuma meta encontrada para os filtros informados."))
+            return
+
+        divergentes: set[int] = set()
+        total_registros = 0
+        self.stdout.write("tipo | id | meta_id | campos")
+        for inicio in range(0, len(meta_ids), lote):
+            for obj, campos in divergencias_contadores_metas(meta_ids[inicio:inicio + lote]):
+                tipo = "meta" if isinstance(obj, Meta) else "alocacao"
+                obj_meta_id = obj.id if tipo == "meta" else obj.meta_id
+                divergentes.add(obj_meta_id)
+                total_registros += 1
+                self.stdout.write(f"{tipo} | {obj.id} | {obj_meta_id} | {','.join(campos)}")
+
+        corrigidos = 0
+        if corrigir and divergentes:
+            corrigidos = atualizar_contadores_metas(sorted(divergentes), movimentacao=False)
+
+        self.stdout.write("")
+        self.stdout.write(f"Total analisadas: {len(meta_ids)}")
+        self.stdout.write(f"Registros divergentes: {total_registros}")
+        if corrigir:
+            self.stdout.write(self.style.SUCCESS(f"Registros corrigidos: {corrigidos}"))
+        elif divergentes:
+            self.stdout.write("Execute novamente com --corrigir para gravar os valores recalculados.")
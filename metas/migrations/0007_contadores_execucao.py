@@ -0,0 +1,123 @@
+# Generated by Django 5.2.12 on 2026-10-18 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metas', '0006_meta_modo_alocacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meta',
+            name='exec_canceladas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_concluidas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_justificadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_nao_realizada_desde',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_nao_realizadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_pendente_desde',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_pendentes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_primeira_data',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_programadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='exec_ultima_data',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='meta',
+            name='ultima_movimentacao_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_canceladas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_concluidas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_justificadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_nao_realizada_desde',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_nao_realizadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_pendente_desde',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_pendentes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_primeira_data',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_programadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='exec_ultima_data',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metaalocacao',
+            name='ultima_movimentacao_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q
+
+CAMPOS_SOMA = (
+    "exec_programadas",
+    "exec_concluidas",
+    "exec_justificadas",
+    "exec_canceladas",
+    "exec_nao_realizadas",
+    "exec_pendentes",
+)
+CAMPOS_DATA_MIN = ("exec_primeira_data", "exec_pendente_desde", "exec_nao_realizada_desde")
+
+
+def preencher_contadores(apps, schema_editor):
+    ProgramacaoItem = apps.get_model("programar", "ProgramacaoItem")
+    Meta = apps.get_model("metas", "Meta")
+    MetaAlocacao = apps.get_model("metas", "MetaAlocacao")
+
+    if ProgramacaoItem._meta.db_table not in schema_editor.connection.introspection.table_names():
+        return
+
+    nao_realizada_q = Q(concluido=False, concluido_em__isnull=False, cancelada=False, nao_realizada_justificada=False)
+    pendente_q = Q(concluido=False, concluido_em__isnull=True, cancelada=False, nao_realizada_justificada=False)
+    itens = ProgramacaoItem.objects.all()
+    meta_expediente_id = getattr(settings, "META_EXPEDIENTE_ID", None)
+    if meta_expediente_id is not None:
+        itens = itens.exclude(meta_id=meta_expediente_id)
+
+    linhas = (
+        itens.order_by()
+        .values("meta_id", "programacao__unidade_id")
+        .annotate(
+            exec_programadas=Count(
+                "id",
+                filter=Q(cancelada=False)
+                & (Q(concluido=True) | Q(concluido_em__isnull=True) | Q(nao_realizada_justificada=True)),
+            ),
+            exec_concluidas=Count("id", filter=Q(concluido=True)),
+            exec_justificadas=Count("id", filter=Q(concluido=False, nao_realizada_justificada=True)),
+            exec_canceladas=Count("id", filter=Q(cancelada=True)),
+            exec_nao_realizadas=Count("id", filter=nao_realizada_q),
+            exec_pendentes=Count("id", filter=pendente_q),
+            exec_primeira_data=Min("programacao__data"),
+            exec_ultima_data=Max("programacao__data"),
+            exec_pendente_desde=Min("programacao__data", filter=pendente_q),
+            exec_nao_realizada_desde=Min("programacao__data", filter=nao_realizada_q),
+        )
+    )
+
+    por_meta = {}
+    por_meta_unidade = {}
+    for linha in linhas:
+        meta_id = linha.pop("meta_id")
+        unidade_id = linha.pop("programacao__unidade_id")
+        por_meta_unidade[(meta_id, unidade_id)] = linha
+        total = por_meta.get(meta_id)
+        if total is None:
+            por_meta[meta_id] = dict(linha)
+            continue
+        for campo in CAMPOS_SOMA:
+            total[campo] += linha[campo]
+        for campo in CAMPOS_DATA_MIN:
+            if linha[campo] is not None and (total[campo] is None or linha[campo] < total[campo]):
+                total[campo] = linha[campo]
+        if linha["exec_ultima_data"] and (
+            total["exec_ultima_data"] is None or linha["exec_ultima_data"] > total["exec_ultima_data"]
+        ):
+            total["exec_ultima_data"] = linha["exec_ultima_data"]
+
+    campos = list(CAMPOS_SOMA) + ["exec_primeira_data", "exec_ultima_data", "exec_pendente_desde", "exec_nao_realizada_desde"]
+
+    metas_to_update = []
+    for meta in Meta.objects.filter(id__in=list(por_meta.keys())).only("id").iterator():
+        for campo, valor in por_meta[meta.id].items():
+            setattr(meta, campo, valor)
+        metas_to_update.append(meta)
+    if metas_to_update:
+        Meta.objects.bulk_update(metas_to_update, campos, batch_size=500)
+
+    alocacoes_to_update = []
+    alocacoes_qs = MetaAlocacao.objects.filter(meta_id__in=list(por_meta.keys())).only("id", "meta_id", "unidade_id")
+    for aloc in alocacoes_qs.iterator():
+        valores = por_meta_unidade.get((aloc.meta_id, aloc.unidade_id))
+        if not valores:
+            continue
+        for campo, valor in valores.items():
+            setattr(aloc, campo, valor)
+        alocacoes_to_update.append(aloc)
+    if alocacoes_to_update:
+        MetaAlocacao.objects.bulk_update(alocacoes_to_update, campos, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("metas", "0007_contadores_execucao"),
+        ("programar", "0007_programacaoitem_abertos_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.12 on 2026-10-18 23:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_versaodados'),
+        ('metas', '0008_preencher_contadores_execucao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressoMetaAgregado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(choices=[('semana', 'Semana'), ('mes', 'Mes')], max_length=8)),
+                ('inicio', models.DateField()),
+                ('mes', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('meta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='metas.meta')),
+                ('unidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.no')),
+            ],
+            options={
+                'verbose_name': 'Progresso agregado de Meta',
+                'verbose_name_plural': 'Progresso agregado de Metas',
+                'indexes': [models.Index(fields=['periodo', 'mes', 'unidade'], name='metas_progr_periodo_9e0e6c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('unidade', 'meta', 'periodo', 'mes', 'inicio'), name='uq_progresso_agregado_balde')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Sum
+
+PERIODO_SEMANA = "semana"
+PERIODO_MES = "mes"
+
+
+def preencher_progresso_agregado(apps, schema_editor):
+    ProgressoMeta = apps.get_model("metas", "ProgressoMeta")
+    ProgressoMetaAgregado = apps.get_model("metas", "ProgressoMetaAgregado")
+
+    totais = defaultdict(int)
+    linhas = (
+        ProgressoMeta.objects.order_by()
+        .values("alocacao__unidade_id", "alocacao__meta_id", "data")
+        .annotate(total=Sum("quantidade"))
+    )
+    for linha in linhas.iterator():
+        unidade_id = linha["alocacao__unidade_id"]
+        meta_id = linha["alocacao__meta_id"]
+        data = linha["data"]
+        mes = data.replace(day=1)
+        semana = data - timedelta(days=data.weekday())
+        totais[(unidade_id, meta_id, PERIODO_SEMANA, mes, semana)] += linha["total"] or 0
+        totais[(unidade_id, meta_id, PERIODO_MES, mes, mes)] += linha["total"] or 0
+
+    ProgressoMetaAgregado.objects.bulk_create(
+        [
+            ProgressoMetaAgregado(
+                unidade_id=unidade_id,
+                meta_id=meta_id,
+                periodo=periodo,
+                mes=mes,
+                inicio=inicio,
+                total=total,
+            )
+            for (unidade_id, meta_id, periodo, mes, inicio), total in totais.items()
+            if total
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("metas", "0009_progresso_agregado"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_progresso_agregado, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 # metas/models.py
 from django.conf import settings
 from django.db import models
-from django.db.models import Sum, Q, CheckConstraint
+from django.db.models import Sum, Q, CheckConstraint, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.query import ModelIterable
 from django.utils import timezone
 
 # usar o valor de AUTH_USER_MODEL (string) é ok ao passar para ForeignKey
@@ -10,7 +12,112 @@ User = settings.AUTH_USER_MODEL
 from core.models import No as Unidade  # assume que core está correto e importável
 
 
-class Meta(models.Model):
+def _soma_por_meta(queryset, campo_meta: str, campo_soma: str, ref: str = "pk"):
+    """Subquery escalar: soma de ``campo_soma`` agrupada por meta, correlacionada a ``ref``."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{campo_meta: OuterRef(ref)})
+            .order_by()
+            .values(campo_meta)
+            .annotate(total=Sum(campo_soma))
+            .values("total")[:1],
+            output_field=models.IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _valor_anotado(obj, nome: str):
+    """Valor anotado por with_execucao()/with_saldo(), ou None quando nao anotado."""
+    return obj.__dict__.get(nome)
+
+
+def _descartar_anotacoes(obj, *nomes: str) -> None:
+    for nome in nomes:
+        obj.__dict__.pop(nome, None)
+
+
+class MetaQuerySet(models.QuerySet):
+    def with_execucao(self):
+        """
+        Anota alocado_total e realizado_total em uma unica consulta; as propriedades
+        derivadas (percentual_execucao, concluida, atrasada) passam a nao consultar o banco.
+        """
+        return self.annotate(
+            _alocado_total=_soma_por_meta(MetaAlocacao.objects.all(), "meta", "quantidade_alocada"),
+            _realizado_total=_soma_por_meta(ProgressoMeta.objects.all(), "alocacao__meta", "quantidade"),
+        )
+
+
+class _AlocacaoComMetaIterable(ModelIterable):
+    def __iter__(self):
+        for aloc in super().__iter__():
+            meta = aloc.meta
+            meta.__dict__["_alocado_total"] = aloc.__dict__.pop("_meta_alocado_total", None)
+            meta.__dict__["_realizado_total"] = aloc.__dict__.pop("_meta_realizado_total", None)
+            yield aloc
+
+
+class MetaAlocacaoQuerySet(models.QuerySet):
+    def with_saldo(self, *, com_meta: bool = False):
+        """
+        Anota o realizado de cada alocacao (saldo e percentual derivam dele). Com
+        ``com_meta=True`` tambem anota a execucao da meta relacionada (select_related).
+        """
+        qs = self.annotate(
+            _realizado=Coalesce(
+                Subquery(
+                    ProgressoMeta.objects.filter(alocacao=OuterRef("pk"))
+                    .order_by()
+                    .values("alocacao")
+                    .annotate(total=Sum("quantidade"))
+                    .values("total")[:1],
+                    output_field=models.IntegerField(),
+                ),
+                Value(0),
+            )
+        )
+        if not com_meta:
+            return qs
+        qs = qs.select_related("meta").annotate(
+            _meta_alocado_total=_soma_por_meta(
+                MetaAlocacao.objects.all(), "meta", "quantidade_alocada", ref="meta_id"
+            ),
+            _meta_realizado_total=_soma_por_meta(
+                ProgressoMeta.objects.all(), "alocacao__meta", "quantidade", ref="meta_id"
+            ),
+        )
+        qs._iterable_class = _AlocacaoComMetaIterable
+        return qs
+
+
+class ContadoresExecucao(models.Model):
+    """
+    Contadores de itens de programacao mantidos por metas.services.contadores_service
+    (na Meta: todas as unidades; na MetaAlocacao: itens da unidade alocada).
+    """
+
+    exec_programadas = models.PositiveIntegerField(default=0)
+    exec_concluidas = models.PositiveIntegerField(default=0)
+    exec_justificadas = models.PositiveIntegerField(default=0)
+    exec_canceladas = models.PositiveIntegerField(default=0)
+    exec_nao_realizadas = models.PositiveIntegerField(default=0)
+    exec_pendentes = models.PositiveIntegerField(default=0)
+    exec_primeira_data = models.DateField(null=True, blank=True)
+    exec_ultima_data = models.DateField(null=True, blank=True)
+    exec_pendente_desde = models.DateField(null=True, blank=True)
+    exec_nao_realizada_desde = models.DateField(null=True, blank=True)
+    ultima_movimentacao_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def exec_solucionadas(self) -> int:
+        return int(self.exec_concluidas or 0) + int(self.exec_justificadas or 0)
+
+
+class Meta(ContadoresExecucao):
     MODO_ALOCACAO_AUTO = "auto"
     MODO_ALOCACAO_MANUAL = "manual"
     MODO_ALOCACAO_CHOICES = (
@@ -42,6 +149,8 @@ class Meta(models.Model):
         default=MODO_ALOCACAO_MANUAL,
     )
 
+    objects = MetaQuerySet.as_manager()
+
     class Meta:
         ordering = ["-criado_em"]
         indexes = [
@@ -78,30 +187,24 @@ class Meta(models.Model):
             self.titulo = str(self.titulo).strip()
         super().save(*args, **kwargs)
 
+    def refresh_from_db(self, *args, **kwargs):
+        _descartar_anotacoes(self, "_alocado_total", "_realizado_total")
+        super().refresh_from_db(*args, **kwargs)
+
     @property
     def alocado_total(self) -> int:
+        anotado = _valor_anotado(self, "_alocado_total")
+        if anotado is not None:
+            return int(anotado)
         return self.alocacoes.aggregate(total=Sum("quantidade_alocada"))["total"] or 0
 
     @property
     def realizado_total(self) -> int:
-        """
-        Soma todo o progresso ligado às alocações desta meta de forma segura:
-        - tenta agregação direta via related lookups;
-        - em caso de erro (cenários raros) faz fallback iterativo.
-        """
-        try:
-            total = self.alocacoes.aggregate(total=Sum("progresso__quantidade"))["total"]
-            return total or 0
-        except Exception:
-            # fallback mais robusto
-            try:
-                total = 0
-                for al in self.alocacoes.all():
-                    t = al.progresso.aggregate(total=Sum("quantidade"))["total"] or 0
-                    total += t
-                return total
-            except Exception:
-                return 0
+        """Soma todo o progresso ligado as alocacoes desta meta (anotado por with_execucao())."""
+        anotado = _valor_anotado(self, "_realizado_total")
+        if anotado is not None:
+            return int(anotado)
+        return self.alocacoes.aggregate(total=Sum("progresso__quantidade"))["total"] or 0
 
     @property
     def percentual_execucao(self) -> float:
@@ -123,7 +226,7 @@ class Meta(models.Model):
         return self.modo_alocacao == self.MODO_ALOCACAO_AUTO
 
 
-class MetaAlocacao(models.Model):
+class MetaAlocacao(ContadoresExecucao):
     meta = models.ForeignKey(Meta, on_delete=models.CASCADE, related_name="alocacoes")
     unidade = models.ForeignKey(Unidade, on_delete=models.PROTECT, related_name="metas_recebidas")
     quantidade_alocada = models.PositiveIntegerField()
@@ -134,6 +237,8 @@ class MetaAlocacao(models.Model):
     atribuida_em = models.DateTimeField(auto_now_add=True)
     observacao = models.CharField(max_length=255, blank=True)
 
+    objects = MetaAlocacaoQuerySet.as_manager()
+
     class Meta:
         unique_together = [("meta", "unidade", "parent")]
         indexes = [
@@ -147,8 +252,15 @@ class MetaAlocacao(models.Model):
         titulo = getattr(self.meta, "display_titulo", getattr(self.meta, "titulo", "(sem título)"))
         return f"{titulo} -> {self.unidade.nome} ({self.quantidade_alocada})"
 
+    def refresh_from_db(self, *args, **kwargs):
+        _descartar_anotacoes(self, "_realizado")
+        super().refresh_from_db(*args, **kwargs)
+
     @property
     def realizado(self) -> int:
+        anotado = _valor_anotado(self, "_realizado")
+        if anotado is not None:
+            return int(anotado)
         return self.progresso.aggregate(total=Sum("quantidade"))["total"] or 0
 
     @property
@@ -186,3 +298,41 @@ class ProgressoMeta(models.Model):
     def __str__(self):
         unidade_nome = getattr(self.alocacao, "unidade", None)
         return f"{unidade_nome.nome if unidade_nome else '—'} +{self.quantidade} em {self.data}"
+
+
+class ProgressoMetaAgregado(models.Model):
+    """
+    Soma do ProgressoMeta por (unidade, meta, balde), mantida por
+    metas.services.progresso_agregado_service. Baldes semanais sao recortados no
+    mes (a semana que cruza a virada tem uma linha em cada mes).
+    """
+
+    PERIODO_SEMANA = "semana"
+    PERIODO_MES = "mes"
+    PERIODO_CHOICES = (
+        (PERIODO_SEMANA, "Semana"),
+        (PERIODO_MES, "Mes"),
+    )
+
+    unidade = models.ForeignKey(Unidade, on_delete=models.CASCADE, related_name="+")
+    meta = models.ForeignKey(Meta, on_delete=models.CASCADE, related_name="+")
+    periodo = models.CharField(max_length=8, choices=PERIODO_CHOICES)
+    inicio = models.DateField()
+    mes = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["unidade", "meta", "periodo", "mes", "inicio"],
+                name="uq_progresso_agregado_balde",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["periodo", "mes", "unidade"]),
+        ]
+        verbose_name = "Progresso agregado de Meta"
+        verbose_name_plural = "Progresso agregado de Metas"
+
+    def __str__(self):
+        return f"{self.get_periodo_display()} {self.inicio:%d/%m/%Y}: {self.total}"
@@ -1,15 +1,25 @@
+from .arvore_service import descendentes_por_filho, totais_arvore_alocacoes
+from .contadores_service import (
+    atualizar_contadores_metas,
+    divergencias_contadores_metas,
+    meta_tem_contadores,
+)
 from .meta_service import (
     filtrar_ids_no_escopo,
     get_auto_alocacao,
     meta_auto_pode_ser_sincronizada,
     meta_deve_iniciar_automatica,
     meta_esta_concluida,
+    metas_concluidas,
     metas_visiveis_por_unidade,
     resumo_execucao_meta,
+    resumos_execucao_metas,
     sincronizar_meta_auto,
     unidade_tem_filhos,
     validar_meta_no_escopo,
 )
+from .progresso_agregado_service import atualizar_progresso_agregado, chaves_progresso
+
 
 __all__ = [
     "metas_visiveis_por_unidade",
@@ -19,7 +29,16 @@ __all__ = [
     "meta_deve_iniciar_automatica",
     "meta_esta_concluida",
     "resumo_execucao_meta",
+    "metas_concluidas",
+    "resumos_execucao_metas",
     "meta_auto_pode_ser_sincronizada",
     "get_auto_alocacao",
     "sincronizar_meta_auto",
+    "atualizar_contadores_metas",
+    "divergencias_contadores_metas",
+    "meta_tem_contadores",
+    "totais_arvore_alocacoes",
+    "descendentes_por_filho",
+    "atualizar_progresso_agregado",
+    "chaves_progresso",
 ]
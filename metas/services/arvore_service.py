@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from django.db import connection
+
+from core.models import No
+from metas.models import MetaAlocacao, ProgressoMeta
+
+
+def _sql_totais_arvore(com_raiz: bool) -> str:
+    qn = connection.ops.quote_name
+    alocacao = qn(MetaAlocacao._meta.db_table)
+    progresso = qn(ProgressoMeta._meta.db_table)
+    filtro_raiz = "AND a.id = %s" if com_raiz else ""
+    # "arvore" liga cada alocacao (ancestral) a si mesma e a todos os descendentes.
+    return f"""
+        WITH RECURSIVE arvore (ancestral_id, alocacao_id, profundidade) AS (
+            SELECT a.id, a.id, 0
+            FROM {alocacao} a
+            WHERE a.meta_id = %s {filtro_raiz}
+            UNION ALL
+            SELECT arvore.ancestral_id, f.id, arvore.profundidade + 1
+            FROM {alocacao} f
+            JOIN arvore ON f.parent_id = arvore.alocacao_id
+            WHERE f.meta_id = %s
+        ),
+        realizado AS (
+            SELECT p.alocacao_id, SUM(p.quantidade) AS total
+            FROM {progresso} p
+            JOIN {alocacao} a ON a.id = p.alocacao_id
+            WHERE a.meta_id = %s
+            GROUP BY p.alocacao_id
+        ),
+        nos AS (
+            SELECT
+                arvore.ancestral_id,
+                arvore.profundidade,
+                a.parent_id,
+                a.quantidade_alocada AS alocado,
+                COALESCE(r.total, 0) AS realizado
+            FROM arvore
+            JOIN {alocacao} a ON a.id = arvore.alocacao_id
+            LEFT JOIN realizado r ON r.alocacao_id = a.id
+        )
+        SELECT
+            ancestral_id,
+            SUM(CASE WHEN profundidade = 0 THEN alocado ELSE 0 END),
+            SUM(CASE WHEN profundidade = 0 THEN realizado ELSE 0 END),
+            SUM(CASE WHEN profundidade = 1 THEN alocado ELSE 0 END),
+            SUM(realizado),
+            SUM(CASE WHEN alocado > realizado THEN alocado - realizado ELSE 0 END),
+            COUNT(*) - 1
+        FROM nos
+        GROUP BY ancestral_id
+    """
+
+
+def totais_arvore_alocacoes(meta_id: int, *, raiz_id: int | None = None) -> dict[int, dict]:
+    """
+    Totais da arvore de redistribuicao (MetaAlocacao.parent) de uma meta em uma
+    unica consulta recursiva. Para cada alocacao (ou apenas para ``raiz_id``)
+    retorna:
+    - alocado/realizado/saldo: da propria alocacao;
+    - filhos_alocado: soma redistribuida aos filhos diretos;
+    - subarvore_realizado/subarvore_saldo: da alocacao e de todos os descendentes;
+    - descendentes: quantidade de alocacoes abaixo dela.
+    """
+    params: list[int] = [meta_id]
+    if raiz_id is not None:
+        params.append(raiz_id)
+    params.extend([meta_id, meta_id])
+
+    totais: dict[int, dict] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_totais_arvore(raiz_id is not None), params)
+        for (
+            alocacao_id,
+            alocado,
+            realizado,
+            filhos_alocado,
+            subarvore_realizado,
+            subarvore_saldo,
+            descendentes,
+        ) in cursor.fetchall():
+            alocado = int(alocado or 0)
+            realizado = int(realizado or 0)
+            totais[int(alocacao_id)] = {
+                "alocado": alocado,
+                "realizado": realizado,
+                "saldo": max(0, alocado - realizado),
+                "filhos_alocado": int(filhos_alocado or 0),
+                "subarvore_realizado": int(subarvore_realizado or 0),
+                "subarvore_saldo": int(subarvore_saldo or 0),
+                "descendentes": int(descendentes or 0),
+            }
+    return totais
+
+
+def descendentes_por_filho(raiz: No) -> list[tuple[No, list[No]]]:
+    """
+    Subarvore de ``raiz`` em uma consulta recursiva, agrupada por filho direto:
+    [(filho, [filho, descendentes...])], com os filhos de cada nivel em ordem de
+    nome e os descendentes em largura, como a tela de atribuicao exibe.
+    """
+    tabela = connection.ops.quote_name(No._meta.db_table)
+    sql = f"""
+        WITH RECURSIVE sub (id) AS (
+            SELECT n.id FROM {tabela} n WHERE n.parent_id = %s
+            UNION
+            SELECT n.id FROM {tabela} n JOIN sub ON n.parent_id = sub.id
+        )
+        SELECT n.id, n.nome, n.tipo, n.parent_id
+        FROM {tabela} n
+        JOIN sub ON sub.id = n.id
+        ORDER BY n.nome, n.id
+    """
+    filhos_de: dict[int, list[No]] = {}
+    for nodo in No.objects.raw(sql, [raiz.pk]):
+        filhos_de.setdefault(nodo.parent_id, []).append(nodo)
+
+    grupos = []
+    for filho in filhos_de.get(raiz.pk, []):
+        unidades = [filho]
+        vistos = {raiz.pk, filho.pk}
+        # "unidades" cresce enquanto e percorrida: busca em largura.
+        for atual in unidades:
+            for neto in filhos_de.get(atual.pk, []):
+                if neto.pk not in vistos:
+                    vistos.add(neto.pk)
+                    unidades.append(neto)
+        grupos.append((filho, unidades))
+    return grupos
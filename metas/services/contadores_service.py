@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from metas.models import Meta, MetaAlocacao
+from programar.models import ProgramacaoItem
+from programar.querysets import item_conta_como_programado_q
+
+CAMPOS_CONTADORES = (
+    "exec_programadas",
+    "exec_concluidas",
+    "exec_justificadas",
+    "exec_canceladas",
+    "exec_nao_realizadas",
+    "exec_pendentes",
+    "exec_primeira_data",
+    "exec_ultima_data",
+    "exec_pendente_desde",
+    "exec_nao_realizada_desde",
+)
+_CAMPOS_SOMA = CAMPOS_CONTADORES[:6]
+
+_NAO_REALIZADA_Q = Q(
+    concluido=False,
+    concluido_em__isnull=False,
+    cancelada=False,
+    nao_realizada_justificada=False,
+)
+_PENDENTE_Q = Q(
+    concluido=False,
+    concluido_em__isnull=True,
+    cancelada=False,
+    nao_realizada_justificada=False,
+)
+
+
+def _meta_expediente_id() -> int | None:
+    try:
+        valor = getattr(settings, "META_EXPEDIENTE_ID", None)
+        return int(valor) if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def meta_tem_contadores(meta_id: int | None) -> bool:
+    """A meta de expediente nao mantem contadores (itens diarios de todas as unidades)."""
+    return bool(meta_id) and int(meta_id) != _meta_expediente_id()
+
+
+def _normalizar_ids(meta_ids: Iterable[int | None]) -> list[int]:
+    ids: set[int] = set()
+    for meta_id in meta_ids:
+        try:
+            meta_id_int = int(meta_id)
+        except (TypeError, ValueError):
+            continue
+        if meta_tem_contadores(meta_id_int):
+            ids.add(meta_id_int)
+    return sorted(ids)
+
+
+def _contadores_vazios() -> dict:
+    return {campo: (0 if campo in _CAMPOS_SOMA else None) for campo in CAMPOS_CONTADORES}
+
+
+def _menor(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def _maior(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def calcular_contadores_metas(meta_ids: Iterable[int]) -> tuple[dict[int, dict], dict[tuple[int, int], dict]]:
+    """
+    Contadores esperados em uma consulta agrupada por (meta, unidade).
+    Retorna (por_meta, por_meta_unidade); metas sem itens ficam zeradas.
+    """
+    ids = _normalizar_ids(meta_ids)
+    por_meta: dict[int, dict] = {meta_id: _contadores_vazios() for meta_id in ids}
+    por_meta_unidade: dict[tuple[int, int], dict] = {}
+    if not ids:
+        return por_meta, por_meta_unidade
+
+    linhas = (
+        ProgramacaoItem.objects.filter(meta_id__in=ids)
+        .order_by()
+        .values("meta_id", "programacao__unidade_id")
+        .annotate(
+            exec_programadas=Count("id", filter=item_conta_como_programado_q()),
+            exec_concluidas=Count("id", filter=Q(concluido=True)),
+            exec_justificadas=Count("id", filter=Q(concluido=False, nao_realizada_justificada=True)),
+            exec_canceladas=Count("id", filter=Q(cancelada=True)),
+            exec_nao_realizadas=Count("id", filter=_NAO_REALIZADA_Q),
+            exec_pendentes=Count("id", filter=_PENDENTE_Q),
+            exec_primeira_data=Min("programacao__data"),
+            exec_ultima_data=Max("programacao__data"),
+            exec_pendente_desde=Min("programacao__data", filter=_PENDENTE_Q),
+            exec_nao_realizada_desde=Min("programacao__data", filter=_NAO_REALIZADA_Q),
+        )
+    )
+    for linha in linhas:
+        meta_id = int(linha["meta_id"])
+        valores = {campo: linha[campo] for campo in CAMPOS_CONTADORES}
+        for campo in _CAMPOS_SOMA:
+            valores[campo] = int(valores[campo] or 0)
+        por_meta_unidade[(meta_id, int(linha["programacao__unidade_id"]))] = valores
+
+        total = por_meta[meta_id]
+        for campo in _CAMPOS_SOMA:
+            total[campo] += valores[campo]
+        for campo in ("exec_primeira_data", "exec_pendente_desde", "exec_nao_realizada_desde"):
+            total[campo] = _menor(total[campo], valores[campo])
+        total["exec_ultima_data"] = _maior(total["exec_ultima_data"], valores["exec_ultima_data"])
+    return por_meta, por_meta_unidade
+
+
+def _divergentes(obj, esperado: dict) -> list[str]:
+    return [campo for campo in CAMPOS_CONTADORES if getattr(obj, campo) != esperado[campo]]
+
+
+def divergencias_contadores_metas(meta_ids: Iterable[int]) -> list[tuple[object, list[str]]]:
+    """Lista (meta ou alocacao, campos divergentes) cujos contadores nao batem com os itens."""
+    ids = _normalizar_ids(meta_ids)
+    por_meta, por_meta_unidade = calcular_contadores_metas(ids)
+    divergencias: list[tuple[object, list[str]]] = []
+    for meta in Meta.objects.filter(id__in=ids).only("id", "titulo", *CAMPOS_CONTADORES).order_by("id"):
+        campos = _divergentes(meta, por_meta[meta.id])
+        if campos:
+            divergencias.append((meta, campos))
+    alocacoes = (
+        MetaAlocacao.objects.filter(meta_id__in=ids)
+        .only("id", "meta_id", "unidade_id", *CAMPOS_CONTADORES)
+        .order_by("meta_id", "id")
+    )
+    for aloc in alocacoes:
+        esperado = por_meta_unidade.get((aloc.meta_id, aloc.unidade_id)) or _contadores_vazios()
+        campos = _divergentes(aloc, esperado)
+        if campos:
+            divergencias.append((aloc, campos))
+    return divergencias
+
+
+def atualizar_contadores_metas(meta_ids: Iterable[int | None], *, movimentacao: bool = True) -> int:
+    """
+    Recalcula os contadores das metas informadas (e de suas alocacoes) a partir
+    dos itens de programacao. Deve ser chamada na mesma transacao da escrita; as
+    metas sao travadas para que escritas concorrentes nao gravem contagens antigas.
+    Com ``movimentacao`` registra ultima_movimentacao_em. Retorna as linhas gravadas.
+    """
+    ids = _normalizar_ids(meta_ids)
+    if not ids:
+        return 0
+
+    agora = timezone.now() if movimentacao else None
+    with transaction.atomic():
+        metas = list(
+            Meta.objects.select_for_update()
+            .filter(id__in=ids)
+            .only("id", *CAMPOS_CONTADORES, "ultima_movimentacao_em")
+            .order_by("id")
+        )
+        por_meta, por_meta_unidade = calcular_contadores_metas(ids)
+        alocacoes = list(
+            MetaAlocacao.objects.filter(meta_id__in=ids).only(
+                "id", "meta_id", "unidade_id", *CAMPOS_CONTADORES, "ultima_movimentacao_em"
+            )
+        )
+
+        campos_gravados = list(CAMPOS_CONTADORES) + (["ultima_movimentacao_em"] if agora else [])
+        metas_alteradas = []
+        for meta in metas:
+            if _aplicar(meta, por_meta[meta.id], agora):
+                metas_alteradas.append(meta)
+        alocacoes_alteradas = []
+        for aloc in alocacoes:
+            esperado = por_meta_unidade.get((aloc.meta_id, aloc.unidade_id)) or _contadores_vazios()
+            if _aplicar(aloc, esperado, agora):
+                alocacoes_alteradas.append(aloc)
+
+        if metas_alteradas:
+            Meta.objects.bulk_update(metas_alteradas, campos_gravados, batch_size=500)
+        if alocacoes_alteradas:
+            MetaAlocacao.objects.bulk_update(alocacoes_alteradas, campos_gravados, batch_size=500)
+    return len(metas_alteradas) + len(alocacoes_alteradas)
+
+
+def _aplicar(obj, esperado: dict, agora) -> bool:
+    alterado = bool(_divergentes(obj, esperado))
+    for campo, valor in esperado.items():
+        setattr(obj, campo, valor)
+    if agora and alterado:
+        obj.ultima_movimentacao_em = agora
+    return alterado
@@ -4,12 +4,15 @@ from typing import Iterable
 
 from django.db import transaction
 from django.db.models import Count, Max, Min, Q, QuerySet
+from django.utils import timezone
 
 from metas.models import Meta
 from metas.models import MetaAlocacao
 from core.models import No
 from programar.querysets import item_conta_como_programado_q
 
+from .contadores_service import _meta_expediente_id, meta_tem_contadores
+
 
 def metas_visiveis_por_unidade(unidade_id: int) -> QuerySet[Meta]:
     return Meta.objects.filter(
@@ -42,102 +45,163 @@ def meta_deve_iniciar_automatica(unidade: No | None) -> bool:
 def meta_esta_concluida(meta: Meta | None, *, unidade_id: int | None = None) -> bool:
     if meta is None:
         return False
-    if meta.encerrada:
-        return True
-
-    alvo = int(meta.quantidade_alvo or 0)
-    if unidade_id:
-        alocacao = (
-            meta.alocacoes
-            .filter(unidade_id=unidade_id)
-            .order_by("id")
-            .first()
-        )
-        if alocacao:
-            alvo = int(alocacao.quantidade_alocada or 0)
-    if alvo <= 0:
-        return False
-
-    from programar.models import ProgramacaoItem
-
-    itens_qs = ProgramacaoItem.objects.filter(meta_id=meta.id)
-    if unidade_id:
-        itens_qs = itens_qs.filter(programacao__unidade_id=unidade_id)
-
-    solucionadas = itens_qs.filter(
-        Q(concluido=True) | Q(nao_realizada_justificada=True)
-    ).count()
-    return solucionadas >= alvo
+    return _resumos_execucao([meta], unidade_id=unidade_id)[meta.id]["concluida"]
 
 
 def resumo_execucao_meta(meta: Meta | None, *, unidade_id: int | None = None) -> dict:
     if meta is None:
         return {}
+    return _resumos_execucao([meta], unidade_id=unidade_id)[meta.id]
+
+
+def metas_concluidas(meta_ids: Iterable[int], *, unidade_id: int | None = None) -> set[int]:
+    """Versao em lote de meta_esta_concluida: ids das metas concluidas."""
+    return {
+        meta_id
+        for meta_id, resumo in resumos_execucao_metas(meta_ids, unidade_id=unidade_id).items()
+        if resumo["concluida"]
+    }
+
+
+def resumos_execucao_metas(meta_ids: Iterable[int], *, unidade_id: int | None = None) -> dict[int, dict]:
+    """
+    Versao em lote de resumo_execucao_meta: {meta_id: resumo}. O numero de
+    consultas nao depende da quantidade de metas (contadores denormalizados e,
+    para metas sem contadores, uma unica agregacao agrupada por meta).
+    """
+    ids = {int(meta_id) for meta_id in meta_ids if meta_id}
+    if not ids:
+        return {}
+    metas = list(Meta.objects.with_execucao().filter(id__in=ids).order_by())
+    return _resumos_execucao(metas, unidade_id=unidade_id)
+
 
-    alvo_meta = int(meta.quantidade_alvo or 0)
-    alocado = 0
-    alvo_referencia = alvo_meta
+def _resumos_execucao(metas: list[Meta], *, unidade_id: int | None = None) -> dict[int, dict]:
+    alocacoes: dict[int, MetaAlocacao] = {}
     if unidade_id:
-        alocacao = (
-            meta.alocacoes
-            .filter(unidade_id=unidade_id)
-            .order_by("id")
-            .first()
-        )
-        if alocacao:
-            alocado = int(alocacao.quantidade_alocada or 0)
+        for alocacao in (
+            MetaAlocacao.objects
+            .filter(meta_id__in=[meta.id for meta in metas], unidade_id=unidade_id)
+            .order_by("-id")
+        ):
+            # Ordem decrescente: a primeira alocacao (menor id) da unidade prevalece.
+            alocacoes[alocacao.meta_id] = alocacao
+
+    # Sem contadores: meta de expediente ou unidade sem alocacao da meta.
+    sem_contadores = {
+        meta.id
+        for meta in metas
+        if not meta_tem_contadores(meta.id) or (unidade_id and meta.id not in alocacoes)
+    }
+    agregados = _resumos_dos_itens(list(sem_contadores), unidade_id=unidade_id) if sem_contadores else {}
+
+    resumos: dict[int, dict] = {}
+    for meta in metas:
+        alvo_meta = int(meta.quantidade_alvo or 0)
+        alocado = 0
+        alvo_referencia = alvo_meta
+        contadores: Meta | MetaAlocacao = meta
+        if unidade_id and meta.id in alocacoes:
+            contadores = alocacoes[meta.id]
+            alocado = int(contadores.quantidade_alocada or 0)
             alvo_referencia = alocado
-    if not alocado:
-        alocado = int(meta.alocado_total or 0)
-
+        if not alocado:
+            alocado = int(meta.alocado_total or 0)
+
+        if meta.id in sem_contadores:
+            resumo = dict(agregados.get(meta.id) or _resumo_vazio())
+        else:
+            resumo = _resumo_dos_contadores(contadores)
+
+        concluidas = int(resumo.get("concluidas") or 0)
+        justificadas = int(resumo.get("justificadas") or 0)
+        solucionadas = concluidas + justificadas
+        percentual_solucionado = 0
+        if alvo_referencia > 0:
+            percentual_solucionado = min(100, round((solucionadas / alvo_referencia) * 100))
+
+        resumo.update({
+            "alvo_meta": alvo_meta,
+            "alocado": alocado,
+            "alvo_referencia": alvo_referencia,
+            "solucionadas": solucionadas,
+            "percentual_solucionado": percentual_solucionado,
+            "concluida": bool(meta.encerrada or (alvo_referencia > 0 and solucionadas >= alvo_referencia)),
+        })
+        resumos[meta.id] = resumo
+    return resumos
+
+
+def _resumo_vazio() -> dict:
+    return {
+        "programadas": 0,
+        "concluidas": 0,
+        "justificadas": 0,
+        "canceladas": 0,
+        "nao_realizadas": 0,
+        "pendentes": 0,
+        "primeira_data": None,
+        "ultima_data": None,
+    }
+
+
+def _resumo_dos_contadores(contadores: Meta | MetaAlocacao) -> dict:
+    return {
+        "programadas": contadores.exec_programadas,
+        "concluidas": contadores.exec_concluidas,
+        "justificadas": contadores.exec_justificadas,
+        "canceladas": contadores.exec_canceladas,
+        "nao_realizadas": contadores.exec_nao_realizadas,
+        "pendentes": contadores.exec_pendentes,
+        "primeira_data": contadores.exec_primeira_data,
+        "ultima_data": contadores.exec_ultima_data,
+    }
+
+
+def _resumos_dos_itens(meta_ids: list[int], *, unidade_id: int | None = None) -> dict[int, dict]:
     from programar.models import ProgramacaoItem
 
-    itens_qs = ProgramacaoItem.objects.filter(meta_id=meta.id)
+    pendente_q = Q(
+        concluido=False,
+        concluido_em__isnull=True,
+        cancelada=False,
+        nao_realizada_justificada=False,
+    )
+    concluida_q = Q(concluido=True)
+    meta_expediente_id = _meta_expediente_id()
+    if meta_expediente_id is not None:
+        # Regra do expediente: pendente cuja data ja chegou conta como executado.
+        auto_concluida_q = Q(meta_id=meta_expediente_id, programacao__data__lte=timezone.localdate()) & pendente_q
+        concluida_q |= auto_concluida_q
+        pendente_q &= ~auto_concluida_q
+
+    itens_qs = ProgramacaoItem.objects.filter(meta_id__in=meta_ids)
     if unidade_id:
         itens_qs = itens_qs.filter(programacao__unidade_id=unidade_id)
 
-    resumo = itens_qs.aggregate(
-        programadas=Count("id", filter=item_conta_como_programado_q()),
-        concluidas=Count("id", filter=Q(concluido=True)),
-        justificadas=Count("id", filter=Q(concluido=False, nao_realizada_justificada=True)),
-        canceladas=Count("id", filter=Q(cancelada=True)),
-        nao_realizadas=Count(
-            "id",
-            filter=Q(
-                concluido=False,
-                concluido_em__isnull=False,
-                cancelada=False,
-                nao_realizada_justificada=False,
-            ),
-        ),
-        pendentes=Count(
-            "id",
-            filter=Q(
-                concluido=False,
-                concluido_em__isnull=True,
-                cancelada=False,
-                nao_realizada_justificada=False,
+    linhas = (
+        itens_qs.order_by()
+        .values("meta_id")
+        .annotate(
+            programadas=Count("id", filter=item_conta_como_programado_q()),
+            concluidas=Count("id", filter=concluida_q),
+            justificadas=Count("id", filter=Q(concluido=False, nao_realizada_justificada=True)),
+            canceladas=Count("id", filter=Q(cancelada=True)),
+            nao_realizadas=Count(
+                "id",
+                filter=Q(
+                    concluido=False,
+                    concluido_em__isnull=False,
+                    cancelada=False,
+                    nao_realizada_justificada=False,
+                ),
             ),
-        ),
-        primeira_data=Min("programacao__data"),
-        ultima_data=Max("programacao__data"),
+            pendentes=Count("id", filter=pendente_q),
+            primeira_data=Min("programacao__data"),
+            ultima_data=Max("programacao__data"),
+        )
     )
-
-    concluidas = int(resumo.get("concluidas") or 0)
-    justificadas = int(resumo.get("justificadas") or 0)
-    solucionadas = concluidas + justificadas
-    percentual_solucionado = 0
-    if alvo_referencia > 0:
-        percentual_solucionado = min(100, round((solucionadas / alvo_referencia) * 100))
-
-    resumo.update({
-        "alvo_meta": alvo_meta,
-        "alocado": alocado,
-        "alvo_referencia": alvo_referencia,
-        "solucionadas": solucionadas,
-        "percentual_solucionado": percentual_solucionado,
-    })
-    return resumo
+    return {int(linha.pop("meta_id")): linha for linha in linhas}
 
 
 def get_auto_alocacao(meta: Meta) -> MetaAlocacao | None:
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Sum
+
+from metas.models import MetaAlocacao, ProgressoMeta, ProgressoMetaAgregado
+
+
+def inicio_semana(data: date) -> date:
+    return data - timedelta(days=data.weekday())
+
+
+def atualizar_progresso_agregado(chaves: Iterable[tuple[int | None, int | None, date | None]]) -> int:
+    """
+    Recalcula, a partir de ProgressoMeta, os baldes semanais e mensais de cada
+    (unidade_id, meta_id, data) informado; o mes inteiro da data e refeito, entao
+    a chamada e idempotente. Retorna a quantidade de meses recalculados.
+    """
+    meses = sorted(
+        {(int(unidade_id), int(meta_id), data.replace(day=1)) for unidade_id, meta_id, data in chaves
+         if unidade_id and meta_id and data}
+    )
+    if not meses:
+        return 0
+
+    with transaction.atomic():
+        # Serializa recalculos concorrentes da mesma (unidade, meta).
+        pares = sorted({(unidade_id, meta_id) for unidade_id, meta_id, _ in meses})
+        for unidade_id, meta_id in pares:
+            list(
+                MetaAlocacao.objects.select_for_update()
+                .filter(unidade_id=unidade_id, meta_id=meta_id)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+
+        for unidade_id, meta_id, mes in meses:
+            fim_mes = mes.replace(day=monthrange(mes.year, mes.month)[1])
+            por_dia = (
+                ProgressoMeta.objects.filter(
+                    alocacao__unidade_id=unidade_id,
+                    alocacao__meta_id=meta_id,
+                    data__range=(mes, fim_mes),
+                )
+                .order_by()
+                .values("data")
+                .annotate(total=Sum("quantidade"))
+            )
+            semanas: dict[date, int] = defaultdict(int)
+            for linha in por_dia:
+                semanas[inicio_semana(linha["data"])] += int(linha["total"] or 0)
+
+            ProgressoMetaAgregado.objects.filter(unidade_id=unidade_id, meta_id=meta_id, mes=mes).delete()
+            baldes = [
+                ProgressoMetaAgregado(
+                    unidade_id=unidade_id,
+                    meta_id=meta_id,
+                    periodo=ProgressoMetaAgregado.PERIODO_SEMANA,
+                    inicio=semana,
+                    mes=mes,
+                    total=total,
+                )
+                for semana, total in sorted(semanas.items())
+                if total
+            ]
+            total_mes = sum(semanas.values())
+            if total_mes:
+                baldes.append(
+                    ProgressoMetaAgregado(
+                        unidade_id=unidade_id,
+                        meta_id=meta_id,
+                        periodo=ProgressoMetaAgregado.PERIODO_MES,
+                        inicio=mes,
+                        mes=mes,
+                        total=total_mes,
+                    )
+                )
+            ProgressoMetaAgregado.objects.bulk_create(baldes)
+    return len(meses)
+
+
+def chaves_progresso(progressos: Iterable[ProgressoMeta]) -> list[tuple[int | None, int | None, date | None]]:
+    """(unidade_id, meta_id, data) dos progressos, lendo as alocacoes em uma consulta."""
+    progressos = list(progressos)
+    alocacoes = {
+        aloc_id: (unidade_id, meta_id)
+        for aloc_id, unidade_id, meta_id in MetaAlocacao.objects.filter(
+            id__in={p.alocacao_id for p in progressos}
+        ).values_list("id", "unidade_id", "meta_id")
+    }
+    return [(*alocacoes.get(p.alocacao_id, (None, None)), p.data) for p in progressos]
@@ -1,9 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from atividades.models import Atividade
+from core.models import No
 
-from .models import Meta
+from .models import Meta, MetaAlocacao, ProgressoMeta
+from .services import atualizar_contadores_metas, atualizar_progresso_agregado, chaves_progresso
 
 
 @receiver(post_save, sender=Atividade)
@@ -12,3 +14,35 @@ def sync_meta_title_with_atividade(sender, instance, **kwargs):
     if not titulo:
         return
     Meta.objects.filter(atividade=instance).exclude(titulo=titulo).update(titulo=titulo)
+
+
+@receiver(post_save, sender=MetaAlocacao)
+def preencher_contadores_nova_alocacao(sender, instance, created, **kwargs):
+    # A unidade pode ja ter itens programados para a meta antes de receber a alocacao.
+    if not created or kwargs.get("raw"):
+        return
+    atualizar_contadores_metas([instance.meta_id], movimentacao=False)
+
+
+@receiver(pre_save, sender=ProgressoMeta)
+def guardar_balde_anterior_do_progresso(sender, instance, **kwargs):
+    # Edicao que troca a data/alocacao tambem precisa refazer o balde de origem.
+    instance._progresso_anterior = None
+    if instance.pk and not kwargs.get("raw"):
+        instance._progresso_anterior = (
+            ProgressoMeta.objects.filter(pk=instance.pk).only("alocacao_id", "data").first()
+        )
+
+
+@receiver([post_save, post_delete], sender=ProgressoMeta)
+def atualizar_progresso_agregado_do_progresso(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    # Na exclusao em cascata da meta ou da unidade os baldes vao junto.
+    if isinstance(kwargs.get("origin"), (Meta, No)):
+        return
+    progressos = [instance]
+    anterior = getattr(instance, "_progresso_anterior", None)
+    if anterior is not None:
+        progressos.append(anterior)
+    atualizar_progresso_agregado(chaves_progresso(progressos))
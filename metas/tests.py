@@ -1,12 +1,27 @@
+import json
 from datetime import date
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from atividades.models import Area, Atividade
 from core.models import No
-from metas.models import Meta, MetaAlocacao
+from metas.management.commands.auditar_vinculos_metas import ramos_de_unidades
+from metas.models import Meta, MetaAlocacao, ProgressoMeta
+from metas.services import (
+    atualizar_contadores_metas,
+    meta_esta_concluida,
+    metas_concluidas,
+    resumo_execucao_meta,
+    resumos_execucao_metas,
+    totais_arvore_alocacoes,
+)
+from programar.models import Programacao, ProgramacaoItem
+from programar.services.programacao_service import concluir_item
 
 
 class MetaTitleSyncTests(TestCase):
@@ -236,3 +251,385 @@ class MetaAutoAllocationFlowTests(TestCase):
         self.assertEqual(meta.modo_alocacao, Meta.MODO_ALOCACAO_MANUAL)
         self.assertTrue(MetaAlocacao.objects.filter(meta=meta, unidade=self.unidade, quantidade_alocada=4).exists())
         self.assertTrue(MetaAlocacao.objects.filter(meta=meta, unidade=filho, quantidade_alocada=6).exists())
+
+    def test_atribuicao_em_arvore_aplica_alocacoes_em_lote(self):
+        meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            atividade=self.atividade,
+            titulo=self.atividade.titulo,
+            descricao="Meta regional",
+            quantidade_alvo=30,
+            criado_por=self.user,
+            modo_alocacao=Meta.MODO_ALOCACAO_MANUAL,
+        )
+        equipe_b = No.objects.create(nome="Equipe B", tipo="setor", parent=self.unidade)
+        equipe_a = No.objects.create(nome="Equipe A", tipo="setor", parent=self.unidade)
+        posto_z = No.objects.create(nome="Posto Z", tipo="setor", parent=equipe_a)
+        posto_m = No.objects.create(nome="Posto M", tipo="setor", parent=equipe_a)
+        base = No.objects.create(nome="Base", tipo="setor", parent=posto_z)
+        MetaAlocacao.objects.create(meta=meta, unidade=equipe_a, quantidade_alocada=5, atribuida_por=self.user)
+        MetaAlocacao.objects.create(meta=meta, unidade=equipe_b, quantidade_alocada=5, atribuida_por=self.user)
+        prog = Programacao.objects.create(data=date(2026, 3, 10), unidade=base, criado_por=self.user)
+        ProgramacaoItem.objects.create(programacao=prog, meta=meta, concluido=False)
+
+        response = self.client.get(reverse("metas:atribuir-meta", args=[meta.id]))
+        grupos = [
+            (nodo.id, [dados["unidade"].id for dados in unidades])
+            for nodo, unidades in response.context["grupos_with_data"]
+        ]
+        self.assertEqual(
+            grupos,
+            [
+                (self.unidade.id, [self.unidade.id]),
+                (equipe_a.id, [equipe_a.id, posto_m.id, posto_z.id, base.id]),
+                (equipe_b.id, [equipe_b.id]),
+            ],
+        )
+
+        response = self.client.post(
+            reverse("metas:atribuir-meta", args=[meta.id]),
+            data={
+                f"quantity_{equipe_a.id}": "8",
+                f"quantity_{equipe_b.id}": "0",
+                f"quantity_{base.id}": "3",
+                f"obs_{base.id}": "Base avancada",
+            },
+        )
+
+        self.assertRedirects(response, reverse("metas:metas-unidade"), fetch_redirect_response=False)
+        alocacoes = dict(MetaAlocacao.objects.filter(meta=meta).values_list("unidade_id", "quantidade_alocada"))
+        self.assertEqual(alocacoes, {equipe_a.id: 8, base.id: 3})
+        nova = MetaAlocacao.objects.get(meta=meta, unidade=base)
+        self.assertEqual((nova.observacao, nova.exec_programadas, nova.exec_pendentes), ("Base avancada", 1, 1))
+
+
+class MetaExecucaoAnotadaTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="anotador", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Anotada", tipo="setor")
+        self.filho = No.objects.create(nome="Equipe Anotada", tipo="setor", parent=self.unidade)
+        self.metas = []
+        for indice, alvo in enumerate((10, 4, 0)):
+            meta = Meta.objects.create(
+                unidade_criadora=self.unidade,
+                titulo=f"Meta {indice}",
+                descricao="",
+                quantidade_alvo=alvo,
+                criado_por=self.user,
+                data_limite=date(2000, 1, 1),
+            )
+            self.metas.append(meta)
+        self.aloc_raiz = MetaAlocacao.objects.create(
+            meta=self.metas[0], unidade=self.unidade, quantidade_alocada=6, atribuida_por=self.user
+        )
+        self.aloc_filho = MetaAlocacao.objects.create(
+            meta=self.metas[0], unidade=self.filho, quantidade_alocada=4, atribuida_por=self.user
+        )
+        aloc_concluida = MetaAlocacao.objects.create(
+            meta=self.metas[1], unidade=self.unidade, quantidade_alocada=4, atribuida_por=self.user
+        )
+        for aloc, quantidade in ((self.aloc_raiz, 2), (self.aloc_raiz, 1), (self.aloc_filho, 5), (aloc_concluida, 4)):
+            ProgressoMeta.objects.create(alocacao=aloc, quantidade=quantidade, registrado_por=self.user)
+
+    def test_with_execucao_dispensa_consultas_por_meta(self):
+        with self.assertNumQueries(1):
+            metas = {meta.pk: meta for meta in Meta.objects.with_execucao()}
+            resumo = {
+                pk: (meta.alocado_total, meta.realizado_total, meta.concluida, meta.atrasada)
+                for pk, meta in metas.items()
+            }
+
+        self.assertEqual(resumo[self.metas[0].pk], (10, 8, False, True))
+        self.assertEqual(resumo[self.metas[1].pk], (4, 4, True, False))
+        self.assertEqual(resumo[self.metas[2].pk][:2], (0, 0))
+        self.assertEqual(metas[self.metas[0].pk].percentual_execucao, 80.0)
+
+    def test_with_saldo_anota_alocacao_e_meta(self):
+        with self.assertNumQueries(1):
+            alocacoes = {
+                aloc.pk: aloc
+                for aloc in MetaAlocacao.objects.with_saldo(com_meta=True).filter(meta=self.metas[0])
+            }
+            raiz = alocacoes[self.aloc_raiz.pk]
+            filho = alocacoes[self.aloc_filho.pk]
+            valores = (
+                raiz.realizado,
+                raiz.saldo,
+                filho.realizado,
+                filho.saldo,
+                filho.percentual_execucao,
+                raiz.meta.realizado_total,
+                raiz.meta.alocado_total,
+            )
+
+        self.assertEqual(valores, (3, 3, 5, 0, 100.0, 8, 10))
+        self.assertEqual(raiz.percentual_execucao, 50.0)
+
+    def test_propriedades_sem_anotacao_continuam_consultando(self):
+        meta = Meta.objects.get(pk=self.metas[0].pk)
+        self.assertEqual(meta.realizado_total, 8)
+        self.assertEqual(meta.alocado_total, 10)
+        self.assertEqual(MetaAlocacao.objects.get(pk=self.aloc_filho.pk).saldo, 0)
+
+
+class MetaContadoresExecucaoTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="contador", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Contadores", tipo="setor")
+        self.outra_unidade = No.objects.create(nome="Outra Unidade", tipo="setor")
+        self.meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Meta contada",
+            descricao="",
+            quantidade_alvo=3,
+            criado_por=self.user,
+        )
+        self.aloc = MetaAlocacao.objects.create(
+            meta=self.meta, unidade=self.unidade, quantidade_alocada=2, atribuida_por=self.user
+        )
+        prog = Programacao.objects.create(data=date(2026, 3, 10), unidade=self.unidade, criado_por=self.user)
+        prog_outra = Programacao.objects.create(data=date(2026, 3, 12), unidade=self.outra_unidade, criado_por=self.user)
+        self.pendente = ProgramacaoItem.objects.create(programacao=prog, meta=self.meta, concluido=False)
+        ProgramacaoItem.objects.create(
+            programacao=prog, meta=self.meta, concluido=True, concluido_em=timezone.now()
+        )
+        ProgramacaoItem.objects.create(
+            programacao=prog_outra,
+            meta=self.meta,
+            concluido=False,
+            concluido_em=timezone.now(),
+            cancelada=True,
+        )
+
+    def test_atualizar_contadores_por_meta_e_por_unidade(self):
+        atualizar_contadores_metas([self.meta.id])
+        self.meta.refresh_from_db()
+        self.aloc.refresh_from_db()
+
+        self.assertEqual(
+            (self.meta.exec_programadas, self.meta.exec_concluidas, self.meta.exec_canceladas, self.meta.exec_pendentes),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual(self.meta.exec_ultima_data, date(2026, 3, 12))
+        self.assertIsNotNone(self.meta.ultima_movimentacao_em)
+        self.assertEqual((self.aloc.exec_programadas, self.aloc.exec_canceladas), (2, 0))
+        self.assertEqual(self.aloc.exec_pendente_desde, date(2026, 3, 10))
+
+    def test_concluir_item_atualiza_contadores_e_leitura_sem_agregar_itens(self):
+        atualizar_contadores_metas([self.meta.id])
+        concluir_item(self.unidade.id, self.pendente.id, self.user, realizada=True)
+        self.meta.refresh_from_db()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(meta_esta_concluida(self.meta, unidade_id=self.unidade.id))
+        self.assertFalse(meta_esta_concluida(self.meta))
+        resumo = resumo_execucao_meta(self.meta, unidade_id=self.unidade.id)
+        self.assertEqual((resumo["concluidas"], resumo["pendentes"], resumo["percentual_solucionado"]), (2, 0, 100))
+
+    def test_reconciliar_detecta_e_corrige_divergencia(self):
+        saida = StringIO()
+        call_command("reconciliar_contadores_metas", stdout=saida)
+        self.assertIn(f"meta | {self.meta.id} | {self.meta.id} |", saida.getvalue())
+        self.meta.refresh_from_db()
+        self.assertEqual(self.meta.exec_programadas, 0)
+
+        call_command("reconciliar_contadores_metas", "--corrigir", stdout=StringIO())
+        self.meta.refresh_from_db()
+        self.assertEqual(self.meta.exec_programadas, 2)
+        self.assertIsNone(self.meta.ultima_movimentacao_em)
+
+        saida = StringIO()
+        call_command("reconciliar_contadores_metas", stdout=saida)
+        self.assertIn("Registros divergentes: 0", saida.getvalue())
+
+
+class ResumosExecucaoEmLoteTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="lote", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Lote", tipo="setor")
+        self.prog = Programacao.objects.create(data=date(2026, 2, 2), unidade=self.unidade, criado_por=self.user)
+        self.metas = []
+        for indice in range(4):
+            meta = Meta.objects.create(
+                unidade_criadora=self.unidade,
+                titulo=f"Meta lote {indice}",
+                descricao="",
+                quantidade_alvo=2,
+                criado_por=self.user,
+            )
+            MetaAlocacao.objects.create(meta=meta, unidade=self.unidade, quantidade_alocada=2, atribuida_por=self.user)
+            for _ in range(indice):
+                ProgramacaoItem.objects.create(
+                    programacao=self.prog, meta=meta, concluido=True, concluido_em=timezone.now()
+                )
+            self.metas.append(meta)
+        atualizar_contadores_metas([meta.id for meta in self.metas])
+
+    def test_lote_equivale_a_chamadas_individuais_com_consultas_constantes(self):
+        ids = [meta.id for meta in self.metas]
+        with self.assertNumQueries(2):
+            resumos = resumos_execucao_metas(ids, unidade_id=self.unidade.id)
+
+        for meta in self.metas:
+            meta.refresh_from_db()
+            individual = resumo_execucao_meta(meta, unidade_id=self.unidade.id)
+            self.assertEqual(resumos[meta.id], individual)
+            self.assertEqual(resumos[meta.id]["concluida"], meta_esta_concluida(meta, unidade_id=self.unidade.id))
+        self.assertEqual(metas_concluidas(ids, unidade_id=self.unidade.id), {self.metas[2].id, self.metas[3].id})
+
+    def test_unidade_sem_alocacao_agrega_itens_em_uma_consulta(self):
+        outra = No.objects.create(nome="Sem alocacao", tipo="setor")
+        prog = Programacao.objects.create(data=date(2026, 2, 3), unidade=outra, criado_por=self.user)
+        ProgramacaoItem.objects.create(programacao=prog, meta=self.metas[0], concluido=False)
+
+        with self.assertNumQueries(3):
+            resumos = resumos_execucao_metas([meta.id for meta in self.metas], unidade_id=outra.id)
+
+        self.assertEqual(resumos[self.metas[0].id]["pendentes"], 1)
+        self.assertEqual(resumos[self.metas[1].id]["programadas"], 0)
+        self.assertEqual(resumos[self.metas[0].id]["alvo_referencia"], 2)
+
+    def test_regra_do_expediente_conta_pendente_vencido_como_executado(self):
+        expediente = self.metas[0]
+        futura = Programacao.objects.create(
+            data=timezone.localdate().replace(year=timezone.localdate().year + 1),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        ProgramacaoItem.objects.create(programacao=self.prog, meta=expediente, concluido=False)
+        ProgramacaoItem.objects.create(programacao=futura, meta=expediente, concluido=False)
+
+        with override_settings(META_EXPEDIENTE_ID=expediente.id):
+            resumo = resumos_execucao_metas([expediente.id], unidade_id=self.unidade.id)[expediente.id]
+
+        self.assertEqual((resumo["concluidas"], resumo["pendentes"]), (1, 1))
+        self.assertFalse(resumo["concluida"])
+
+
+class ArvoreAlocacoesTotaisTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="arvore", password="123456")
+        self.raiz_unidade = No.objects.create(nome="Regional", tipo="setor")
+        self.filho_unidade = No.objects.create(nome="Escritorio", tipo="setor", parent=self.raiz_unidade)
+        self.neto_unidade = No.objects.create(nome="Posto", tipo="setor", parent=self.filho_unidade)
+        self.meta = Meta.objects.create(
+            unidade_criadora=self.raiz_unidade,
+            titulo="Meta arvore",
+            descricao="",
+            quantidade_alvo=10,
+            criado_por=self.user,
+        )
+        self.raiz = MetaAlocacao.objects.create(
+            meta=self.meta, unidade=self.raiz_unidade, quantidade_alocada=10, atribuida_por=self.user
+        )
+        self.filho = MetaAlocacao.objects.create(
+            meta=self.meta, unidade=self.filho_unidade, quantidade_alocada=6, parent=self.raiz, atribuida_por=self.user
+        )
+        self.neto = MetaAlocacao.objects.create(
+            meta=self.meta, unidade=self.neto_unidade, quantidade_alocada=2, parent=self.filho, atribuida_por=self.user
+        )
+        for aloc, quantidade in ((self.raiz, 1), (self.filho, 2), (self.neto, 3)):
+            ProgressoMeta.objects.create(alocacao=aloc, quantidade=quantidade, registrado_por=self.user)
+
+    def test_totais_da_arvore_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            totais = totais_arvore_alocacoes(self.meta.id)
+
+        self.assertEqual(
+            totais[self.raiz.id],
+            {
+                "alocado": 10,
+                "realizado": 1,
+                "saldo": 9,
+                "filhos_alocado": 6,
+                "subarvore_realizado": 6,
+                "subarvore_saldo": 13,
+                "descendentes": 2,
+            },
+        )
+        self.assertEqual(totais[self.filho.id]["subarvore_realizado"], 5)
+        self.assertEqual(totais[self.filho.id]["filhos_alocado"], 2)
+        self.assertEqual(totais[self.neto.id]["saldo"], 0)
+
+    def test_totais_restritos_a_subarvore(self):
+        totais = totais_arvore_alocacoes(self.meta.id, raiz_id=self.filho.id)
+        self.assertEqual(set(totais), {self.filho.id})
+        self.assertEqual(totais[self.filho.id]["descendentes"], 1)
+
+    def test_redistribuir_exibe_totais_da_subarvore(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.raiz_unidade.id
+        session.save()
+
+        response = self.client.get(reverse("metas:redistribuir-meta", args=[self.meta.id, self.raiz.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["existing_total"], 6)
+        self.assertEqual(response.context["parent_realizado"], 6)
+        filho = next(f for f in response.context["filhos"] if f["unidade"].id == self.filho_unidade.id)
+        self.assertEqual((filho["realizado"], filho["saldo"]), (5, 4))
+
+
+class AuditarVinculosMetasTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="auditoria", password="123456")
+        self.raiz = No.objects.create(nome="Raiz", tipo="setor")
+        self.ramo_a = No.objects.create(nome="Ramo A", tipo="setor", parent=self.raiz)
+        self.folha_a = No.objects.create(nome="Folha A", tipo="setor", parent=self.ramo_a)
+        self.ramo_b = No.objects.create(nome="Ramo B", tipo="setor", parent=self.raiz)
+        area, _ = Area.objects.get_or_create(code=Area.CODE_OUTROS, defaults={"nome": "Outros"})
+        self.metas = []
+        for unidade, titulo in ((self.folha_a, "Barreira"), (self.ramo_b, "Vacinacao"), (self.ramo_b, "Coleta")):
+            atividade = Atividade.objects.create(
+                titulo=titulo, descricao="", area=area, unidade_origem=unidade, criado_por=self.user
+            )
+            self.metas.append(
+                Meta.objects.create(
+                    unidade_criadora=unidade,
+                    atividade=atividade,
+                    titulo=titulo,
+                    descricao="",
+                    quantidade_alvo=1,
+                    criado_por=self.user,
+                )
+            )
+        Meta.objects.filter(pk__in=[self.metas[0].pk, self.metas[2].pk]).update(titulo="Titulo antigo")
+
+    def _auditar(self, *args):
+        saida = StringIO()
+        call_command("auditar_vinculos_metas", "--formato", "json", "--lote", "1", *args, stdout=saida)
+        return json.loads(saida.getvalue())
+
+    def test_saida_json_em_lotes_e_correcao_com_dry_run(self):
+        resultado = self._auditar()
+        self.assertEqual([linha["meta_id"] for linha in resultado["metas"]], [self.metas[0].id, self.metas[2].id])
+        self.assertEqual(resultado["metas"][0]["motivos"], ["TITULO_DIVERGENTE"])
+        self.assertEqual((resultado["total_analisadas"], resultado["total_suspeitas"]), (2, 2))
+        self.assertIn("consulta", resultado["tempos"])
+
+        resultado = self._auditar("--limit", "1", "--corrigir", "--dry-run")
+        self.assertEqual(resultado["correcoes"], [{"meta_id": self.metas[0].id, "de": "Titulo antigo", "para": "Barreira"}])
+        self.assertFalse(resultado["correcoes_gravadas"])
+        self.assertEqual(Meta.objects.filter(titulo="Titulo antigo").count(), 2)
+
+        with self.assertRaisesMessage(CommandError, "--dry-run so se aplica junto com --corrigir."):
+            self._auditar("--dry-run")
+
+        self._auditar("--corrigir")
+        self.assertFalse(Meta.objects.filter(titulo="Titulo antigo").exists())
+        self.assertEqual(self._auditar()["metas"], [])
+
+    def test_ramos_de_unidades_sao_subarvores_disjuntas(self):
+        grupos = ramos_de_unidades(4)
+        self.assertEqual(
+            sorted(grupos),
+            sorted([[self.raiz.id], sorted([self.ramo_a.id, self.folha_a.id]), [self.ramo_b.id]]),
+        )
+        self.assertEqual(len(ramos_de_unidades(2)), 2)
+        self.assertEqual(sorted(ramos_de_unidades(1)[0]), sorted(No.objects.values_list("id", flat=True)))
@@ -1,5 +1,5 @@
 # metas/views.py
-from collections import deque, defaultdict, OrderedDict
+from collections import defaultdict, OrderedDict
 from datetime import date
 from types import SimpleNamespace
 
@@ -7,7 +7,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.db import connection, transaction
 from django.utils import timezone
@@ -15,7 +15,7 @@ from django.utils.http import url_has_allowed_host_and_scheme
 from core.utils.security import safe_next_url
 
 from core.utils import get_unidade_atual
-from core.models import No
+from core.services.versoes import ESCOPO_METAS, ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from atividades.models import Area, Atividade
 
 from .models import Meta, MetaAlocacao, ProgressoMeta
@@ -24,8 +24,12 @@ from programar.querysets import item_conta_como_programado_q
 from programar.status import ENCERRADA_AUTOMATICAMENTE_MARKER
 from .forms import MetaForm
 from .services import (
+    atualizar_contadores_metas,
+    atualizar_progresso_agregado,
+    descendentes_por_filho,
     meta_deve_iniciar_automatica,
     sincronizar_meta_auto,
+    totais_arvore_alocacoes,
     unidade_tem_filhos,
 )
 from django.http import HttpResponseForbidden
@@ -96,7 +100,8 @@ def _prepare_metas_context(request, *, emit_messages=False):
     status = (request.GET.get("status") or "").strip()
 
     alocacoes = (
-        MetaAlocacao.objects.select_related("meta", "meta__atividade", "meta__unidade_criadora")
+        MetaAlocacao.objects.with_saldo(com_meta=True)
+        .select_related("meta", "meta__atividade", "meta__unidade_criadora")
         .filter(unidade=unidade_real)
         .order_by("meta__data_limite", "meta__titulo")
     )
@@ -135,7 +140,8 @@ def _prepare_metas_context(request, *, emit_messages=False):
 
     # Inclui metas criadas na unidade atual sem qualquer alocacao.
     metas_sem_aloc = (
-        Meta.objects.select_related("atividade", "unidade_criadora")
+        Meta.objects.with_execucao()
+        .select_related("atividade", "unidade_criadora")
         .filter(unidade_criadora=unidade_real, alocacoes__isnull=True)
         .order_by("data_limite", "titulo")
     )
@@ -364,7 +370,7 @@ def definir_meta_view(request, atividade_id):
     else:
         status_selecionado = ""
 
-    metas_atividade = Meta.objects.filter(atividade=atividade)
+    metas_atividade = Meta.objects.with_execucao().filter(atividade=atividade)
     if ano_selecionado:
         metas_atividade = metas_atividade.filter(data_limite__year=ano_selecionado)
     metas_atividade = list(metas_atividade)
@@ -450,7 +456,7 @@ def atribuir_meta_view(request, meta_id):
         messages.error(request, "Selecione ou assuma uma unidade antes de atribuir metas.")
         return redirect("metas:metas-unidade")
 
-    meta = Meta.objects.filter(pk=meta_id).select_related("unidade_criadora", "atividade").first()
+    meta = Meta.objects.with_execucao().filter(pk=meta_id).select_related("unidade_criadora", "atividade").first()
     if not meta:
         messages.error(request, "Meta não encontrada ou já foi removida.")
         return redirect("metas:metas-unidade")
@@ -465,9 +471,9 @@ def atribuir_meta_view(request, meta_id):
         return redirect("metas:metas-unidade")
     _set_meta_distribution_flags(meta)
 
-    # montar grupos: filhos diretos da unidade atual (ex.: supervisores -> unidades)
-    grupos = []
-    filhos_diretos = No.objects.filter(parent=unidade).order_by("nome")
+    # montar grupos: filhos diretos da unidade atual (ex.: supervisores -> unidades),
+    # com a subarvore inteira lida em uma consulta
+    grupos = descendentes_por_filho(unidade)
     unidades_atribuiveis = []
     unidades_vistas = set()
 
@@ -476,25 +482,7 @@ def atribuir_meta_view(request, meta_id):
             unidades_atribuiveis.append(nodo)
             unidades_vistas.add(nodo.id)
 
-    def coletar_descendentes(raiz):
-        resultado = []
-        fila = deque([raiz])
-        visitados = set()
-        while fila:
-            atual = fila.popleft()
-            filhos = list(atual.filhos.all().order_by("nome"))
-            for filho in filhos:
-                if filho.id in visitados:
-                    continue
-                visitados.add(filho.id)
-                resultado.append(filho)
-                fila.append(filho)
-        return resultado
-
-    for nodo in filhos_diretos:
-        descendentes = coletar_descendentes(nodo)
-        unidades_do_grupo = [nodo] + descendentes if descendentes else [nodo]
-        grupos.append((nodo, unidades_do_grupo))
+    for _nodo, unidades_do_grupo in grupos:
         for unidade_do_grupo in unidades_do_grupo:
             registrar_unidade(unidade_do_grupo)
 
@@ -565,36 +553,50 @@ def atribuir_meta_view(request, meta_id):
                 "meta_info": meta_info,
                 "restante": restante,
             })
-        # aplicar alterações (criar/atualizar/deletar) em transação
-        created = updated = deleted = 0
-        switched_to_manual = False
-        with transaction.atomic():
-            for u in unidades_atribuiveis:
-                sub = submitted_values.get(u.id, {"qty": 0, "obs": ""})
-                qty = sub["qty"]
-                obs = sub["obs"] or ""
-                existing = aloc_map.get(u.id)
-
-                if qty > 0:
-                    if existing:
-                        if existing.quantidade_alocada != qty or (existing.observacao or "") != obs:
-                            existing.quantidade_alocada = qty
-                            existing.observacao = obs
-                            existing.save(update_fields=["quantidade_alocada", "observacao"])
-                            updated += 1
-                    else:
-                        MetaAlocacao.objects.create(
+        # aplicar alterações (criar/atualizar/deletar) em lote, em uma transação curta
+        novas = []
+        alteradas = []
+        removidas = []
+        for u in unidades_atribuiveis:
+            sub = submitted_values.get(u.id, {"qty": 0, "obs": ""})
+            qty = sub["qty"]
+            obs = sub["obs"] or ""
+            existing = aloc_map.get(u.id)
+
+            if qty > 0:
+                if existing:
+                    if existing.quantidade_alocada != qty or (existing.observacao or "") != obs:
+                        existing.quantidade_alocada = qty
+                        existing.observacao = obs
+                        alteradas.append(existing)
+                else:
+                    novas.append(
+                        MetaAlocacao(
                             meta=meta,
                             unidade=u,
                             quantidade_alocada=qty,
                             atribuida_por=request.user,
                             observacao=obs,
                         )
-                        created += 1
-                else:
-                    if existing:
-                        existing.delete()
-                        deleted += 1
+                    )
+            elif existing:
+                removidas.append(existing.pk)
+
+        created, updated, deleted = len(novas), len(alteradas), len(removidas)
+        switched_to_manual = False
+        with transaction.atomic():
+            if novas:
+                MetaAlocacao.objects.bulk_create(novas)
+            if alteradas:
+                MetaAlocacao.objects.bulk_update(alteradas, ["quantidade_alocada", "observacao"])
+            if removidas:
+                # delete() do queryset ainda dispara os sinais de cada alocacao removida.
+                MetaAlocacao.objects.filter(pk__in=removidas).delete()
+            # bulk_create/bulk_update nao disparam post_save: replica os sinais da alocacao.
+            if novas:
+                atualizar_contadores_metas([meta.id], movimentacao=False)
+            for unidade_id in sorted({aloc.unidade_id for aloc in novas + alteradas}):
+                incrementar_versao_dados(unidade_id, ESCOPO_METAS)
 
             if meta.is_auto_alocacao:
                 has_extra_alocacoes = (
@@ -665,12 +667,12 @@ def editar_meta_view(request, meta_id):
     next_url = safe_next_url(request, next_url_default)
     unidade = get_unidade_atual(request)
     if request.user.is_superuser:
-        meta = get_object_or_404(Meta, pk=meta_id)
+        meta = get_object_or_404(Meta.objects.with_execucao(), pk=meta_id)
     else:
         if not unidade:
             messages.error(request, "Selecione ou assuma uma unidade antes de editar metas.")
             return redirect(next_url)
-        meta = get_object_or_404(Meta, pk=meta_id, unidade_criadora=unidade)
+        meta = get_object_or_404(Meta.objects.with_execucao(), pk=meta_id, unidade_criadora=unidade)
 
     # checagem de permissão básica
     if unidade and meta.unidade_criadora_id != unidade.id and not request.user.is_superuser:
@@ -842,7 +844,9 @@ def redistribuir_meta_view(request, meta_id, parent_aloc_id):
     # alocações já existentes que têm parent=parent_aloc
     child_alocs_qs = MetaAlocacao.objects.filter(meta=meta, parent=parent_aloc).select_related('unidade')
     child_alocs_map = {a.unidade_id: a for a in child_alocs_qs}
-    existing_total = sum(a.quantidade_alocada for a in child_alocs_qs)  # já redistribuído
+    totais = totais_arvore_alocacoes(meta.id)
+    parent_totais = totais.get(parent_aloc.id, {})
+    existing_total = parent_totais.get("filhos_alocado", 0)  # já redistribuído
 
     if request.method == "POST":
         submitted = {}
@@ -919,11 +923,14 @@ def redistribuir_meta_view(request, meta_id, parent_aloc_id):
     filhos_data = []
     for f in filhos:
         existing = child_alocs_map.get(f.id)
+        existing_totais = totais.get(existing.id, {}) if existing else {}
         filhos_data.append({
             "unidade": f,
             "existing": existing,
             "existing_qty": existing.quantidade_alocada if existing else 0,
             "existing_obs": existing.observacao if existing else "",
+            "realizado": existing_totais.get("subarvore_realizado", 0),
+            "saldo": existing_totais.get("subarvore_saldo", 0),
         })
 
     parent_available = parent_aloc.quantidade_alocada or 0
@@ -933,6 +940,7 @@ def redistribuir_meta_view(request, meta_id, parent_aloc_id):
         "filhos": filhos_data,
         "existing_total": existing_total,
         "parent_available": parent_available,
+        "parent_realizado": parent_totais.get("subarvore_realizado", 0),
     })
 
 
@@ -959,6 +967,7 @@ def encerrar_meta_view(request, meta_id):
 
     meta_qs = (
         Meta.objects
+        .with_execucao()
         .select_related("unidade_criadora", "atividade")
         .filter(pk=meta_id)
     )
@@ -984,33 +993,30 @@ def encerrar_meta_view(request, meta_id):
             MetaAlocacao.objects
             .filter(meta=meta)
             .select_related("unidade", "parent")
-            .annotate(realizado_total=Sum("progresso__quantidade"))
             .order_by("parent_id", "unidade__nome", "id")
         )
         children_map = defaultdict(list)
         for aloc in qs:
             children_map[aloc.parent_id].append(aloc)
+        totais = totais_arvore_alocacoes(meta.id)
 
         flat_nodes = []
 
         def build_tree(parent_id=None, depth=0):
             nodes = []
             for aloc in children_map.get(parent_id, []):
-                realizado = aloc.realizado_total or 0
+                total = totais.get(aloc.id, {})
+                realizado = total.get("realizado", 0)
                 quantidade = aloc.quantidade_alocada or 0
-                saldo = quantidade - realizado
-                if saldo < 0:
-                    saldo = 0
-                percentual = 0.0
-                if quantidade:
-                    percentual = min(100.0, (realizado / quantidade) * 100.0)
+                percentual = min(100.0, (realizado / quantidade) * 100.0) if quantidade else 0.0
                 node = {
                     "aloc": aloc,
                     "depth": depth,
                     "indent": depth * 20,
                     "realizado": realizado,
-                    "saldo": saldo,
+                    "saldo": total.get("saldo", 0),
                     "percentual": percentual,
+                    "subarvore_realizado": total.get("subarvore_realizado", realizado),
                 }
                 node["filhos"] = build_tree(aloc.id, depth + 1)
                 node["has_children"] = bool(node["filhos"])
@@ -1020,7 +1026,7 @@ def encerrar_meta_view(request, meta_id):
 
         tree = build_tree()
         aloc_top_total = sum((node["aloc"].quantidade_alocada or 0) for node in tree)
-        saldo_total = sum(node["saldo"] for node in flat_nodes)
+        saldo_total = sum(totais.get(node["aloc"].id, {}).get("subarvore_saldo", 0) for node in tree)
         return qs, tree, aloc_top_total, saldo_total
 
     def _compute_state():
@@ -1116,6 +1122,12 @@ def encerrar_meta_view(request, meta_id):
 
         if resolver_pendentes_checked and state["pendentes_total"] > 0:
             pendentes_list = list(pendentes_qs)
+            alocacao_por_unidade = {}
+            for aloc in MetaAlocacao.objects.filter(meta_id=meta.id).order_by("-id"):
+                # Ordem decrescente: a primeira alocacao (menor id) da unidade prevalece.
+                alocacao_por_unidade[aloc.unidade_id] = aloc
+            datas_por_unidade = defaultdict(set)
+            progressos = []
             with transaction.atomic():
                 for pend in pendentes_list:
                     prog = getattr(pend, "programacao", None)
@@ -1135,27 +1147,35 @@ def encerrar_meta_view(request, meta_id):
                         concluido_por_id=getattr(request.user, "id", None),
                         observacao=observacao_final,
                     )
+                    datas_por_unidade[unidade_id].add(getattr(prog, "data", None))
                     auto_resolvidos += 1
 
                     if unidade_id:
-                        aloc = (
-                            MetaAlocacao.objects
-                            .filter(meta_id=meta.id, unidade_id=unidade_id)
-                            .order_by("id")
-                            .first()
-                        )
+                        aloc = alocacao_por_unidade.get(unidade_id)
                         if aloc:
-                            ProgressoMeta.objects.create(
+                            progressos.append(ProgressoMeta(
                                 data=getattr(prog, "data", timezone.localdate()),
                                 quantidade=1,
                                 observacao="Encerramento automatico da meta",
                                 alocacao=aloc,
                                 registrado_por=request.user,
-                            )
+                            ))
                         else:
                             auto_sem_alocacao += 1
                     else:
                         auto_sem_alocacao += 1
+                if progressos:
+                    # bulk_create nao dispara os sinais de versao do progresso.
+                    ProgressoMeta.objects.bulk_create(progressos)
+                    for unidade_id in {progresso.alocacao.unidade_id for progresso in progressos}:
+                        incrementar_versao_dados(unidade_id, ESCOPO_METAS)
+                    atualizar_progresso_agregado(
+                        (progresso.alocacao.unidade_id, progresso.alocacao.meta_id, progresso.data)
+                        for progresso in progressos
+                    )
+                for unidade_id, datas in datas_por_unidade.items():
+                    incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=datas)
+                atualizar_contadores_metas([meta.id])
 
             meta.refresh_from_db()
             state, pendentes_qs = _compute_state()
@@ -1,21 +1,27 @@
 import json
 from datetime import date, timedelta
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
 from atividades.models import Area, Atividade
 from core.models import No
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from metas.models import Meta, MetaAlocacao
-from programar.models import Programacao, ProgramacaoItem
+from metas.services import atualizar_contadores_metas
+from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
 from programar.status import ENCERRADA_AUTOMATICAMENTE_MARKER
+from servidores.models import Servidor
 from veiculos.models import Veiculo
 
 
 class NaoRealizadasViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="tester_mm", password="123456")
         self.unidade = No.objects.create(nome="ULSAV SMG", tipo="setor")
@@ -255,6 +261,47 @@ class NaoRealizadasViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Nenhuma atividade")
 
+    def test_nao_realizadas_pagina_por_cursor_sem_repetir_itens(self):
+        outra_programacao = Programacao.objects.create(
+            data=date(2026, 3, 12),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        for programacao in (self.programacao, outra_programacao, outra_programacao):
+            ProgramacaoItem.objects.create(
+                programacao=programacao,
+                meta=self.meta,
+                concluido_em=timezone.now(),
+                observacao="Nao realizada extra",
+            )
+
+        vistos = []
+        url = f"{reverse('minhas_metas:nao-realizadas')}?month=2026-03"
+        with patch("minhas_metas.views.NAO_REALIZADAS_POR_PAGINA", 3):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                vistos.extend((row["data"], row["item_id"]) for row in response.context["nao_realizadas"])
+                url = response.context["proxima_pagina_url"]
+
+        self.assertEqual(len(vistos), 4)
+        self.assertEqual(vistos, sorted(set(vistos), reverse=True))
+        self.assertEqual(response.context["total_geral"], 4)
+
+    def test_nao_realizadas_contagem_mensal_renova_com_versao_da_programacao(self):
+        url = f"{reverse('minhas_metas:nao-realizadas')}?month=2026-03"
+        self.assertEqual(self.client.get(url).context["total_geral"], 1)
+
+        ProgramacaoItem.objects.create(
+            programacao=self.programacao,
+            meta=self.meta,
+            concluido_em=timezone.now(),
+        )
+        self.assertEqual(self.client.get(url).context["total_geral"], 1)
+
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO, datas=[self.programacao.data])
+        self.assertEqual(self.client.get(url).context["total_geral"], 2)
+
 
 class MapaAtividadesViewTests(TestCase):
     def setUp(self):
@@ -557,3 +604,140 @@ class MapaAtividadesViewTests(TestCase):
         opcoes_ids = {opcao["id"] for opcao in response.context["atividades_opcoes"]}
         self.assertIn(meta_mista.id, opcoes_ids)
         self.assertNotIn(self.meta.id, opcoes_ids)
+
+    def test_mapa_agrega_servidores_no_banco_e_completa_diligencias_nao_programadas(self):
+        for nome in ("Bruno", "Ana"):
+            servidor = Servidor.objects.create(unidade=self.unidade, nome=nome)
+            ProgramacaoItemServidor.objects.create(item=self.item_concluido, servidor=servidor)
+        outra_meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Outra meta do periodo",
+            quantidade_alvo=2,
+            data_limite=date(2026, 3, 31),
+            criado_por=self.user,
+        )
+        for _ in range(3):
+            ProgramacaoItem.objects.create(programacao=self.programacao, meta=outra_meta)
+
+        url = reverse("minhas_metas:mapa-atividades")
+        params = {"inicio": "2026-03-01", "fim": "2026-03-31", "status": ""}
+        with self.assertNumQueries(11):
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        rows = {row["meta_id"]: row for row in response.context["rows"]}
+        atividades = rows[self.meta.id]["atividades"]
+        self.assertEqual(len(atividades), 3)
+        self.assertEqual(atividades[0]["servidores"], ["Ana", "Bruno"])
+        self.assertTrue(atividades[0]["marcado"])
+        self.assertEqual([atividade["status_label"] for atividade in atividades[1:]], ["Nao programada"] * 2)
+        self.assertEqual(len(rows[outra_meta.id]["atividades"]), 2)
+        self.assertEqual(response.context["concluidas"], 1)
+
+
+class MinhasMetasViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="tester_lista_metas", password="123456")
+        self.unidade = No.objects.create(nome="ULSAV Lista", tipo="setor")
+        self.area = Area.objects.create(code="AREA_LISTA", nome="Area Lista")
+        self.atividade = Atividade.objects.create(
+            titulo="Vistoria de propriedades",
+            descricao="",
+            area=self.area,
+            unidade_origem=self.unidade,
+            criado_por=self.user,
+        )
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def _criar_meta(self, titulo, data_limite, quantidade_alvo=2):
+        meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            atividade=self.atividade,
+            titulo=titulo,
+            quantidade_alvo=quantidade_alvo,
+            data_limite=data_limite,
+            criado_por=self.user,
+        )
+        MetaAlocacao.objects.create(
+            meta=meta,
+            unidade=self.unidade,
+            quantidade_alocada=quantidade_alvo,
+            atribuida_por=self.user,
+        )
+        return meta
+
+    def _criar_item(self, meta, data_ref, **campos):
+        programacao, _ = Programacao.objects.get_or_create(
+            data=data_ref,
+            unidade=self.unidade,
+            defaults={"criado_por": self.user},
+        )
+        item = ProgramacaoItem.objects.create(programacao=programacao, meta=meta, **campos)
+        atualizar_contadores_metas([meta.id])
+        return item
+
+    def test_cards_filtrados_no_servidor_por_mes_status_e_carry_forward(self):
+        meta_marco = self._criar_meta("Meta de marco", date(2026, 3, 20))
+        meta_fevereiro = self._criar_meta("Meta de fevereiro com pendencia", date(2026, 2, 20))
+        meta_janeiro = self._criar_meta("Meta de janeiro resolvida", date(2026, 1, 20))
+        self._criar_item(meta_marco, date(2026, 3, 10))
+        self._criar_item(meta_fevereiro, date(2026, 2, 10))
+
+        url = reverse("minhas_metas:lista")
+        response = self.client.get(url, {"month": "2026-03", "start": "2026-03-01", "end": "2026-03-31"})
+
+        self.assertEqual(response.status_code, 200)
+        cards = {aloc.meta_id: aloc.meta for aloc in response.context["alocacoes"]}
+        self.assertEqual(set(cards), {meta_marco.id, meta_fevereiro.id})
+        self.assertTrue(cards[meta_fevereiro.id].carry_forward)
+        self.assertEqual(cards[meta_fevereiro.id].month_key, "2026-02")
+        self.assertEqual(cards[meta_marco.id].programadas_total, 1)
+        self.assertEqual(cards[meta_marco.id].status_key, "atrasada")
+        self.assertEqual(
+            [filtro["key"] for filtro in response.context["meta_month_filters"]],
+            ["2026-01", "2026-02", "2026-03"],
+        )
+        self.assertNotIn(meta_janeiro.id, cards)
+
+        meta_marco.encerrada = True
+        meta_marco.save(update_fields=["encerrada"])
+        response = self.client.get(url, {"month": "2026-03", "meta_status": "encerrada"})
+        self.assertEqual([aloc.meta_id for aloc in response.context["alocacoes"]], [meta_marco.id])
+
+    def test_cards_paginados_por_cursor_sem_repetir_metas(self):
+        metas = [self._criar_meta(f"Meta {indice}", date(2026, 3, 10 + indice % 2)) for indice in range(5)]
+        metas.append(self._criar_meta("Meta sem data", None))
+
+        vistos = []
+        url = f"{reverse('minhas_metas:lista')}?month=2026-03"
+        with patch("minhas_metas.views.METAS_POR_PAGINA", 2):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(response.context["alocacoes"]), 2)
+                vistos.extend(aloc.meta_id for aloc in response.context["alocacoes"])
+                url = response.context["proxima_pagina_url"]
+
+        self.assertTrue(response.context["primeira_pagina_url"])
+        esperado = sorted(metas[:5], key=lambda meta: (meta.data_limite, meta.titulo))
+        self.assertEqual(vistos, [meta.id for meta in esperado])
+
+    def test_andamento_da_meta_lista_itens_e_meta_sem_programacao(self):
+        meta = self._criar_meta("Meta acompanhada", date(2026, 3, 20))
+        meta_vazia = self._criar_meta("Meta sem itens", date(2026, 3, 25))
+        self._criar_item(meta, date(2026, 3, 10), concluido=True, concluido_em=timezone.now())
+
+        response = self.client.get(reverse("minhas_metas:andamento"), {"meta": meta.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["andamento"]), 1)
+        self.assertEqual(response.context["resumo_meta"]["concluidas"], 1)
+        self.assertEqual(response.context["metas_sem_programacao"], [])
+
+        response = self.client.get(reverse("minhas_metas:andamento"), {"meta": meta_vazia.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m.id for m in response.context["metas_sem_programacao"]], [meta_vazia.id])
@@ -1,5 +1,7 @@
 import json
 from collections import defaultdict, OrderedDict
+from itertools import groupby
+from operator import itemgetter
 from datetime import date
 from calendar import monthrange
 
@@ -8,17 +10,39 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth
+from django.db.models import (
+    BooleanField,
+    Case,
+    CharField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, ExtractYear, TruncMonth
 from django.http import JsonResponse
 from django.template.loader import render_to_string
 from django.urls import reverse
 
 from atividades.models import Area
+from core.services.versoes import ESCOPO_PROGRAMACAO, cached_por_versao
 from core.utils import get_unidade_atual
-from metas.models import MetaAlocacao
+from metas.models import Meta, MetaAlocacao
 from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
-from programar.querysets import item_conta_como_programado_q
+from programar.querysets import (
+    SEPARADOR_NOMES,
+    item_conta_como_programado_q,
+    item_execucao_status_case,
+    item_origem_remarcada_concluida_q,
+    servidores_nomes_subquery,
+)
 from programar.status import (
     CANCELADA,
     ENCERRADA_AUTOMATICAMENTE,
@@ -29,7 +53,6 @@ from programar.status import (
     REMARCADA_CONCLUIDA,
     EXECUTADA,
     ENCERRADA_AUTOMATICAMENTE_MARKER,
-    item_execucao_status_from_fields,
 )
 from relatorios.services.non_performed_service import build_non_performed_groups
 from veiculos.models import Veiculo
@@ -49,6 +72,22 @@ MONTH_NAMES_PT = (
     "Dezembro",
 )
 
+NAO_REALIZADAS_POR_PAGINA = 50
+METAS_POR_PAGINA = 24
+
+# Status do filtro do mapa que tambem aceitam outros status de item.
+MAPA_STATUS_EQUIVALENTES = {
+    "concluidas": ("remarcadas_concluidas",),
+    "em_andamento": ("pendentes",),
+}
+
+META_STATUS_LABELS = {
+    "andamento": "Em andamento",
+    "atrasada": "Atrasada",
+    "concluida": "Concluída",
+    "encerrada": "Encerrada",
+}
+
 
 def _parse_iso(value: str | None) -> date | None:
     if not value:
@@ -81,19 +120,50 @@ def _format_period_label(data_inicial: date | None, data_final: date | None) ->
     return f"{data_inicial.strftime('%d/%m/%Y')} -> {data_final.strftime('%d/%m/%Y')}"
 
 
-def _origens_remarcadas_concluidas_ids(item_ids) -> set[int]:
-    ids = [int(item_id) for item_id in item_ids if item_id]
-    if not ids:
-        return set()
-    return {
-        int(item_id)
-        for item_id in ProgramacaoItem.objects.filter(
-            remarcado_de_id__in=ids,
-            concluido=True,
-            cancelada=False,
-        ).values_list("remarcado_de_id", flat=True)
-        if item_id
-    }
+def _parse_nao_realizadas_cursor(value: str | None) -> tuple[date, int] | None:
+    """Cursor de paginacao no formato AAAA-MM-DD.<item_id> (ultimo item da pagina anterior)."""
+    raw_data, _, raw_id = str(value or "").strip().partition(".")
+    data_ref = _parse_iso(raw_data)
+    if not data_ref or not raw_id.isdigit():
+        return None
+    return data_ref, int(raw_id)
+
+
+def _nao_realizadas_month_filters(
+    unidade_id: int,
+    itens_base,
+    *,
+    today: date,
+    bloqueios_encerramento: bool,
+) -> list[dict[str, str | int]]:
+    def build() -> list[dict[str, str | int]]:
+        month_filters: list[dict[str, str | int]] = []
+        month_counts_qs = (
+            itens_base.order_by()
+            .annotate(month_start=TruncMonth("programacao__data"))
+            .values("month_start")
+            .annotate(total=Count("id"))
+            .order_by("-month_start")
+        )
+        for row in month_counts_qs:
+            month_start = row.get("month_start")
+            month_value = month_start.date() if hasattr(month_start, "date") else month_start
+            if not month_value:
+                continue
+            month_filters.append({
+                "key": f"{month_value.year}-{month_value.month:02d}",
+                "label": f"{MONTH_NAMES_PT[month_value.month - 1]} de {month_value.year}",
+                "total": int(row.get("total") or 0),
+            })
+        return month_filters
+
+    return cached_por_versao(
+        "nao_realizadas_meses",
+        build,
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_PROGRAMACAO],
+        extra={"hoje": today, "bloqueios": bloqueios_encerramento},
+    )
 
 
 def _format_date_label(data_ref: date | None) -> str:
@@ -120,21 +190,6 @@ def _build_programar_modal_context(unidade_id: int | None) -> dict[str, object]:
     }
 
 
-def _meta_status_info(meta):
-    if not meta:
-        return "andamento", "Em andamento"
-    try:
-        if getattr(meta, "encerrada", False):
-            return "encerrada", "Encerrada"
-        if getattr(meta, "concluida", False):
-            return "concluida", "Concluída"
-        if getattr(meta, "atrasada", False):
-            return "atrasada", "Atrasada"
-    except Exception:
-        pass
-    return "andamento", "Em andamento"
-
-
 def _secondary_activity_name(meta) -> str | None:
     atividade = getattr(meta, "atividade", None)
     atividade_nome = getattr(atividade, "titulo", None) or getattr(atividade, "nome", None)
@@ -149,30 +204,6 @@ def _secondary_activity_name(meta) -> str | None:
     return atividade_nome
 
 
-def _item_execucao_info(item):
-    status = item_execucao_status_from_fields(
-        bool(getattr(item, "concluido", False)),
-        getattr(item, "concluido_em", None),
-        bool(getattr(item, "cancelada", False)),
-        bool(getattr(item, "nao_realizada_justificada", False)),
-        getattr(item, "remarcado_de_id", None),
-        getattr(item, "observacao", "") or "",
-    )
-    if status == ENCERRADA_AUTOMATICAMENTE:
-        return "encerradas_automaticamente", ITEM_STATUS_LABELS[ENCERRADA_AUTOMATICAMENTE]
-    if status == REMARCADA_CONCLUIDA:
-        return "remarcadas_concluidas", ITEM_STATUS_LABELS[REMARCADA_CONCLUIDA]
-    if status == EXECUTADA:
-        return "concluidas", ITEM_STATUS_LABELS[EXECUTADA]
-    if status == CANCELADA:
-        return "canceladas", ITEM_STATUS_LABELS[CANCELADA]
-    if status == NAO_REALIZADA_JUSTIFICADA:
-        return "nao_realizadas_justificadas", "Não realizada justificada"
-    if status == NAO_REALIZADA:
-        return "nao_realizadas", ITEM_STATUS_LABELS[NAO_REALIZADA]
-    return "pendentes", ITEM_STATUS_LABELS[PENDENTE]
-
-
 def _mapa_atividade_deve_marcar(status_key: str) -> bool:
     return status_key in {
         "concluidas",
@@ -183,35 +214,247 @@ def _mapa_atividade_deve_marcar(status_key: str) -> bool:
     }
 
 
-def _meta_ids_com_itens_abertos(
-    unidade_id: int | None,
-    *,
-    reference_month_start: date | None = None,
-) -> set[int]:
-    if not unidade_id:
-        return set()
-    itens_qs = (
-        ProgramacaoItem.objects
-        .filter(
-            programacao__unidade_id=unidade_id,
-            concluido=False,
-            cancelada=False,
-            nao_realizada_justificada=False,
-            meta_id__isnull=False,
+_STATUS_ITEM_MINHAS_METAS = {
+    ENCERRADA_AUTOMATICAMENTE: ("encerradas_automaticamente", ITEM_STATUS_LABELS[ENCERRADA_AUTOMATICAMENTE]),
+    REMARCADA_CONCLUIDA: ("remarcadas_concluidas", ITEM_STATUS_LABELS[REMARCADA_CONCLUIDA]),
+    EXECUTADA: ("concluidas", ITEM_STATUS_LABELS[EXECUTADA]),
+    CANCELADA: ("canceladas", ITEM_STATUS_LABELS[CANCELADA]),
+    NAO_REALIZADA_JUSTIFICADA: ("nao_realizadas_justificadas", "Não realizada justificada"),
+    NAO_REALIZADA: ("nao_realizadas", ITEM_STATUS_LABELS[NAO_REALIZADA]),
+    PENDENTE: ("pendentes", ITEM_STATUS_LABELS[PENDENTE]),
+}
+
+
+def _itens_execucao(itens_qs) -> tuple[list[dict[str, object]], dict[int, Meta]]:
+    """
+    Itens como (meta, item, status, servidores) em uma consulta agrupada: o status
+    e os nomes dos servidores sao calculados no banco. Retorna os itens (na ordem
+    de ``itens_qs``) e as metas referenciadas, carregadas de uma vez.
+    """
+    linhas = list(
+        itens_qs
+        .annotate(status_execucao=item_execucao_status_case(), servidores_nomes=servidores_nomes_subquery())
+        .values(
+            "id",
+            "meta_id",
+            "programacao__data",
+            "concluido",
+            "veiculo__nome",
+            "status_execucao",
+            "servidores_nomes",
         )
     )
-    if reference_month_start:
-        itens_qs = itens_qs.filter(
-            programacao__data__lt=reference_month_start,
-            meta__data_limite__isnull=False,
-            meta__data_limite__lt=reference_month_start,
+    metas = Meta.objects.select_related("atividade").in_bulk(
+        {linha["meta_id"] for linha in linhas if linha["meta_id"]}
+    )
+    titulos = {
+        meta_id: (meta.display_titulo or "(sem titulo)", _secondary_activity_name(meta))
+        for meta_id, meta in metas.items()
+    }
+    itens = []
+    for linha in linhas:
+        if linha["meta_id"] not in titulos:
+            continue
+        meta_titulo, atividade_nome = titulos[linha["meta_id"]]
+        status_key, status_label = _STATUS_ITEM_MINHAS_METAS[linha["status_execucao"]]
+        nomes = linha["servidores_nomes"]
+        itens.append({
+            "item_id": linha["id"],
+            "data": linha["programacao__data"],
+            "meta_id": linha["meta_id"],
+            "meta_titulo": meta_titulo,
+            "atividade_nome": atividade_nome,
+            "veiculo": linha["veiculo__nome"] or "",
+            "servidores": sorted(nomes.split(SEPARADOR_NOMES)) if nomes else [],
+            "concluido": bool(linha["concluido"]),
+            "status_key": status_key,
+            "status_label": status_label,
+            "marcado": _mapa_atividade_deve_marcar(status_key),
+        })
+    return itens, metas
+
+
+def _linha_mapa(meta, diligencias_total: int, itens_meta, status_aceitos: set[str] | None) -> dict[str, object]:
+    """
+    Linha do mapa: um quadrado por diligencia, preenchido pelos itens da meta na
+    ordem e completado com diligencias nao programadas; ``status_aceitos`` (None =
+    todos) filtra os quadrados.
+    """
+    meta_titulo = meta.display_titulo or "Atividade"
+    atividade_secundaria = _secondary_activity_name(meta)
+    itens_meta = list(itens_meta[:diligencias_total])
+    atividades = [
+        item for item in itens_meta
+        if status_aceitos is None or item["status_key"] in status_aceitos
+    ]
+    if status_aceitos is None or "em_andamento" in status_aceitos:
+        nao_programada = {
+            "item_id": None,
+            "data": None,
+            "meta_titulo": meta_titulo,
+            "atividade_nome": atividade_secundaria,
+            "veiculo": "",
+            "servidores": [],
+            "status_key": "em_andamento",
+            "status_label": "Nao programada",
+            "concluido": False,
+            "marcado": False,
+        }
+        atividades.extend([nao_programada] * (diligencias_total - len(itens_meta)))
+    return {
+        "meta_id": meta.id,
+        "atividade_nome": meta_titulo,
+        "atividade_secundaria": atividade_secundaria,
+        "data_limite": meta.data_limite,
+        "atividades": atividades,
+        "concluidas": sum(1 for item in atividades if item["concluido"]),
+    }
+
+
+def _alocacoes_unidade_qs(unidade_id: int, *, status_month_start: date):
+    """
+    Alocacoes da unidade anotadas com ``carry_forward``: meta vencida antes do mes
+    de referencia que ainda tem itens abertos na unidade (pendentes/nao realizadas
+    de meses anteriores continuam aparecendo nos meses seguintes).
+    """
+    itens_abertos = ProgramacaoItem.objects.filter(
+        meta_id=OuterRef("meta_id"),
+        programacao__unidade_id=unidade_id,
+        programacao__data__lt=status_month_start,
+        concluido=False,
+        cancelada=False,
+        nao_realizada_justificada=False,
+    )
+    return MetaAlocacao.objects.filter(unidade_id=unidade_id).annotate(
+        carry_forward=ExpressionWrapper(
+            Q(meta__data_limite__lt=status_month_start) & Exists(itens_abertos),
+            output_field=BooleanField(),
         )
-    ids = (
-        itens_qs
-        .values_list("meta_id", flat=True)
-        .distinct()
     )
-    return {int(meta_id) for meta_id in ids if meta_id}
+
+
+def _anotar_status_cards(alocacoes_qs, *, unidade_id: int, today: date, status_month_start: date):
+    """
+    Anota o que os cards exibem: ``programadas_total`` e ``status_card`` (mesma
+    precedencia de Meta.encerrada/concluida/atrasada; em andamento com execucao
+    atrasada na unidade vira atrasada). Usa os contadores da alocacao; a meta de
+    expediente, sem contadores, consulta os itens da unidade.
+    """
+    execucao_atrasada = Q(exec_pendente_desde__lt=today) | Q(
+        exec_nao_realizada_desde__lt=status_month_start,
+        meta__data_limite__lt=status_month_start,
+    )
+    programadas = F("exec_programadas")
+    expediente_meta_id = getattr(settings, "META_EXPEDIENTE_ID", None)
+    if expediente_meta_id:
+        itens_meta = ProgramacaoItem.objects.filter(meta_id=OuterRef("meta_id"), programacao__unidade_id=unidade_id)
+        itens_atrasados = itens_meta.filter(
+            Q(concluido=False, concluido_em__isnull=True, cancelada=False, programacao__data__lt=today)
+            | Q(
+                concluido=False,
+                concluido_em__isnull=False,
+                cancelada=False,
+                nao_realizada_justificada=False,
+                programacao__data__lt=status_month_start,
+                meta__data_limite__lt=status_month_start,
+            )
+        )
+        execucao_atrasada = (~Q(meta_id=expediente_meta_id) & execucao_atrasada) | (
+            Q(meta_id=expediente_meta_id) & Exists(itens_atrasados)
+        )
+        programadas = Case(
+            When(
+                meta_id=expediente_meta_id,
+                then=Coalesce(
+                    Subquery(
+                        itens_meta.filter(item_conta_como_programado_q())
+                        .order_by()
+                        .values("meta_id")
+                        .annotate(total=Count("id"))
+                        .values("total")[:1]
+                    ),
+                    Value(0),
+                ),
+            ),
+            default=F("exec_programadas"),
+            output_field=IntegerField(),
+        )
+
+    return (
+        alocacoes_qs
+        .with_saldo(com_meta=True)
+        .select_related("meta", "meta__atividade", "meta__criado_por", "meta__unidade_criadora")
+        .annotate(
+            programadas_total=programadas,
+            status_card=Case(
+                When(meta__encerrada=True, then=Value("encerrada")),
+                When(
+                    meta__quantidade_alvo__gt=0,
+                    _meta_realizado_total__gte=F("meta__quantidade_alvo"),
+                    then=Value("concluida"),
+                ),
+                When(Q(meta__data_limite__lt=today) | execucao_atrasada, then=Value("atrasada")),
+                default=Value("andamento"),
+                output_field=CharField(),
+            ),
+        )
+        .order_by(F("meta__data_limite").asc(nulls_last=True), "meta__titulo", "id")
+    )
+
+
+def _filtro_mes_cards(month_key: str | None) -> Q:
+    """Metas da aba de mes: data limite no mes ou carregadas (carry_forward) de meses anteriores."""
+    if not month_key:
+        return Q()
+    if month_key == "nodate":
+        return Q(meta__data_limite__isnull=True)
+    parsed = _parse_month_key(month_key)
+    if not parsed:
+        return Q()
+    inicio = date(parsed[0], parsed[1], 1)
+    fim = date(parsed[0], parsed[1], monthrange(parsed[0], parsed[1])[1])
+    return Q(meta__data_limite__gte=inicio, meta__data_limite__lte=fim) | Q(
+        carry_forward=True,
+        meta__data_limite__lt=inicio,
+    )
+
+
+def _filtrar_apos_alocacao(alocacoes_qs, cursor_raw: str | None):
+    """
+    Paginacao por chave na ordem (data_limite, titulo, id) dos cards. O cursor e o
+    id da ultima alocacao da pagina anterior; retorna (queryset, id do cursor).
+    """
+    raw = str(cursor_raw or "").strip()
+    if not raw.isdigit():
+        return alocacoes_qs, None
+    ultima = (
+        MetaAlocacao.objects.filter(id=int(raw))
+        .values("id", "meta__data_limite", "meta__titulo")
+        .first()
+    )
+    if not ultima:
+        return alocacoes_qs, None
+    limite = ultima["meta__data_limite"]
+    depois = Q(meta__titulo__gt=ultima["meta__titulo"]) | Q(meta__titulo=ultima["meta__titulo"], id__gt=ultima["id"])
+    if limite is None:
+        filtro = Q(meta__data_limite__isnull=True) & depois
+    else:
+        filtro = (
+            Q(meta__data_limite__gt=limite)
+            | Q(meta__data_limite__isnull=True)
+            | (Q(meta__data_limite=limite) & depois)
+        )
+    return alocacoes_qs.filter(filtro), ultima["id"]
+
+
+def _preparar_card_meta(aloc) -> None:
+    meta_obj = aloc.meta
+    meta_obj.programadas_total = int(aloc.programadas_total or 0)
+    meta_obj.status_key = aloc.status_card
+    meta_obj.status_label = META_STATUS_LABELS[aloc.status_card]
+    meta_obj.carry_forward = bool(aloc.carry_forward)
+    limite = meta_obj.data_limite
+    meta_obj.month_key = f"{limite.year}-{limite.month:02d}" if limite else "nodate"
 
 
 @login_required
@@ -275,100 +518,19 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
             status_query_filter = "pendentes"
             status_dropdown = "pendentes"
 
-    alocacoes_qs = (
-        MetaAlocacao.objects
-        .select_related("meta", "meta__atividade", "meta__criado_por", "meta__unidade_criadora")
-        .annotate(realizado_unidade=Sum("progresso__quantidade"))
-        .filter(unidade=unidade)
-        .order_by("meta__data_limite", "meta__titulo")
-    )
+    alocacoes_base = _alocacoes_unidade_qs(unidade.id, status_month_start=status_month_start)
     if not include_encerradas_cards:
-        alocacoes_qs = alocacoes_qs.filter(meta__encerrada=False)
-
-    meta_ids = list(alocacoes_qs.values_list("meta_id", flat=True))
-    programadas_por_meta: dict[int, int] = {}
-    metas_com_execucao_atrasada_ids: set[int] = set()
-    if meta_ids:
-        itens_stats = (
-            ProgramacaoItem.objects
-            .filter(meta_id__in=meta_ids, programacao__unidade_id=unidade.id)
-            .values("meta_id")
-            .annotate(
-                total=Count("id", filter=item_conta_como_programado_q()),
-                nao_realizadas_atrasadas=Count(
-                    "id",
-                    filter=Q(
-                        concluido=False,
-                        concluido_em__isnull=False,
-                        cancelada=False,
-                        nao_realizada_justificada=False,
-                        programacao__data__lt=status_month_start,
-                        meta__data_limite__isnull=False,
-                        meta__data_limite__lt=status_month_start,
-                    ),
-                ),
-                pendentes_atrasadas=Count(
-                    "id",
-                    filter=Q(concluido=False, concluido_em__isnull=True, cancelada=False, programacao__data__lt=today),
-                ),
-            )
-        )
-        for row in itens_stats:
-            mid = int(row.get("meta_id") or 0)
-            if not mid:
-                continue
-            programadas_por_meta[mid] = int(row.get("total") or 0)
-            if int(row.get("nao_realizadas_atrasadas") or 0) > 0 or int(row.get("pendentes_atrasadas") or 0) > 0:
-                metas_com_execucao_atrasada_ids.add(mid)
-
-    metas_com_itens_abertos_ids = _meta_ids_com_itens_abertos(
-        getattr(unidade, "id", None),
-        reference_month_start=status_month_start,
-    )
-
-    alocacoes = list(alocacoes_qs)
-    metas_sem_programacao = []
-    metas_sem_programacao_ids = set()
-    for aloc in alocacoes:
-        meta_obj = getattr(aloc, "meta", None)
-        if meta_obj and getattr(meta_obj, "id", None):
-            meta_id_int = int(meta_obj.id)
-            total_programadas = programadas_por_meta.get(meta_id_int, 0)
-            setattr(meta_obj, "programadas_total", total_programadas)
-            status_key, status_label = _meta_status_info(meta_obj)
-            if status_key == "andamento" and meta_id_int in metas_com_execucao_atrasada_ids:
-                status_key, status_label = "atrasada", "Atrasada"
-            setattr(meta_obj, "status_key", status_key)
-            setattr(meta_obj, "status_label", status_label)
-            limite_meta = getattr(meta_obj, "data_limite", None)
-            if limite_meta and hasattr(limite_meta, "date") and not isinstance(limite_meta, date):
-                limite_meta = limite_meta.date()
-            carry_forward = (
-                bool(limite_meta)
-                and limite_meta < status_month_start
-                and meta_id_int in metas_com_itens_abertos_ids
-            )
-            setattr(meta_obj, "carry_forward", carry_forward)
-            if (
-                total_programadas == 0
-                and (not meta_filter_id or meta_filter_id == meta_id_int)
-                and meta_id_int not in metas_sem_programacao_ids
-            ):
-                metas_sem_programacao_ids.add(meta_id_int)
-                metas_sem_programacao.append(meta_obj)
+        alocacoes_base = alocacoes_base.filter(meta__encerrada=False)
 
     # anos disponíveis (baseados na data_limite)
-    years_set: set[int] = set()
-    for aloc in alocacoes:
-        limite = getattr(getattr(aloc, "meta", None), "data_limite", None)
-        if limite and hasattr(limite, "year"):
-            years_set.add(limite.year)
-    if any(
-        getattr(getattr(aloc, "meta", None), "carry_forward", False)
-        and getattr(getattr(aloc, "meta", None), "data_limite", None)
-        and getattr(getattr(aloc, "meta", None), "data_limite", None).year < today.year
-        for aloc in alocacoes
-    ):
+    years_set: set[int] = set(
+        alocacoes_base.filter(meta__data_limite__isnull=False)
+        .annotate(ano=ExtractYear("meta__data_limite"))
+        .order_by()
+        .values_list("ano", flat=True)
+        .distinct()
+    )
+    if alocacoes_base.filter(carry_forward=True, meta__data_limite__year__lt=today.year).exists():
         years_set.add(today.year)
     years = sorted(years_set, reverse=True)
 
@@ -387,45 +549,32 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
     if ano_selected is not None and ano_selected not in years:
         years = sorted({*years, ano_selected}, reverse=True)
 
+    alocacoes_qs = alocacoes_base
+    alocacoes_ano = alocacoes_base
     if ano_selected:
         # Inclui metas sem data_limite e carrega pendentes/não realizadas de anos anteriores.
-        filtradas = []
-        for aloc in alocacoes:
-            meta_obj = getattr(aloc, "meta", None)
-            limite = getattr(meta_obj, "data_limite", None) if meta_obj else None
-            if limite and hasattr(limite, "date") and not isinstance(limite, date):
-                limite = limite.date()
-            if not limite:
-                filtradas.append(aloc)
-                continue
-            if limite.year == ano_selected:
-                filtradas.append(aloc)
-                continue
-            if getattr(meta_obj, "carry_forward", False) and limite.year < ano_selected:
-                filtradas.append(aloc)
-        alocacoes = filtradas
+        alocacoes_qs = alocacoes_qs.filter(
+            Q(meta__data_limite__isnull=True)
+            | Q(meta__data_limite__year=ano_selected)
+            | Q(carry_forward=True, meta__data_limite__year__lt=ano_selected)
+        )
+        alocacoes_ano = alocacoes_ano.filter(
+            Q(meta__data_limite__isnull=True) | Q(meta__data_limite__year=ano_selected)
+        )
 
     month_keys = OrderedDict()
-    for aloc in alocacoes:
-        meta_obj = getattr(aloc, "meta", None)
-        if not meta_obj:
-            continue
-        limite = getattr(meta_obj, "data_limite", None)
-        if limite and hasattr(limite, "date") and not isinstance(limite, date):
-            limite = limite.date()
-        if limite:
-            key = f"{limite.year}-{limite.month:02d}"
-            label = f"{MONTH_NAMES_PT[limite.month - 1]} de {limite.year}"
-        else:
-            key = "nodate"
-            label = "Sem data"
-        include_key = True
-        parsed_key = _parse_month_key(key)
-        if ano_selected is not None and key != "nodate":
-            include_key = bool(parsed_key and parsed_key[0] == ano_selected)
-        if include_key and key not in month_keys:
-            month_keys[key] = label
-        setattr(meta_obj, "month_key", key)
+    meses_qs = (
+        alocacoes_ano.filter(meta__data_limite__isnull=False)
+        .annotate(mes=TruncMonth("meta__data_limite"))
+        .order_by("mes")
+        .values_list("mes", flat=True)
+        .distinct()
+    )
+    for mes in meses_qs:
+        mes = mes.date() if hasattr(mes, "date") else mes
+        month_keys[f"{mes.year}-{mes.month:02d}"] = f"{MONTH_NAMES_PT[mes.month - 1]} de {mes.year}"
+    if alocacoes_ano.filter(meta__data_limite__isnull=True).exists():
+        month_keys["nodate"] = "Sem data"
 
     today_key = f"{today.year}-{today.month:02d}"
     month_default_key: str | None = None
@@ -450,6 +599,26 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
 
     meta_month_filters = [{"key": key, "label": label} for key, label in month_keys.items()]
 
+    alocacoes = []
+    cursor_alocacao_id = None
+    proxima_alocacao_id = None
+    if not is_andamento_template:
+        alocacoes_qs = _anotar_status_cards(
+            alocacoes_qs.filter(_filtro_mes_cards(month_default_key)),
+            unidade_id=unidade.id,
+            today=today,
+            status_month_start=status_month_start,
+        )
+        if meta_status_cards_filter:
+            alocacoes_qs = alocacoes_qs.filter(status_card=meta_status_cards_filter)
+        alocacoes_qs, cursor_alocacao_id = _filtrar_apos_alocacao(alocacoes_qs, request.GET.get("apos"))
+        alocacoes = list(alocacoes_qs[: METAS_POR_PAGINA + 1])
+        if len(alocacoes) > METAS_POR_PAGINA:
+            alocacoes = alocacoes[:METAS_POR_PAGINA]
+            proxima_alocacao_id = alocacoes[-1].id
+        for aloc in alocacoes:
+            _preparar_card_meta(aloc)
+
     default_start = today.replace(day=1)
     default_end = today.replace(day=monthrange(today.year, today.month)[1])
     if (not request.GET.get("start")) and (not request.GET.get("end")) and month_default_key and month_default_key not in {"nodate", today_key}:
@@ -510,58 +679,28 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
     elif status_query_filter == "pendentes":
         itens_qs = itens_qs.filter(concluido=False, concluido_em__isnull=True)
 
-    item_ids = list(itens_qs.values_list("id", flat=True))
-    servidores_por_item: dict[int, list[str]] = defaultdict(list)
-    if item_ids:
-        links = (
-            ProgramacaoItemServidor.objects
-            .select_related("servidor")
-            .filter(item_id__in=item_ids)
-        )
-        for link in links:
-            servidor_nome = getattr(link.servidor, "nome", f"Servidor {link.servidor_id}")
-            servidores_por_item[link.item_id].append(servidor_nome)
-
-    andamento = []
-    vistos = set()
-    for item in itens_qs:
-        if item.id in vistos:
-            continue
-        vistos.add(item.id)
-        meta = getattr(item, "meta", None)
-        programacao = getattr(item, "programacao", None)
-        if not meta or not programacao:
-            continue
-
-        status_key, status_label = _item_execucao_info(item)
-        andamento.append({
-            "item_id": item.id,
-            "data": getattr(programacao, "data", None),
-            "meta_id": getattr(meta, "id", None),
-            "meta_titulo": getattr(meta, "display_titulo", None) or getattr(meta, "titulo", "(sem titulo)"),
-            "atividade_nome": _secondary_activity_name(meta),
-            "veiculo": getattr(getattr(item, "veiculo", None), "nome", "") or "",
-            "servidores": servidores_por_item.get(item.id, []),
-            "concluido": bool(getattr(item, "concluido", False)),
-            "status_key": status_key,
-            "status_label": status_label,
-        })
+    andamento, _ = _itens_execucao(itens_qs)
 
     selected_meta_title: str = ""
     selected_meta = None
     selected_aloc = None
+    metas_sem_programacao = []
     if meta_filter_id:
-        for aloc in alocacoes:
-            meta_obj = getattr(aloc, "meta", None)
-            if meta_obj and getattr(meta_obj, "id", None) == meta_filter_id:
-                selected_meta = meta_obj
-                selected_aloc = aloc
-                break
-        if not selected_meta:
-            selected_aloc = MetaAlocacao.objects.filter(meta_id=meta_filter_id, unidade=unidade).select_related("meta").first()
-            selected_meta = getattr(selected_aloc, "meta", None)
+        selected_aloc = next((aloc for aloc in alocacoes if aloc.meta_id == meta_filter_id), None)
+        if not selected_aloc:
+            selected_aloc = _anotar_status_cards(
+                _alocacoes_unidade_qs(unidade.id, status_month_start=status_month_start).filter(meta_id=meta_filter_id),
+                unidade_id=unidade.id,
+                today=today,
+                status_month_start=status_month_start,
+            ).first()
+            if selected_aloc:
+                _preparar_card_meta(selected_aloc)
+        selected_meta = getattr(selected_aloc, "meta", None)
         if selected_meta:
             selected_meta_title = getattr(selected_meta, "display_titulo", None) or getattr(selected_meta, "titulo", "")
+            if selected_meta.programadas_total == 0 and (include_encerradas_cards or not selected_meta.encerrada):
+                metas_sem_programacao.append(selected_meta)
 
     resumo_meta = None
     if selected_meta and meta_filter_id:
@@ -608,7 +747,7 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
         concluidas = int(resumo_agg.get("concluidas") or 0)
         percentual_conclusao = round((concluidas / total_programadas) * 100, 1) if total_programadas else 0.0
         alocado_unidade = int(getattr(selected_aloc, "quantidade_alocada", 0) or 0)
-        executado_unidade = int(getattr(selected_aloc, "realizado_unidade", 0) or 0)
+        executado_unidade = selected_aloc.realizado
 
         primeira_data = (
             resumo_qs.order_by("programacao__data")
@@ -653,9 +792,21 @@ def minhas_metas_view(request, template_name="minhas_metas/lista_metas.html"):
             "meta_title": selected_meta_title,
         })
 
+    proxima_pagina_url = ""
+    primeira_pagina_url = ""
+    pagina_query = request.GET.copy()
+    if proxima_alocacao_id:
+        pagina_query["apos"] = str(proxima_alocacao_id)
+        proxima_pagina_url = f"{request.path}?{pagina_query.urlencode()}"
+    if cursor_alocacao_id:
+        pagina_query.pop("apos", None)
+        primeira_pagina_url = f"{request.path}?{pagina_query.urlencode()}" if pagina_query else request.path
+
     contexto = {
         "unidade": unidade,
         "alocacoes": alocacoes,
+        "proxima_pagina_url": proxima_pagina_url,
+        "primeira_pagina_url": primeira_pagina_url,
         "andamento": andamento,
         "dt_start": dt_start,
         "dt_end": dt_end,
@@ -690,56 +841,31 @@ def nao_realizadas_view(request):
     month_param_parsed = _parse_month_key(month_param)
     bloqueios_encerramento = request.GET.get("bloqueios_encerramento", "").strip().lower() in {"1", "true", "yes", "on"}
 
-    status_filter = Q(
-        concluido=False,
-        concluido_em__isnull=False,
-        cancelada=False,
-        nao_realizada_justificada=False,
-    )
-    pendentes_filter = Q(
-        concluido=False,
-        concluido_em__isnull=True,
-        cancelada=False,
-        nao_realizada_justificada=False,
-    )
-    if not bloqueios_encerramento:
-        pendentes_filter &= Q(programacao__data__lt=today)
-
+    # O predicado "aberto" casa com o indice parcial idx_progitem_abertos.
     itens_base = (
         ProgramacaoItem.objects
         .select_related("programacao", "meta", "meta__atividade", "veiculo")
         .filter(programacao__unidade_id=unidade.id)
-        .filter(status_filter | pendentes_filter)
+        .filter(concluido=False, cancelada=False, nao_realizada_justificada=False)
         .exclude(observacao__contains=ENCERRADA_AUTOMATICAMENTE_MARKER)
         .order_by("-programacao__data", "-id")
     )
+    if not bloqueios_encerramento:
+        itens_base = itens_base.filter(
+            Q(concluido_em__isnull=False) | Q(programacao__data__lt=today)
+        )
     expediente_meta_id = getattr(settings, "META_EXPEDIENTE_ID", None)
     if expediente_meta_id:
         itens_base = itens_base.exclude(meta_id=expediente_meta_id)
     if bloqueios_encerramento:
-        origens_remarcadas_concluidas = _origens_remarcadas_concluidas_ids(itens_base.values_list("id", flat=True))
-        if origens_remarcadas_concluidas:
-            itens_base = itens_base.exclude(id__in=origens_remarcadas_concluidas)
-
-    month_filters: list[dict[str, str | int]] = []
-    month_counts_qs = (
-        itens_base.exclude(programacao__data__isnull=True)
-        .annotate(month_start=TruncMonth("programacao__data"))
-        .values("month_start")
-        .annotate(total=Count("id"))
-        .order_by("-month_start")
+        itens_base = itens_base.exclude(item_origem_remarcada_concluida_q())
+
+    month_filters = _nao_realizadas_month_filters(
+        unidade.id,
+        itens_base,
+        today=today,
+        bloqueios_encerramento=bloqueios_encerramento,
     )
-    for row in month_counts_qs:
-        month_start = row.get("month_start")
-        month_value = month_start.date() if hasattr(month_start, "date") else month_start
-        if not month_value:
-            continue
-        month_key = f"{month_value.year}-{month_value.month:02d}"
-        month_filters.append({
-            "key": month_key,
-            "label": f"{MONTH_NAMES_PT[month_value.month - 1]} de {month_value.year}",
-            "total": int(row.get("total") or 0),
-        })
 
     month_keys = [str(item.get("key") or "") for item in month_filters]
     selected_month_key = ""
@@ -769,7 +895,25 @@ def nao_realizadas_view(request):
             )
             itens_qs = itens_qs.filter(programacao__data__gte=dt_start, programacao__data__lte=dt_end)
 
-    item_ids = list(itens_qs.values_list("id", flat=True))
+    cursor = None if is_print else _parse_nao_realizadas_cursor(request.GET.get("apos"))
+    if cursor:
+        cursor_data, cursor_id = cursor
+        itens_qs = itens_qs.filter(
+            Q(programacao__data__lt=cursor_data)
+            | Q(programacao__data=cursor_data, id__lt=cursor_id)
+        )
+    if is_print:
+        itens_pagina = list(itens_qs)
+        proximo_cursor = ""
+    else:
+        itens_pagina = list(itens_qs[: NAO_REALIZADAS_POR_PAGINA + 1])
+        proximo_cursor = ""
+        if len(itens_pagina) > NAO_REALIZADAS_POR_PAGINA:
+            itens_pagina = itens_pagina[:NAO_REALIZADAS_POR_PAGINA]
+            ultimo = itens_pagina[-1]
+            proximo_cursor = f"{ultimo.programacao.data.isoformat()}.{ultimo.id}"
+
+    item_ids = [item.id for item in itens_pagina]
     servidores_por_item: dict[int, list[str]] = defaultdict(list)
     if item_ids:
         links = (
@@ -799,7 +943,7 @@ def nao_realizadas_view(request):
                 item_revisao_por_origem[origem_id] = item_revisao
 
     nao_realizadas = []
-    for item in itens_qs:
+    for item in itens_pagina:
         meta = getattr(item, "meta", None)
         programacao = getattr(item, "programacao", None)
         if not meta or not programacao:
@@ -845,6 +989,7 @@ def nao_realizadas_view(request):
     if selected_month_key:
         print_query["month"] = selected_month_key
     print_query["print"] = "1"
+    print_query.pop("apos", None)
     back_query = request.GET.copy()
     if "print" in back_query:
         del back_query["print"]
@@ -852,6 +997,18 @@ def nao_realizadas_view(request):
     if back_query:
         back_url = f"{back_url}?{back_query.urlencode()}"
 
+    proxima_pagina_url = ""
+    primeira_pagina_url = ""
+    pagina_query = request.GET.copy()
+    if selected_month_key:
+        pagina_query["month"] = selected_month_key
+    if proximo_cursor:
+        pagina_query["apos"] = proximo_cursor
+        proxima_pagina_url = f"{reverse('minhas_metas:nao-realizadas')}?{pagina_query.urlencode()}"
+    if cursor:
+        pagina_query.pop("apos", None)
+        primeira_pagina_url = f"{reverse('minhas_metas:nao-realizadas')}?{pagina_query.urlencode()}"
+
     contexto = {
         "unidade": unidade,
         "nao_realizadas": nao_realizadas,
@@ -861,8 +1018,10 @@ def nao_realizadas_view(request):
         "dt_start": dt_start,
         "dt_end": dt_end,
         "periodo_label": _format_period_label(dt_start, dt_end),
-        "total_geral": itens_base.count(),
+        "total_geral": sum(int(item["total"]) for item in month_filters),
         "bloqueios_encerramento": bloqueios_encerramento,
+        "proxima_pagina_url": proxima_pagina_url,
+        "primeira_pagina_url": primeira_pagina_url,
         "print_url": f"{reverse('minhas_metas:nao-realizadas')}?{print_query.urlencode()}",
         "back_url": back_url,
     }
@@ -910,13 +1069,12 @@ def mapa_atividades_view(request):
 
     base_itens_qs = (
         ProgramacaoItem.objects
-        .select_related("programacao", "meta", "meta__atividade", "veiculo")
         .filter(
             programacao__unidade_id=unidade.id,
             programacao__data__gte=dt_start,
             programacao__data__lte=dt_end,
         )
-        .order_by("meta__titulo", "programacao__data", "id")
+        .order_by("meta__titulo", "meta_id", "programacao__data", "id")
     )
     if expediente_meta_id:
         base_itens_qs = base_itens_qs.exclude(meta_id=expediente_meta_id)
@@ -943,11 +1101,14 @@ def mapa_atividades_view(request):
             status_anterior = ""
     status_changed = status_anterior is not None and status_anterior != status_mapa
 
-    itens_programacao = list(base_itens_qs)
+    itens_programacao, metas = _itens_execucao(base_itens_qs)
+    itens_por_meta = {
+        meta_id: list(itens_meta)
+        for meta_id, itens_meta in groupby(itens_programacao, key=itemgetter("meta_id"))
+    }
 
     alocacoes_qs = (
         MetaAlocacao.objects
-        .select_related("meta", "meta__atividade")
         .filter(
             unidade=unidade,
             quantidade_alocada__gt=0,
@@ -956,47 +1117,24 @@ def mapa_atividades_view(request):
             Q(meta__data_inicio__isnull=True) | Q(meta__data_inicio__lte=dt_end),
             Q(meta__data_limite__isnull=True) | Q(meta__data_limite__gte=dt_start),
         )
-        .order_by("meta__titulo", "id")
     )
     if expediente_meta_id:
         alocacoes_qs = alocacoes_qs.exclude(meta_id=expediente_meta_id)
     if area_filter:
         alocacoes_qs = alocacoes_qs.filter(area_filter)
-    alocacoes = list(alocacoes_qs)
-
-    metas_info: dict[int, dict[str, object]] = OrderedDict()
-    for aloc in alocacoes:
-        meta = getattr(aloc, "meta", None)
-        meta_id = getattr(meta, "id", None) or 0
-        if not meta_id:
-            continue
-        meta_info = metas_info.setdefault(
-            meta_id,
-            {
-                "meta": meta,
-                "diligencias_total": 0,
-            },
-        )
-        meta_info["diligencias_total"] = int(meta_info["diligencias_total"] or 0) + int(
-            getattr(aloc, "quantidade_alocada", 0) or 0
-        )
-    for item in itens_programacao:
-        meta = getattr(item, "meta", None)
-        meta_id = getattr(meta, "id", None) or 0
-        if not meta_id or meta_id in metas_info:
-            continue
-        metas_info[meta_id] = {
-            "meta": meta,
-            "diligencias_total": int(getattr(meta, "quantidade_alvo", 0) or 0),
-        }
-
-    atividades_opcoes_map: dict[int, str] = OrderedDict()
-    for meta_id, meta_info in metas_info.items():
-        meta = meta_info["meta"]
-        atividades_opcoes_map.setdefault(
-            meta_id,
-            getattr(meta, "display_titulo", None) or getattr(meta, "titulo", "Atividade"),
-        )
+    # Diligencias por meta = soma das alocacoes da unidade; metas so com itens no periodo usam o alvo.
+    diligencias_por_meta: dict[int, int] = dict(
+        alocacoes_qs.values("meta_id")
+        .annotate(total=Sum("quantidade_alocada"))
+        .order_by("meta__titulo", "meta_id")
+        .values_list("meta_id", "total")
+    )
+    metas.update(
+        Meta.objects.select_related("atividade").in_bulk(set(diligencias_por_meta) - set(metas))
+    )
+    for meta_id in itens_por_meta:
+        if meta_id in metas:
+            diligencias_por_meta.setdefault(meta_id, int(metas[meta_id].quantidade_alvo or 0))
 
     meta_params = request.GET.getlist("meta")
     selected_meta_ids: set[int] = set()
@@ -1009,88 +1147,18 @@ def mapa_atividades_view(request):
             selected_meta_ids.add(meta_id)
     has_activity_filter = request.GET.get("filtrar_atividades") == "1" and not status_changed
 
-    item_ids = [item.id for item in itens_programacao]
-    servidores_por_item: dict[int, list[object]] = defaultdict(list)
-    if item_ids:
-        links = (
-            ProgramacaoItemServidor.objects
-            .select_related("servidor")
-            .filter(item_id__in=item_ids)
-            .order_by("servidor__nome", "item_id")
+    status_aceitos = None
+    if status_mapa:
+        status_aceitos = {status_mapa, *MAPA_STATUS_EQUIVALENTES.get(status_mapa, ())}
+    status_rows = [
+        row
+        for row in (
+            _linha_mapa(metas[meta_id], total, itens_por_meta.get(meta_id, ()), status_aceitos)
+            for meta_id, total in diligencias_por_meta.items()
+            if total > 0
         )
-        for link in links:
-            if link.servidor:
-                servidores_por_item[link.item_id].append(link.servidor)
-
-    atividades_map: dict[int, dict[str, object]] = OrderedDict()
-    itens_por_meta: dict[int, list[object]] = defaultdict(list)
-    for item in itens_programacao:
-        meta_id = getattr(getattr(item, "meta", None), "id", None) or 0
-        if meta_id:
-            itens_por_meta[meta_id].append(item)
-
-    for meta_id, meta_info in metas_info.items():
-        meta = meta_info["meta"]
-        diligencias_total = int(meta_info.get("diligencias_total") or 0)
-        if diligencias_total <= 0:
-            continue
-
-        row = atividades_map.setdefault(
-            meta_id,
-            {
-                "meta_id": meta_id,
-                "atividade_nome": getattr(meta, "display_titulo", None) or getattr(meta, "titulo", "Atividade"),
-                "atividade_secundaria": _secondary_activity_name(meta),
-                "data_limite": getattr(meta, "data_limite", None),
-                "atividades": [],
-            },
-        )
-        meta_itens = itens_por_meta.get(meta_id) or []
-        for index in range(diligencias_total):
-            item = meta_itens[index] if index < len(meta_itens) else None
-            if item:
-                status_key, status_label = _item_execucao_info(item)
-                servidores_item = servidores_por_item.get(item.id) or []
-                atividade = {
-                    "item_id": item.id,
-                    "data": getattr(getattr(item, "programacao", None), "data", None),
-                    "meta_titulo": row["atividade_nome"],
-                    "atividade_nome": row["atividade_secundaria"],
-                    "veiculo": getattr(getattr(item, "veiculo", None), "nome", "") or "",
-                    "servidores": [
-                        getattr(servidor, "nome", f"Servidor {getattr(servidor, 'id', '')}")
-                        for servidor in servidores_item
-                    ],
-                    "status_key": status_key,
-                    "status_label": status_label,
-                    "concluido": bool(getattr(item, "concluido", False)),
-                    "marcado": _mapa_atividade_deve_marcar(status_key),
-                }
-            else:
-                atividade = {
-                    "item_id": None,
-                    "data": None,
-                    "meta_titulo": row["atividade_nome"],
-                    "atividade_nome": row["atividade_secundaria"],
-                    "veiculo": "",
-                    "servidores": [],
-                    "status_key": "em_andamento",
-                    "status_label": "Nao programada",
-                    "concluido": False,
-                    "marcado": False,
-                }
-            status_key = atividade["status_key"]
-            matches_status = (
-                not status_mapa
-                or status_key == status_mapa
-                or (status_mapa == "concluidas" and status_key == "remarcadas_concluidas")
-                or (status_mapa == "em_andamento" and status_key == "pendentes")
-            )
-            if matches_status:
-                row["atividades"].append(atividade)
-
-    status_rows = [row for row in atividades_map.values() if row["atividades"]]
-    status_meta_ids = {int(row["meta_id"]) for row in status_rows if row.get("meta_id")}
+        if row["atividades"]
+    ]
 
     if has_activity_filter:
         rows = [
@@ -1101,8 +1169,8 @@ def mapa_atividades_view(request):
         rows = status_rows
 
     total_atividades = sum(len(row["atividades"]) for row in rows)
-    total_quadrados = sum(len(row["atividades"]) for row in rows)
-    concluidas = sum(1 for row in rows for atividade in row["atividades"] if atividade["concluido"])
+    total_quadrados = total_atividades
+    concluidas = sum(row["concluidas"] for row in rows)
 
     contexto = {
         "unidade": unidade,
@@ -1118,15 +1186,11 @@ def mapa_atividades_view(request):
         "area_selected_label": area_selected_label,
         "atividades_opcoes": [
             {
-                "id": meta_id,
-                "titulo": titulo,
-                "selected": (
-                    (not has_activity_filter and meta_id in status_meta_ids)
-                    or (has_activity_filter and meta_id in selected_meta_ids and meta_id in status_meta_ids)
-                ),
+                "id": row["meta_id"],
+                "titulo": row["atividade_nome"],
+                "selected": not has_activity_filter or row["meta_id"] in selected_meta_ids,
             }
-            for meta_id, titulo in atividades_opcoes_map.items()
-            if meta_id in status_meta_ids
+            for row in status_rows
         ],
         "has_activity_filter": has_activity_filter,
         "status_mapa": status_mapa,
@@ -0,0 +1,76 @@
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from plantao.services import IndiceDescansos, gerar_rodizio
+from plantao.utils import gerar_plantao_semana_com_impedimentos
+
+
+class Command(BaseCommand):
+    help = "Mede o gerador de rodizio de plantao com dados sinteticos (nao acessa o banco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servidores", type=int, default=200, help="Quantidade de servidores (padrao: 200).")
+        parser.add_argument("--meses", type=int, default=12, help="Horizonte em meses (padrao: 12).")
+        parser.add_argument(
+            "--descansos",
+            type=int,
+            default=4,
+            help="Descansos sorteados por servidor no horizonte (padrao: 4).",
+        )
+        parser.add_argument("--por-ciclo", type=int, default=3, help="Plantonistas por ciclo semanal (padrao: 3).")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        total_servidores = max(1, options["servidores"])
+        inicio = date(2026, 1, 3)
+        fim = inicio + timedelta(days=int(max(1, options["meses"]) * 30.5) - 1)
+        horizonte = (fim - inicio).days + 1
+        rng = random.Random(options["seed"])
+
+        servidores = [SimpleNamespace(id=sid, nome=f"Servidor {sid}") for sid in range(1, total_servidores + 1)]
+        descansos = []
+        for servidor in servidores:
+            for _ in range(max(0, options["descansos"])):
+                dia = inicio + timedelta(days=rng.randrange(horizonte))
+                descansos.append(
+                    SimpleNamespace(servidor_id=servidor.id, inicio=dia, fim=dia + timedelta(days=rng.randint(1, 29)))
+                )
+        ciclos = []
+        ciclo_inicio = inicio
+        while ciclo_inicio <= fim:
+            ciclos.append((ciclo_inicio, min(ciclo_inicio + timedelta(days=6), fim)))
+            ciclo_inicio += timedelta(days=7)
+
+        self.stdout.write(
+            f"{total_servidores} servidores | {horizonte} dias | {len(ciclos)} ciclos | {len(descansos)} descansos"
+        )
+
+        t0 = time.perf_counter()
+        indice = IndiceDescansos(descansos)
+        t1 = time.perf_counter()
+        escala, incompletos = gerar_rodizio(
+            [s.id for s in servidores], ciclos, descansos=indice, por_ciclo=max(1, options["por_ciclo"])
+        )
+        t2 = time.perf_counter()
+        tabela, _ = gerar_plantao_semana_com_impedimentos(servidores, descansos, inicio, fim)
+        t3 = time.perf_counter()
+
+        ciclos_por_servidor = {s.id: 0 for s in servidores}
+        for escolhidos in escala:
+            for sid in escolhidos:
+                ciclos_por_servidor[sid] += 1
+        dias_por_servidor = [
+            sum(1 for celula in linha["atrib"] if celula["status"] == "SERVIÇO") for linha in tabela[0]["linhas"]
+        ]
+
+        self.stdout.write(f"Indice de descansos: {(t1 - t0) * 1000:.1f} ms")
+        self.stdout.write(f"Rodizio semanal: {(t2 - t1) * 1000:.1f} ms (ciclos incompletos: {len(incompletos)})")
+        self.stdout.write(f"Escala diaria: {(t3 - t2) * 1000:.1f} ms")
+        self.stdout.write(
+            f"Ciclos por servidor: min {min(ciclos_por_servidor.values())} / max {max(ciclos_por_servidor.values())}"
+        )
+        self.stdout.write(f"Dias por servidor: min {min(dias_por_servidor)} / max {max(dias_por_servidor)}")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.12 on 2026-10-18 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_versaodados'),
+        ('plantao', '0003_add_unidade_to_plantao'),
+        ('servidores', '0002_cargo_servidor_cargo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlantaoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('ordem', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dias', to='plantao.semanaservidor')),
+                ('plantao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dias', to='plantao.plantao')),
+                ('semana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='plantao.semana')),
+                ('servidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='servidores.servidor')),
+                ('unidade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.no')),
+            ],
+            options={
+                'verbose_name': 'Dia de Plantão',
+                'verbose_name_plural': 'Dias de Plantão',
+                'indexes': [models.Index(fields=['unidade', 'data'], name='plantao_dia_unidade_data_idx'), models.Index(fields=['plantao', 'data'], name='plantao_dia_plantao_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'data'), name='uq_plantao_dia_item_data')],
+            },
+        ),
+    ]
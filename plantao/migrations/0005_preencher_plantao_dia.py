@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db import migrations
+
+
+def preencher_plantao_dia(apps, schema_editor):
+    SemanaServidor = apps.get_model("plantao", "SemanaServidor")
+    PlantaoDia = apps.get_model("plantao", "PlantaoDia")
+
+    dias = []
+    itens = SemanaServidor.objects.select_related("semana__plantao").order_by("id")
+    for item in itens.iterator():
+        semana = item.semana
+        plantao = semana.plantao
+        inicio = max(semana.inicio, plantao.inicio)
+        fim = min(semana.fim, plantao.fim)
+        for offset in range((fim - inicio).days + 1):
+            dias.append(
+                PlantaoDia(
+                    unidade_id=plantao.unidade_id,
+                    data=inicio + timedelta(days=offset),
+                    servidor_id=item.servidor_id,
+                    plantao_id=plantao.id,
+                    semana_id=semana.id,
+                    item_id=item.id,
+                    ordem=item.ordem,
+                )
+            )
+        if len(dias) >= 1000:
+            PlantaoDia.objects.bulk_create(dias, ignore_conflicts=True)
+            dias = []
+    if dias:
+        PlantaoDia.objects.bulk_create(dias, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantao", "0004_plantao_dia"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_plantao_dia, migrations.RunPython.noop),
+    ]
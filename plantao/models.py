@@ -52,3 +52,32 @@ class SemanaServidor(models.Model):
 
     def __str__(self):
         return f"{self.servidor} @ {self.semana}"
+
+
+class PlantaoDia(models.Model):
+    """
+    Escala materializada por dia: uma linha por (plantonista, dia) de cada
+    SemanaServidor, recortada ao periodo do plantao. Regravada pelo servico
+    plantao_dia_service sempre que a escala e salva; removida em cascata.
+    """
+    unidade = models.ForeignKey("core.No", null=True, blank=True, on_delete=models.CASCADE, related_name="+")
+    data = models.DateField()
+    servidor = models.ForeignKey("servidores.Servidor", on_delete=models.CASCADE, related_name="+")
+    plantao = models.ForeignKey(Plantao, related_name="dias", on_delete=models.CASCADE)
+    semana = models.ForeignKey(Semana, on_delete=models.CASCADE, related_name="+")
+    item = models.ForeignKey(SemanaServidor, on_delete=models.CASCADE, related_name="dias")
+    ordem = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Dia de Plantão"
+        verbose_name_plural = "Dias de Plantão"
+        constraints = [
+            models.UniqueConstraint(fields=["item", "data"], name="uq_plantao_dia_item_data"),
+        ]
+        indexes = [
+            models.Index(fields=["unidade", "data"], name="plantao_dia_unidade_data_idx"),
+            models.Index(fields=["plantao", "data"], name="plantao_dia_plantao_data_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.servidor_id} @ {self.data}"
@@ -1,3 +1,14 @@
+from .plantao_dia_service import dias_do_item, materializar_plantao_dias, plantao_id_por_data
 from .plantao_service import listar_plantonistas_por_data
+from .rodizio_service import Carga, IndiceDescansos, carga_historica, gerar_rodizio
 
-__all__ = ["listar_plantonistas_por_data"]
+__all__ = [
+    "listar_plantonistas_por_data",
+    "materializar_plantao_dias",
+    "plantao_id_por_data",
+    "dias_do_item",
+    "Carga",
+    "IndiceDescansos",
+    "carga_historica",
+    "gerar_rodizio",
+]
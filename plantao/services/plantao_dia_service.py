@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable
+
+from django.db import transaction
+
+from plantao.models import Plantao, PlantaoDia, SemanaServidor
+
+
+def dias_do_item(item: SemanaServidor) -> list[date]:
+    """Dias da semana do item recortados ao periodo do plantao."""
+    semana = item.semana
+    plantao = semana.plantao
+    inicio = max(semana.inicio, plantao.inicio)
+    fim = min(semana.fim, plantao.fim)
+    return [inicio + timedelta(days=offset) for offset in range((fim - inicio).days + 1)]
+
+
+def materializar_plantao_dias(plantao_ids: Iterable[int | None]) -> int:
+    """
+    Regrava as linhas de PlantaoDia dos plantoes informados a partir de
+    Semana/SemanaServidor. Deve ser chamada na mesma transacao da escrita da
+    escala (bulk_create nao dispara os sinais). Retorna as linhas gravadas.
+    """
+    ids = sorted({int(plantao_id) for plantao_id in plantao_ids if plantao_id})
+    if not ids:
+        return 0
+
+    with transaction.atomic():
+        # Serializa regravacoes concorrentes do mesmo plantao.
+        list(Plantao.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id", flat=True))
+        PlantaoDia.objects.filter(plantao_id__in=ids).delete()
+        itens = SemanaServidor.objects.filter(semana__plantao_id__in=ids).select_related("semana__plantao")
+        dias = [
+            PlantaoDia(
+                unidade_id=item.semana.plantao.unidade_id,
+                data=dia,
+                servidor_id=item.servidor_id,
+                plantao_id=item.semana.plantao_id,
+                semana_id=item.semana_id,
+                item_id=item.id,
+                ordem=item.ordem,
+            )
+            for item in itens
+            for dia in dias_do_item(item)
+        ]
+        PlantaoDia.objects.bulk_create(dias, batch_size=1000)
+    return len(dias)
+
+
+def plantao_id_por_data(unidade_id: int | None, data_ref: date | None) -> int | None:
+    """
+    Plantao mais recente da unidade que cobre ``data_ref``. Usa a escala
+    materializada; plantoes sem plantonista no dia caem na busca por intervalo.
+    """
+    if not data_ref:
+        return None
+    dias = PlantaoDia.objects.filter(data=data_ref)
+    plantoes = Plantao.objects.filter(inicio__lte=data_ref, fim__gte=data_ref)
+    if unidade_id:
+        dias = dias.filter(unidade_id=unidade_id)
+        plantoes = plantoes.filter(unidade_id=unidade_id)
+    plantao_id = (
+        dias.order_by("-plantao__inicio", "-plantao_id").values_list("plantao_id", flat=True).first()
+        or plantoes.order_by("-inicio", "-id").values_list("id", flat=True).first()
+    )
+    return int(plantao_id) if plantao_id else None
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Iterable
+
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractIsoWeekDay
+
+from plantao.models import PlantaoDia
+
+
+def _periodo_do_descanso(descanso) -> tuple[Any, date | None, date | None]:
+    sid = getattr(getattr(descanso, "servidor", None), "id", None) or getattr(descanso, "servidor_id", None)
+    inicio = getattr(descanso, "inicio", None) or getattr(descanso, "data_inicio", None)
+    fim = getattr(descanso, "fim", None) or getattr(descanso, "data_fim", None)
+    return sid, inicio, fim
+
+
+class IndiceDescansos:
+    """
+    Descansos por servidor como intervalos ordenados e mesclados: consultar se
+    um servidor esta livre em [inicio, fim] custa O(log k), sem varrer dia a dia.
+    Aceita objetos com servidor/servidor_id e inicio/fim ou data_inicio/data_fim.
+    """
+
+    def __init__(self, descansos: Iterable[Any] = ()):
+        brutos: dict[Any, list[tuple[date, date]]] = defaultdict(list)
+        for descanso in descansos or ():
+            sid, inicio, fim = _periodo_do_descanso(descanso)
+            if sid is None or not inicio or not fim or fim < inicio:
+                continue
+            brutos[sid].append((inicio, fim))
+
+        self._inicios: dict[Any, list[date]] = {}
+        self._fins: dict[Any, list[date]] = {}
+        for sid, periodos in brutos.items():
+            mesclados: list[list[date]] = []
+            for inicio, fim in sorted(periodos):
+                if mesclados and inicio <= mesclados[-1][1] + timedelta(days=1):
+                    mesclados[-1][1] = max(mesclados[-1][1], fim)
+                else:
+                    mesclados.append([inicio, fim])
+            self._inicios[sid] = [inicio for inicio, _ in mesclados]
+            self._fins[sid] = [fim for _, fim in mesclados]
+
+    def periodos(self, sid) -> list[tuple[date, date]]:
+        return list(zip(self._inicios.get(sid, []), self._fins.get(sid, [])))
+
+    def em_descanso(self, sid, inicio: date, fim: date | None = None) -> bool:
+        """True se algum descanso do servidor intersecta [inicio, fim]."""
+        fim = fim or inicio
+        inicios = self._inicios.get(sid)
+        if not inicios:
+            return False
+        # ultimo intervalo que comeca ate ``fim``; por estarem mesclados, basta ele.
+        pos = bisect_right(inicios, fim) - 1
+        return pos >= 0 and self._fins[sid][pos] >= inicio
+
+
+@dataclass
+class Carga:
+    """Carga acumulada de um servidor: ciclos escalados e dias de fim de semana."""
+
+    ciclos: int = 0
+    fins_de_semana: int = 0
+
+
+def dias_de_fim_de_semana(inicio: date, fim: date) -> int:
+    total = (fim - inicio).days + 1
+    semanas, resto = divmod(total, 7)
+    extras = sum(1 for offset in range(resto) if (inicio + timedelta(days=offset)).weekday() >= 5)
+    return semanas * 2 + extras
+
+
+def carga_historica(
+    servidor_ids: Iterable[int],
+    *,
+    antes_de: date | None = None,
+    por_dia: bool = False,
+) -> dict[int, Carga]:
+    """
+    Ciclos e dias de fim de semana ja escalados por servidor, lidos da escala
+    materializada (PlantaoDia) em uma consulta agrupada. O ciclo e a semana da
+    escala (SemanaServidor); com ``por_dia`` cada dia de servico conta como um
+    ciclo, na unidade da geracao diaria de gerar_plantao_semana_com_impedimentos.
+    """
+    ids = sorted({int(sid) for sid in servidor_ids if sid})
+    if not ids:
+        return {}
+    qs = PlantaoDia.objects.filter(servidor_id__in=ids)
+    if antes_de:
+        qs = qs.filter(data__lt=antes_de)
+    linhas = (
+        qs.order_by()
+        .annotate(dia_semana=ExtractIsoWeekDay("data"))
+        .values("servidor_id")
+        .annotate(
+            ciclos=Count("id") if por_dia else Count("item_id", distinct=True),
+            fins_de_semana=Count("id", filter=Q(dia_semana__gte=6)),
+        )
+    )
+    return {
+        int(linha["servidor_id"]): Carga(int(linha["ciclos"] or 0), int(linha["fins_de_semana"] or 0))
+        for linha in linhas
+    }
+
+
+def gerar_rodizio(
+    servidor_ids: list[Any],
+    ciclos: list[tuple[date, date]],
+    *,
+    descansos: IndiceDescansos | None = None,
+    por_ciclo: int = 1,
+    carga: dict[Any, Carga] | None = None,
+) -> tuple[list[list[Any]], list[tuple[date, date]]]:
+    """
+    Distribui os servidores pelos ciclos equilibrando a carga: cada ciclo
+    recebe os ``por_ciclo`` servidores livres com menos ciclos e, no empate,
+    menos dias de fim de semana (somando ``carga`` historica), preservando a
+    ordem de ``servidor_ids`` como ultimo criterio.
+
+    Usa um heap pela carga; servidores em descanso no ciclo sao devolvidos ao
+    heap sem consumir carga. Custo O(C * (p + d) * log S), onde d sao os
+    servidores em descanso pulados no ciclo.
+
+    Retorna (escala por ciclo, ciclos com menos de ``por_ciclo`` servidores livres).
+    """
+    descansos = descansos or IndiceDescansos()
+    carga = carga or {}
+    heap = []
+    for posicao, sid in enumerate(servidor_ids):
+        inicial = carga.get(sid) or Carga()
+        heap.append((inicial.ciclos, inicial.fins_de_semana, posicao, sid))
+    heapq.heapify(heap)
+
+    escala: list[list[Any]] = []
+    incompletos: list[tuple[date, date]] = []
+    for inicio, fim in ciclos:
+        fds = dias_de_fim_de_semana(inicio, fim)
+        escolhidos: list[tuple[int, int, int, Any]] = []
+        pulados: list[tuple[int, int, int, Any]] = []
+        while heap and len(escolhidos) < por_ciclo:
+            entrada = heapq.heappop(heap)
+            if descansos.em_descanso(entrada[3], inicio, fim):
+                pulados.append(entrada)
+            else:
+                escolhidos.append(entrada)
+        if len(escolhidos) < por_ciclo:
+            incompletos.append((inicio, fim))
+
+        for ciclos_ant, fds_ant, posicao, sid in escolhidos:
+            heapq.heappush(heap, (ciclos_ant + 1, fds_ant + fds, posicao, sid))
+        for entrada in pulados:
+            heapq.heappush(heap, entrada)
+        escala.append([sid for *_, sid in escolhidos])
+    return escala, incompletos
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Plantao, PlantaoDia, Semana, SemanaServidor
+from .services import materializar_plantao_dias
+
+
+# Exclusoes nao precisam de sinal: PlantaoDia sai em cascata com plantao, semana e item.
+@receiver(post_save, sender=Plantao)
+def materializar_dias_do_plantao(sender, instance, created, **kwargs):
+    # Plantao recem-criado ainda nao tem semanas; quem grava em lote chama o servico.
+    if created or kwargs.get("raw"):
+        return
+    materializar_plantao_dias([instance.pk])
+
+
+def _plantoes_materializados(**filtro) -> list[int]:
+    # Plantoes em que o registro ja tem dias: se ele mudou de plantao, o antigo tambem e regravado.
+    return list(PlantaoDia.objects.filter(**filtro).order_by().values_list("plantao_id", flat=True).distinct())
+
+
+@receiver(post_save, sender=Semana)
+def materializar_dias_da_semana(sender, instance, created, **kwargs):
+    if created or kwargs.get("raw"):
+        return
+    materializar_plantao_dias([instance.plantao_id, *_plantoes_materializados(semana_id=instance.pk)])
+
+
+@receiver(post_save, sender=SemanaServidor)
+def materializar_dias_do_item(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    plantao_id = Semana.objects.filter(pk=instance.semana_id).values_list("plantao_id", flat=True).first()
+    materializar_plantao_dias([plantao_id, *_plantoes_materializados(item_id=instance.pk)])
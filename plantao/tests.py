@@ -1,3 +1,321 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import No
+from descanso.models import Descanso
+from servidores.models import Servidor
+
+from .models import Plantao, PlantaoDia, Semana, SemanaServidor
+from .services import (
+    Carga,
+    IndiceDescansos,
+    carga_historica,
+    gerar_rodizio,
+    listar_plantonistas_por_data,
+    plantao_id_por_data,
+)
+from .utils import gerar_plantao_semana_com_impedimentos
+
+
+class ListaPlantaoSalvarTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="plantonista", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Plantao", tipo="setor")
+        self.servidores = [
+            Servidor.objects.create(unidade=self.unidade, nome=f"Servidor {letra}", telefone=f"6999000{indice}")
+            for indice, letra in enumerate("ABCD")
+        ]
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+
+    def _salvar(self, data_inicial, data_final, grupos):
+        data = {
+            "data_inicial": data_inicial,
+            "data_final": data_final,
+            "dia_inicio_ciclo": "5",
+            "duracao_ciclo": "7",
+        }
+        for indice, servidores in enumerate(grupos, start=1):
+            data[f"grupo_{indice}"] = [str(servidor.id) for servidor in servidores]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse("plantao:lista_plantao"), data=data)
+        return response, len(consultas)
+
+    def test_salvar_escala_grava_semanas_e_servidores_em_lote(self):
+        a, b, c, d = self.servidores
+        response, consultas_curta = self._salvar("2026-03-07", "2026-03-20", [[a, b], [c]])
+        self.assertRedirects(response, reverse("plantao:lista_plantao"), fetch_redirect_response=False)
+
+        response, consultas_longa = self._salvar("2026-03-21", "2026-04-17", [[a], [b, c], [d], [a, d]])
+        self.assertRedirects(response, reverse("plantao:lista_plantao"), fetch_redirect_response=False)
+        # O numero de consultas nao cresce com a quantidade de semanas/servidores.
+        self.assertEqual(consultas_curta, consultas_longa)
+
+        plantao = Plantao.objects.get(inicio=date(2026, 3, 21))
+        self.assertEqual(
+            list(Semana.objects.filter(plantao=plantao).values_list("ordem", "inicio", "fim")),
+            [
+                (1, date(2026, 3, 21), date(2026, 3, 27)),
+                (2, date(2026, 3, 28), date(2026, 4, 3)),
+                (3, date(2026, 4, 4), date(2026, 4, 10)),
+                (4, date(2026, 4, 11), date(2026, 4, 17)),
+            ],
+        )
+        self.assertEqual(
+            list(
+                SemanaServidor.objects.filter(semana__plantao=plantao).values_list(
+                    "semana__ordem", "ordem", "servidor_id", "telefone_snapshot"
+                )
+            ),
+            [
+                (1, 1, a.id, a.telefone),
+                (2, 1, b.id, b.telefone),
+                (2, 2, c.id, c.telefone),
+                (3, 1, d.id, d.telefone),
+                (4, 1, a.id, a.telefone),
+                (4, 2, d.id, d.telefone),
+            ],
+        )
+        self.assertEqual(PlantaoDia.objects.filter(plantao=plantao).count(), 6 * 7)
+
+    def test_descanso_em_um_ciclo_impede_a_gravacao(self):
+        a, b, c, _ = self.servidores
+        Descanso.objects.create(
+            servidor=b,
+            tipo=Descanso.Tipo.choices[0][0],
+            data_inicio=date(2026, 3, 16),
+            data_fim=date(2026, 3, 18),
+        )
+
+        response, _ = self._salvar("2026-03-07", "2026-03-20", [[a, b], [b, c]])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Plantao.objects.exists())
+        mensagens = [str(m) for m in response.context["messages"]]
+        self.assertEqual(len(mensagens), 1)
+        self.assertIn("Servidor B está em descanso no período 14/03/2026 a 20/03/2026", mensagens[0])
+        grupos = [[s.id for s in grupo["servidores"]] for grupo in response.context["grupos"]]
+        self.assertEqual(grupos, [[a.id, b.id], [b.id, c.id]])
+
+
+class PlantaoEscalaConsultasTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="escala", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Escala", tipo="setor")
+        self.servidores = [
+            Servidor.objects.create(unidade=self.unidade, nome=f"Plantonista {indice}", telefone=f"6998000{indice}")
+            for indice in range(4)
+        ]
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["contexto_atual"] = self.unidade.id
+        session.save()
+        self.curto = self._criar_plantao(date(2026, 3, 7), semanas=1, por_semana=1)
+        self.longo = self._criar_plantao(date(2026, 5, 2), semanas=4, por_semana=3)
+
+    def _criar_plantao(self, inicio, *, semanas, por_semana):
+        plantao = Plantao.objects.create(
+            inicio=inicio,
+            fim=inicio + timedelta(days=7 * semanas - 1),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        for ordem in range(semanas, 0, -1):
+            semana = Semana.objects.create(
+                plantao=plantao,
+                inicio=inicio + timedelta(days=7 * (ordem - 1)),
+                fim=inicio + timedelta(days=7 * ordem - 1),
+                ordem=ordem,
+            )
+            for posicao in range(por_semana, 0, -1):
+                SemanaServidor.objects.create(
+                    semana=semana,
+                    servidor=self.servidores[(ordem + posicao) % len(self.servidores)],
+                    ordem=posicao,
+                    telefone_snapshot="" if posicao == 1 else f"snap-{ordem}-{posicao}",
+                )
+        return plantao
+
+    def _consultas(self, url, **params):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(consultas)
+
+    def test_detalhe_e_impressao_nao_crescem_com_semanas_e_plantonistas(self):
+        for nome in ("plantao:plantao_detalhe_fragment", "plantao:imprimir_plantao"):
+            _, curto = self._consultas(reverse(nome, args=[self.curto.pk]))
+            response, longo = self._consultas(reverse(nome, args=[self.longo.pk]))
+            self.assertEqual(curto, longo, nome)
+
+        grupos = response.context["grupos"]
+        self.assertEqual([grupo["index"] for grupo in grupos], [1, 2, 3, 4])
+        primeiro = grupos[0]["servidores"]
+        self.assertEqual(
+            [s["nome"] for s in primeiro],
+            [self.servidores[(1 + posicao) % 4].nome for posicao in (1, 2, 3)],
+        )
+        self.assertEqual(
+            [s["telefone"] for s in primeiro],
+            [self.servidores[2].telefone, "snap-1-2", "snap-1-3"],
+        )
+
+    def test_servidores_por_intervalo_nao_cresce_com_semanas_e_plantonistas(self):
+        url = reverse("plantao:servidores_por_intervalo")
+        _, curto = self._consultas(url, start="2026-03-07", end="2026-03-13", plantao_id=self.curto.pk)
+        response, longo = self._consultas(url, start="2026-05-02", end="2026-05-29", plantao_id=self.longo.pk)
+        self.assertEqual(curto, longo)
+
+        semanas = response.json()["semanas"]
+        self.assertEqual([semana["inicio"] for semana in semanas], ["2026-05-02", "2026-05-09", "2026-05-16", "2026-05-23"])
+        self.assertEqual(len(semanas[3]["servidores"]), 3)
+
+
+class PlantaoDiaMaterializadoTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="dias", password="123456")
+        self.unidade = No.objects.create(nome="Unidade Dias", tipo="setor")
+        self.ana = Servidor.objects.create(unidade=self.unidade, nome="Ana")
+        self.bruno = Servidor.objects.create(unidade=self.unidade, nome="Bruno")
+        self.plantao = Plantao.objects.create(
+            unidade=self.unidade, inicio=date(2026, 6, 6), fim=date(2026, 6, 17), criado_por=self.user
+        )
+        self.semana1 = Semana.objects.create(plantao=self.plantao, inicio=date(2026, 6, 6), fim=date(2026, 6, 12), ordem=1)
+        # A segunda semana passa do fim do plantao e e recortada.
+        self.semana2 = Semana.objects.create(plantao=self.plantao, inicio=date(2026, 6, 13), fim=date(2026, 6, 19), ordem=2)
+        self.item_ana = SemanaServidor.objects.create(semana=self.semana1, servidor=self.ana, ordem=1)
+        SemanaServidor.objects.create(semana=self.semana2, servidor=self.bruno, ordem=1)
+
+    def _dias(self, servidor):
+        return list(
+            PlantaoDia.objects.filter(servidor=servidor).order_by("data").values_list("data", flat=True)
+        )
+
+    def test_escala_materializada_acompanha_edicoes(self):
+        self.assertEqual(self._dias(self.ana)[0], date(2026, 6, 6))
+        self.assertEqual(len(self._dias(self.ana)), 7)
+        self.assertEqual(self._dias(self.bruno)[-1], date(2026, 6, 17))
+        self.assertEqual(
+            carga_historica([self.ana.id, self.bruno.id]),
+            {self.ana.id: Carga(ciclos=1, fins_de_semana=2), self.bruno.id: Carga(ciclos=1, fins_de_semana=2)},
+        )
+
+        self.plantao.fim = date(2026, 6, 14)
+        self.plantao.save()
+        self.assertEqual(self._dias(self.bruno), [date(2026, 6, 13), date(2026, 6, 14)])
+
+        self.item_ana.delete()
+        self.assertEqual(self._dias(self.ana), [])
+
+        self.assertEqual(
+            [s["nome"] for s in listar_plantonistas_por_data(self.unidade.id, date(2026, 6, 14))], ["Bruno"]
+        )
+        self.assertEqual(plantao_id_por_data(self.unidade.id, date(2026, 6, 14)), self.plantao.id)
+        # Sem plantonista no dia, o plantao ainda e encontrado pelo intervalo.
+        self.assertEqual(plantao_id_por_data(self.unidade.id, date(2026, 6, 8)), self.plantao.id)
+        self.assertIsNone(plantao_id_por_data(self.unidade.id, date(2026, 6, 15)))
+
+
+    def test_item_e_semana_movidos_para_outro_plantao_saem_do_antigo(self):
+        outro = Plantao.objects.create(
+            unidade=self.unidade, inicio=date(2026, 6, 6), fim=date(2026, 6, 12), criado_por=self.user
+        )
+        semana_outro = Semana.objects.create(plantao=outro, inicio=date(2026, 6, 6), fim=date(2026, 6, 12), ordem=1)
+
+        # Mesmas datas nos dois plantoes: sem limpar o antigo, a unicidade (item, data) quebraria.
+        self.item_ana.semana = semana_outro
+        self.item_ana.save()
+        self.assertEqual(
+            set(PlantaoDia.objects.filter(servidor=self.ana).values_list("plantao_id", flat=True)), {outro.id}
+        )
+        self.assertEqual(len(self._dias(self.ana)), 7)
+
+        self.semana2.plantao = outro
+        self.semana2.save()
+        self.assertFalse(PlantaoDia.objects.filter(plantao=self.plantao).exists())
+        self.assertEqual(self._dias(self.bruno), [])  # semana inteira fora do novo plantao
+
+    def test_carga_historica_por_dia_equilibra_a_escala_diaria(self):
+        # Ana fez a semana inteira (7 dias) e Bruno so 5 dias: a carga diaria os diferencia.
+        carga = carga_historica([self.ana.id, self.bruno.id], por_dia=True)
+        self.assertEqual(
+            carga,
+            {self.ana.id: Carga(ciclos=7, fins_de_semana=2), self.bruno.id: Carga(ciclos=5, fins_de_semana=2)},
+        )
+
+        tabela, _ = gerar_plantao_semana_com_impedimentos(
+            [self.ana, self.bruno], [], date(2026, 6, 22), date(2026, 6, 25), carga=carga
+        )
+        status = {linha["servidor"].id: [c["status"] for c in linha["atrib"]] for linha in tabela[0]["linhas"]}
+        # Bruno compensa os 2 dias de diferenca antes de o rodizio alternar (contando
+        # semanas, os dois empatariam e Ana comecaria).
+        self.assertEqual(status[self.bruno.id], ["SERVIÇO", "SERVIÇO", "", "SERVIÇO"])
+        self.assertEqual(status[self.ana.id], ["", "", "SERVIÇO", ""])
+
+class RodizioPlantaoTests(SimpleTestCase):
+    def _descanso(self, sid, inicio, fim):
+        return SimpleNamespace(servidor_id=sid, data_inicio=inicio, data_fim=fim)
+
+    def test_indice_de_descansos_mescla_intervalos(self):
+        indice = IndiceDescansos(
+            [
+                self._descanso(1, date(2026, 1, 10), date(2026, 1, 12)),
+                self._descanso(1, date(2026, 1, 13), date(2026, 1, 15)),
+                self._descanso(1, date(2026, 2, 1), date(2026, 2, 1)),
+            ]
+        )
+        self.assertEqual(
+            indice.periodos(1),
+            [(date(2026, 1, 10), date(2026, 1, 15)), (date(2026, 2, 1), date(2026, 2, 1))],
+        )
+        self.assertTrue(indice.em_descanso(1, date(2026, 1, 5), date(2026, 1, 10)))
+        self.assertFalse(indice.em_descanso(1, date(2026, 1, 16), date(2026, 1, 31)))
+        self.assertTrue(indice.em_descanso(1, date(2026, 2, 1)))
+        self.assertFalse(indice.em_descanso(2, date(2026, 1, 10)))
+
+    def test_rodizio_equilibra_carga_historica_e_pula_descansos(self):
+        ciclos = [(date(2026, 3, 7) + timedelta(days=7 * i), date(2026, 3, 13) + timedelta(days=7 * i)) for i in range(4)]
+        indice = IndiceDescansos([self._descanso(3, date(2026, 3, 7), date(2026, 3, 10))])
+
+        escala, incompletos = gerar_rodizio(
+            [1, 2, 3], ciclos, descansos=indice, carga={1: Carga(ciclos=2, fins_de_semana=4)}
+        )
+
+        # 1 ja tinha carga; 3 esta em descanso no primeiro ciclo e entra no seguinte.
+        self.assertEqual(escala, [[2], [3], [2], [3]])
+        self.assertEqual(incompletos, [])
+
+        escala, incompletos = gerar_rodizio([1, 2], ciclos[:1], descansos=indice, por_ciclo=3)
+        self.assertEqual((escala, incompletos), ([[1, 2]], [ciclos[0]]))
+
+    def test_escala_diaria_marca_servico_e_descanso(self):
+        servidores = [SimpleNamespace(id=1, nome="Ana"), SimpleNamespace(id=2, nome="Bruno")]
+        tabela, impedimentos = gerar_plantao_semana_com_impedimentos(
+            servidores,
+            [SimpleNamespace(servidor_id=2, inicio=date(2026, 3, 2), fim=date(2026, 3, 2))],
+            date(2026, 3, 1),
+            date(2026, 3, 4),
+        )
+        status = {linha["servidor"].id: [c["status"] for c in linha["atrib"]] for linha in tabela[0]["linhas"]}
+        # Bruno nao cobre o dia 02 e compensa nos dias seguintes.
+        self.assertEqual(status[1], ["SERVIÇO", "SERVIÇO", "", ""])
+        self.assertEqual(status[2], ["", "DESCANSO", "SERVIÇO", "SERVIÇO"])
+        self.assertEqual(impedimentos, [f"{servidores[1]} em descanso em 2026-03-02"])
+
+    def test_benchmark_executa_com_dados_sinteticos(self):
+        saida = StringIO()
+        call_command("benchmark_rodizio", "--servidores", "10", "--meses", "2", stdout=saida)
+        self.assertIn("Ciclos por servidor", saida.getvalue())
@@ -1,77 +1,48 @@
 from datetime import timedelta
-from django.contrib import messages
-from django.shortcuts import render
-from .models import Plantao
+from .services.rodizio_service import IndiceDescansos, gerar_rodizio
 
-def gerar_plantao_semana_com_impedimentos(servidores, descansos_list, data_inicio, data_fim):
+def gerar_plantao_semana_com_impedimentos(servidores, descansos_list, data_inicio, data_fim, carga=None):
     """
     servidores: lista de objetos (qualquer objeto com atributo 'id' e __str__ útil)
-    descansos_list: lista (ou queryset convertida para list) de objetos com atributos: servidor (ou servidor_id), inicio, fim
+    descansos_list: lista (ou queryset convertida para list) de objetos com atributos: servidor (ou servidor_id), inicio/fim (ou data_inicio/data_fim)
     data_inicio/data_fim: date
+    carga: opcional, {servidor_id: Carga} com a carga historica em dias (carga_historica(..., por_dia=True))
     Retorna: (tabela, impedimentos)
-    """
-    dias = []
-    d = data_inicio
-    while d <= data_fim:
-        dias.append(d)
-        d = d + timedelta(days=1)
 
+    Cada dia vai para o servidor livre com menor carga (dias e fins de semana),
+    ver gerar_rodizio; descansos sao consultados por intervalo, nao dia a dia.
+    """
     if not servidores:
         return None, ["Nenhum servidor selecionado."]
 
-    n_serv = len(servidores)
+    dias = [data_inicio + timedelta(days=offset) for offset in range((data_fim - data_inicio).days + 1)]
+    indice = IndiceDescansos(descansos_list)
+    ids = [getattr(s, "id", None) for s in servidores]
+    escala, sem_servidor = gerar_rodizio(ids, [(dia, dia) for dia in dias], descansos=indice, carga=carga)
+    servico = {dia: set(escolhidos) for dia, escolhidos in zip(dias, escala)}
+
     linhas = []
     impedimentos = []
-
-    # transforma descansos_list em lista simples de dicts para consultas rápidas
-    descansos_by_servidor = {}
-    for dd in (descansos_list or []):
-        # dd pode ter atributo servidor ou servidor_id
-        sid = getattr(getattr(dd, "servidor", None), "id", None) or getattr(dd, "servidor_id", None)
-        if sid is None:
-            continue
-        descansos_by_servidor.setdefault(sid, []).append(dd)
-
-    for idx, s in enumerate(servidores):
-        sid = getattr(s, "id", None)
-        linha = {"servidor": s, "atrib": []}
-        for dia in dias:
-            in_desc = False
-            for dd in descansos_by_servidor.get(sid, []):
-                inicio = getattr(dd, "inicio", None)
-                fim = getattr(dd, "fim", None)
-                if inicio and fim and inicio <= dia <= fim:
-                    in_desc = True
-                    break
-            if in_desc:
-                linha["atrib"].append({"dia": dia, "status": "DESCANSO"})
+    for s, sid in zip(servidores, ids):
+        em_descanso = set()
+        for inicio, fim in indice.periodos(sid):
+            dia = max(inicio, data_inicio)
+            while dia <= min(fim, data_fim):
+                em_descanso.add(dia)
                 impedimentos.append(f"{s} em descanso em {dia.isoformat()}")
+                dia += timedelta(days=1)
+        atrib = []
+        for dia in dias:
+            if dia in em_descanso:
+                status = "DESCANSO"
+            elif sid in servico[dia]:
+                status = "SERVIÇO"
             else:
-                dia_index = (dia - data_inicio).days
-                if dia_index % n_serv == idx:
-                    linha["atrib"].append({"dia": dia, "status": "SERVIÇO"})
-                else:
-                    linha["atrib"].append({"dia": dia, "status": ""})
-        linhas.append(linha)
+                status = ""
+            atrib.append({"dia": dia, "status": status})
+        linhas.append({"servidor": s, "atrib": atrib})
 
+    impedimentos.extend(f"Nenhum servidor disponível em {inicio.isoformat()}" for inicio, _ in sem_servidor)
     tabela = [{"inicio": data_inicio, "fim": data_fim, "dias": dias, "linhas": linhas}]
     impedimentos = list(dict.fromkeys(impedimentos))  # dedupe mantendo ordem
     return tabela, impedimentos
-
-
-def verifica_conflito_plantao(request, dt_ini, dt_fim, contexto):
-    conflitos = Plantao.objects.filter(inicio__lte=dt_fim, fim__gte=dt_ini).order_by("inicio")
-    if conflitos.exists():
-        itens = [f"{p.inicio.strftime('%d/%m/%Y')} a {p.fim.strftime('%d/%m/%Y')}" for p in conflitos]
-        contador = len(itens)
-        plural = "plantões" if contador != 1 else "plantão"
-        periodo_sel = f"{dt_ini.strftime('%d/%m/%Y')} a {dt_fim.strftime('%d/%m/%Y')}"
-        itens_txt = ", ".join(itens)
-
-        messages.error(request,
-            f"Já existe(m) <strong>{contador} {plural}</strong> que conflitam com o período "
-            f"(<strong>{periodo_sel}</strong>): {itens_txt}.")
-        
-        return render(request, "plantao/lista.html", contexto)
-
-    return None
\ No newline at end of file
@@ -14,6 +14,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_GET, require_POST
 from django.db import transaction
+from django.db.models import Prefetch
 from django.urls import reverse
 from django.utils.html import format_html
 from django.conf import settings
@@ -23,15 +24,48 @@ from django.utils import timezone
 from core.utils import get_unidade_atual_id
 from servidores.models import Servidor
 from descanso.models import Descanso
+from descanso.services import ORIGEM_DESCANSO, carregar_conflitos
 from .models import Plantao, Semana, SemanaServidor
-from .utils import verifica_conflito_plantao
+from .services import materializar_plantao_dias, plantao_id_por_data
 
-def _get_plantao_respeitando_unidade(request, pk):
+
+def _com_escala(plantoes_qs):
+    """
+    Prefetch da escala inteira: semanas (ordem, inicio) e itens (ordem) com
+    servidor/cargo, em um numero fixo de consultas independente de semanas x plantonistas.
+    """
+    return plantoes_qs.prefetch_related(
+        Prefetch("semanas", queryset=Semana.objects.order_by("ordem", "inicio")),
+        Prefetch(
+            "semanas__itens",
+            queryset=SemanaServidor.objects.select_related("servidor", "servidor__cargo").order_by("ordem"),
+        ),
+    )
+
+
+def _servidor_da_escala(item):
+    """Dados do plantonista de um SemanaServidor; o telefone gravado na escala tem prioridade."""
+    servidor = item.servidor
+    telefone_snapshot = item.telefone_snapshot or ""
+    telefone_servidor = (getattr(servidor, "telefone", "") or "") if servidor else ""
+    celular_servidor = (getattr(servidor, "celular", "") or "") if servidor else ""
+    return {
+        "id": getattr(servidor, "id", None),
+        "nome": ((getattr(servidor, "nome", "") or str(servidor)) if servidor else ""),
+        "telefone": telefone_snapshot or telefone_servidor or celular_servidor or "",
+        "celular": celular_servidor,
+        "telefone_snapshot": telefone_snapshot,
+        "servidor": servidor,
+    }
+
+
+def _get_plantao_respeitando_unidade(request, pk, *, com_escala=False):
     """
     Retorna um Plantao (ou 404) aplicando filtro por unidade, se o model Plantao
     tiver o campo `unidade`. Quando houver unidade no contexto ela é sempre aplicada
     como recorte; sem contexto liberamos o acesso (staff consegue ver tudo apenas
-    se não estiver assumindo nenhuma unidade).
+    se não estiver assumindo nenhuma unidade). Com ``com_escala`` a escala vem
+    pre-carregada (ver _com_escala).
     """
     unidade_id = get_unidade_atual_id(request)
     # verifica se o model Plantao tem campo 'unidade' (compatibilidade)
@@ -40,7 +74,7 @@ def _get_plantao_respeitando_unidade(request, pk):
     except Exception:
         field_names = []
 
-    qs = Plantao.objects.all()
+    qs = _com_escala(Plantao.objects.all()) if com_escala else Plantao.objects.all()
     if "unidade" in field_names or "unidade_id" in field_names:
         # se existe unidade no contexto, sempre filtramos por ela
         if unidade_id:
@@ -82,19 +116,21 @@ def _gerar_ciclos_plantao(dt_ini, dt_fim, duracao_ciclo):
 
 
 def _pick_plantao_id_by_date(request, d_ref):
-    if not d_ref:
-        return None
-    unidade_id = get_unidade_atual_id(request)
-    try:
-        field_names = [f.name for f in Plantao._meta.fields]
-    except Exception:
-        field_names = []
+    return plantao_id_por_data(get_unidade_atual_id(request), d_ref)
 
-    qs = Plantao.objects.filter(inicio__lte=d_ref, fim__gte=d_ref)
-    if ("unidade" in field_names or "unidade_id" in field_names) and unidade_id:
-        qs = qs.filter(unidade_id=unidade_id)
-    plantao_id = qs.order_by("-inicio", "-id").values_list("id", flat=True).first()
-    return int(plantao_id) if plantao_id else None
+
+def _montar_grupos_data(weeks, grupos_sel_ids, servidores_sel):
+    """Grupos (ciclos) para re-render, na ordem escolhida, a partir dos servidores ja carregados."""
+    grupos_data = []
+    for i, (ini, fim) in enumerate(weeks, start=1):
+        ordered = [servidores_sel[sid] for sid in grupos_sel_ids.get(i, []) if sid in servidores_sel]
+        for obj in ordered:
+            tel = getattr(obj, "telefone", None) or getattr(obj, "celular", None) or ""
+            setattr(obj, "telefone", tel)
+            if not hasattr(obj, "celular"):
+                setattr(obj, "celular", "")
+        grupos_data.append({"index": i, "periodo": (ini, fim), "servidores": ordered})
+    return grupos_data
 
 
 def _build_plantoes_salvos_context(request):
@@ -447,22 +483,27 @@ def lista_plantao(request):
     # ---------------------------------
     # validação servidor x descanso por grupo
     # ---------------------------------
-    conflitos = defaultdict(list)  # {grupo_idx: [(Servidor, [Descanso,...]), ...]}
+    # uma consulta para todos os servidores escalados no periodo; o recorte por grupo e feito em memoria
+    ids_escalados = set(chain.from_iterable(grupos_sel_ids.values()))
+    servidores_sel = (
+        Servidor.objects.filter(id__in=ids_escalados, **servidor_scope_filter).in_bulk()
+        if ids_escalados
+        else {}
+    )
+    mapa_descansos = carregar_conflitos(
+        ids_escalados, dt_ini, dt_fim, origens=(ORIGEM_DESCANSO,), unidade_id=unidade_id
+    )
+
+    conflitos = {}  # {grupo_idx: [(Servidor, [Descanso,...]), ...]}
     for i, (ini, fim) in enumerate(weeks, start=1):
-        ids = grupos_sel_ids.get(i, [])
-        if not ids:
-            continue
-        qs_conf = (Descanso.objects
-                   .filter(servidor_id__in=ids, data_inicio__lte=fim, data_fim__gte=ini)
-                   .select_related("servidor")
-                   .order_by("servidor__nome", "data_inicio"))
-        if unidade_id:
-            qs_conf = qs_conf.filter(servidor__unidade_id=unidade_id)
-        mapa = defaultdict(list)
-        for d in qs_conf:
-            mapa[d.servidor].append(d)
-        for servidor_obj, descansos_servidor in mapa.items():
-            conflitos[i].append((servidor_obj, descansos_servidor))
+        itens = []
+        for sid in set(grupos_sel_ids.get(i, [])):
+            ocupacoes = mapa_descansos.conflitos(sid, ini, fim, origens=(ORIGEM_DESCANSO,))
+            if ocupacoes:
+                descansos_servidor = [o.obj for o in ocupacoes]
+                itens.append((descansos_servidor[0].servidor, descansos_servidor))
+        if itens:
+            conflitos[i] = sorted(itens, key=lambda par: par[0].nome)
 
     if request.method == "POST" and conflitos:
         mensagens = []
@@ -480,17 +521,7 @@ def lista_plantao(request):
             messages.error(request, m)
 
         # re-monta grupos_data igual ao bloco acima e retorna (abortando gravação)
-        grupos_data = []
-        for i, (ini, fim) in enumerate(weeks, start=1):
-            ids = grupos_sel_ids.get(i, [])
-            objs = {s.id: s for s in Servidor.objects.filter(id__in=set(ids), **servidor_scope_filter)}
-            ordered = [objs[sid] for sid in ids if sid in objs]
-            for obj in ordered:
-                tel = getattr(obj, "telefone", None) or getattr(obj, "celular", None) or ""
-                setattr(obj, "telefone", tel)
-                if not hasattr(obj, "celular"):
-                    setattr(obj, "celular", "")
-            grupos_data.append({"index": i, "periodo": (ini, fim), "servidores": ordered})
+        grupos_data = _montar_grupos_data(weeks, grupos_sel_ids, servidores_sel)
 
         return render(
             request,
@@ -516,17 +547,7 @@ def lista_plantao(request):
         race_qs = Plantao.objects.filter(inicio__lte=dt_fim, fim__gte=dt_ini, **unidade_filter)
         if race_qs.exists():
             messages.error(request, "Não foi possível salvar: já existe(m) plantão(ões) que conflitam com o período informado.")
-            grupos_data = []
-            for i, (ini, fim) in enumerate(weeks, start=1):
-                ids = grupos_sel_ids.get(i, [])
-                objs = {s.id: s for s in Servidor.objects.filter(id__in=set(ids), **servidor_scope_filter)}
-                ordered = [objs[sid] for sid in ids if sid in objs]
-                for obj in ordered:
-                    tel = getattr(obj, "telefone", None) or getattr(obj, "celular", None) or ""
-                    setattr(obj, "telefone", tel)
-                    if not hasattr(obj, "celular"):
-                        setattr(obj, "celular", "")
-                grupos_data.append({"index": i, "periodo": (ini, fim), "servidores": ordered})
+            grupos_data = _montar_grupos_data(weeks, grupos_sel_ids, servidores_sel)
 
             return render(
                 request,
@@ -561,22 +582,27 @@ def lista_plantao(request):
 
                 plantao = Plantao.objects.create(**create_kwargs)
 
-                for i, (ini, fim) in enumerate(weeks, start=1):
-                    semana = Semana.objects.create(plantao=plantao, inicio=ini, fim=fim, ordem=i)
-                    ids = grupos_sel_ids.get(i, [])
-                    for ordem, sid in enumerate(ids, start=1):
-                        try:
-                            srv = Servidor.objects.get(pk=sid, **servidor_scope_filter)
-                            tel = getattr(srv, "telefone", None) or getattr(srv, "celular", None) or ""
-                        except Servidor.DoesNotExist:
-                            srv = None
-                            tel = ""
-                        SemanaServidor.objects.create(
-                            semana=semana,
-                            servidor_id=sid,
-                            telefone_snapshot=tel,
-                            ordem=ordem
+                semanas = Semana.objects.bulk_create(
+                    [
+                        Semana(plantao=plantao, inicio=ini, fim=fim, ordem=i)
+                        for i, (ini, fim) in enumerate(weeks, start=1)
+                    ]
+                )
+                itens = []
+                for i, semana in enumerate(semanas, start=1):
+                    for ordem, sid in enumerate(grupos_sel_ids.get(i, []), start=1):
+                        srv = servidores_sel.get(sid)
+                        tel = (getattr(srv, "telefone", None) or getattr(srv, "celular", None) or "") if srv else ""
+                        itens.append(
+                            SemanaServidor(
+                                semana=semana,
+                                servidor_id=sid,
+                                telefone_snapshot=tel,
+                                ordem=ordem,
+                            )
                         )
+                SemanaServidor.objects.bulk_create(itens)
+                materializar_plantao_dias([plantao.id])
 
                 messages.success(request, f"Plantão salvo com sucesso: {dt_ini.strftime('%d/%m/%Y')} a {dt_fim.strftime('%d/%m/%Y')}")
                 # redireciona para a lista sem parâmetros (estado inicial). a mensagem será mostrada na página recarregada.
@@ -586,17 +612,7 @@ def lista_plantao(request):
             messages.error(request, "Erro ao salvar plantão: " + str(e))
 
     # monta dados por grupo (ordem) para render (caso GET ou POST abortado)
-    grupos_data = []
-    for i, (ini, fim) in enumerate(weeks, start=1):
-        ids = grupos_sel_ids.get(i, [])
-        objs = {s.id: s for s in Servidor.objects.filter(id__in=set(ids), **servidor_scope_filter)}
-        ordered = [objs[sid] for sid in ids if sid in objs]
-        for obj in ordered:
-            tel = getattr(obj, "telefone", None) or getattr(obj, "celular", None) or ""
-            setattr(obj, "telefone", tel)
-            if not hasattr(obj, "celular"):
-                setattr(obj, "celular", "")
-        grupos_data.append({"index": i, "periodo": (ini, fim), "servidores": ordered})
+    grupos_data = _montar_grupos_data(weeks, grupos_sel_ids, servidores_sel)
 
     return render(
         request,
@@ -676,16 +692,12 @@ def verificar_descanso(request):
     if not unidade_id and not request.user.is_superuser:
         return JsonResponse({"erro": "unidade nao definida no contexto"}, status=400)
 
-    qs = Descanso.objects.filter(
-        servidor_id=servidor_id,
-        data_inicio__lte=dt_fim,
-        data_fim__gte=dt_ini,
-    ).order_by("data_inicio")
-    if unidade_id:
-        qs = qs.filter(servidor__unidade_id=unidade_id)
+    origens = (ORIGEM_DESCANSO,)
+    mapa = carregar_conflitos([servidor_id], dt_ini, dt_fim, origens=origens, unidade_id=unidade_id)
 
     impedimentos = []
-    for d in qs:
+    for ocupacao in mapa.conflitos(servidor_id, dt_ini, dt_fim, origens=origens):
+        d = ocupacao.obj
         impedimentos.append({
             "data_inicio": d.data_inicio.isoformat(),
             "data_fim": d.data_fim.isoformat(),
@@ -715,77 +727,28 @@ def plantao_detalhe_fragment(request, pk):
     Monta estruturas simples (SimpleNamespace) para evitar lookups dinâmicos quebrando templates.
     """
     try:
-        plantao = _get_plantao_respeitando_unidade(request, pk)
-
-        # pega queryset de semanas com fallback caso related_name diferente
-        if hasattr(plantao, "semanas"):
-            try:
-                semanas_qs = plantao.semanas.all().order_by("ordem", "inicio")
-            except Exception:
-                # se 'ordem' não existir, tenta apenas por 'inicio'
-                semanas_qs = plantao.semanas.all().order_by("inicio")
-        elif hasattr(plantao, "semana_set"):
-            try:
-                semanas_qs = plantao.semana_set.all().order_by("ordem", "inicio")
-            except Exception:
-                semanas_qs = plantao.semana_set.all().order_by("inicio")
-        else:
-            semanas_qs = []
+        plantao = _get_plantao_respeitando_unidade(request, pk, com_escala=True)
 
         grupos = []
-        for i, semana in enumerate(semanas_qs, start=1):
-            # detecta nome correto do relacionamento de itens e cria queryset seguro
-            if hasattr(semana, "itens"):
-                try:
-                    itens_qs = semana.itens.all().order_by("ordem")
-                except Exception:
-                    itens_qs = semana.itens.all()
-            elif hasattr(semana, "semanaservidor_set"):
-                try:
-                    itens_qs = semana.semanaservidor_set.all().order_by("ordem")
-                except Exception:
-                    itens_qs = semana.semanaservidor_set.all()
-            else:
-                itens_qs = []
-
+        for i, semana in enumerate(plantao.semanas.all(), start=1):
             itens = []
-            for item in itens_qs:
-                servidor = getattr(item, "servidor", None)
-
-                # snapshot do telefone no item (se existir), senão pega do servidor
-                telefone_snapshot = getattr(item, "telefone_snapshot", "") or ""
-                telefone_servidor = ""
-                celular_servidor = ""
-                nome_servidor = ""
-                servidor_id = None
-
-                if servidor is not None:
-                    servidor_id = getattr(servidor, "id", None)
-                    nome_servidor = getattr(servidor, "nome", "") or str(servidor)
-                    telefone_servidor = getattr(servidor, "telefone", "") or ""
-                    celular_servidor = getattr(servidor, "celular", "") or ""
-
-                telefone_final = telefone_snapshot or telefone_servidor or celular_servidor or ""
-
+            for item in semana.itens.all():
+                dados = _servidor_da_escala(item)
                 # SimpleNamespace funciona bem no template (atributos acessíveis via dot)
-                servidor_obj = SimpleNamespace(
-                    id=servidor_id,
-                    nome=nome_servidor,
-                    telefone=telefone_final,
-                    celular=celular_servidor,
-                    telefone_snapshot=telefone_snapshot,
-                    servidor_original=servidor
+                itens.append(
+                    SimpleNamespace(
+                        id=dados["id"],
+                        nome=dados["nome"],
+                        telefone=dados["telefone"],
+                        celular=dados["celular"],
+                        telefone_snapshot=dados["telefone_snapshot"],
+                        servidor_original=dados["servidor"],
+                    )
                 )
 
-                itens.append(servidor_obj)
-
-            # cuidado: certifique-se que semana tem attrs inicio/fim (ajuste se nome diferente)
-            inicio = getattr(semana, "inicio", None)
-            fim = getattr(semana, "fim", None)
-
             grupos.append({
                 "index": i,
-                "periodo": (inicio, fim),
+                "periodo": (semana.inicio, semana.fim),
                 "servidores": itens,
             })
 
@@ -824,38 +787,14 @@ def plantao_excluir(request, pk):
     
 @login_required
 def plantao_imprimir(request, pk):
-    plantao = _get_plantao_respeitando_unidade(request, pk)
-
-    # monta os grupos (mesma lógica que antes)
-    if hasattr(plantao, "semanas"):
-        semanas_qs = plantao.semanas.order_by("ordem", "inicio").all()
-    elif hasattr(plantao, "semana_set"):
-        semanas_qs = plantao.semana_set.order_by("ordem", "inicio").all()
-    else:
-        semanas_qs = []
+    plantao = _get_plantao_respeitando_unidade(request, pk, com_escala=True)
 
     grupos = []
-    for i, semana in enumerate(semanas_qs, start=1):
-        if hasattr(semana, "itens"):
-            itens_qs = semana.itens.order_by("ordem").all()
-        elif hasattr(semana, "semanaservidor_set"):
-            itens_qs = semana.semanaservidor_set.order_by("ordem").all()
-        else:
-            itens_qs = []
-
+    for i, semana in enumerate(plantao.semanas.all(), start=1):
         servidores = []
-        for item in itens_qs:
-            servidor = getattr(item, "servidor", None)
-            nome = getattr(servidor, "nome", "") if servidor else ""
-            telefone_snapshot = getattr(item, "telefone_snapshot", "") or ""
-            telefone_servidor = getattr(servidor, "telefone", "") if servidor else ""
-            celular_servidor = getattr(servidor, "celular", "") if servidor else ""
-            telefone_final = telefone_snapshot or telefone_servidor or celular_servidor or ""
-            servidores.append({
-                "id": getattr(servidor, "id", None),
-                "nome": nome,
-                "telefone": telefone_final,
-            })
+        for item in semana.itens.all():
+            dados = _servidor_da_escala(item)
+            servidores.append({"id": dados["id"], "nome": dados["nome"], "telefone": dados["telefone"]})
 
         grupos.append({
             "index": i,
@@ -914,53 +853,32 @@ def servidores_por_intervalo(request):
         ref_id = _pick_plantao_id_by_date(request, dt_end) or _pick_plantao_id_by_date(request, dt_start)
         if ref_id:
             plantoes_qs = plantoes_qs.filter(pk=ref_id)
-    plantoes = plantoes_qs.order_by('inicio')
-    if not plantoes.exists():
+    plantoes = list(_com_escala(plantoes_qs.order_by('inicio')))
+    if not plantoes:
         return JsonResponse({"ok": True, "semanas": []})
 
     semanas_out = []
     for plantao in plantoes:
-        # pega semanas relacionadas (tenta vários related_names)
-        if hasattr(plantao, 'semanas'):
-            semanas_qs = plantao.semanas.all().order_by('ordem', 'inicio')
-        elif hasattr(plantao, 'semana_set'):
-            semanas_qs = plantao.semana_set.all().order_by('ordem', 'inicio')
-        else:
-            semanas_qs = Semana.objects.filter(plantao=plantao).order_by('ordem', 'inicio')
-
-        for semana in semanas_qs:
+        for semana in plantao.semanas.all():
             semana_inicio = max(semana.inicio, dt_start, plantao.inicio)
             semana_fim = min(semana.fim, dt_end, plantao.fim)
             if semana_fim < semana_inicio:
                 continue
             servidores = []
             seen_servidores = set()
-            # tenta vários relacionamentos
-            if hasattr(semana, 'itens'):
-                itens_qs = getattr(semana, 'itens').all()
-            elif hasattr(semana, 'semanaservidor_set'):
-                itens_qs = getattr(semana, 'semanaservidor_set').all()
-            else:
-                itens_qs = SemanaServidor.objects.filter(semana=semana)
-
-            for item in itens_qs.order_by('ordem'):
-                srv = getattr(item, 'servidor', None)
-                nome = getattr(srv, 'nome', '') if srv else ''
-                telefone_snapshot = getattr(item, 'telefone_snapshot', '') or ''
-                telefone_servidor = getattr(srv, 'telefone', '') if srv else ''
-                celular_servidor = getattr(srv, 'celular', '') if srv else ''
-                telefone_final = telefone_snapshot or telefone_servidor or celular_servidor or ''
-                sid = getattr(srv, 'id', None)
-                key = sid if sid is not None else (str(nome).strip().lower(), str(telefone_final).strip())
+            for item in semana.itens.all():
+                dados = _servidor_da_escala(item)
+                sid = dados["id"]
+                key = sid if sid is not None else (str(dados["nome"]).strip().lower(), str(dados["telefone"]).strip())
                 if key in seen_servidores:
                     continue
                 seen_servidores.add(key)
                 servidores.append({
                     "id": sid,
-                    "nome": nome,
-                    "telefone": telefone_final,
+                    "nome": dados["nome"],
+                    "telefone": dados["telefone"],
                 })
-       
+
             semanas_out.append({
                 "inicio": semana_inicio.isoformat(),
                 "fim": semana_fim.isoformat(),
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("programar", "0006_programacao_reabrir_permission"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_class
+        WHERE relname = 'programar_atividades_programacaoitem'
+    ) THEN
+        CREATE INDEX IF NOT EXISTS idx_progitem_abertos
+        ON programar_atividades_programacaoitem (programacao_id, id DESC)
+        WHERE concluido = FALSE
+          AND cancelada = FALSE
+          AND nao_realizada_justificada = FALSE;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1
+        FROM pg_class
+        WHERE relname = 'programar_atividades_programacao'
+    ) THEN
+        CREATE INDEX IF NOT EXISTS idx_prog_unidade_data_desc
+        ON programar_atividades_programacao (unidade_id, data DESC, id DESC);
+    END IF;
+END $$;
+            """,
+            reverse_sql="""
+DROP INDEX IF EXISTS idx_progitem_abertos;
+DROP INDEX IF EXISTS idx_prog_unidade_data_desc;
+            """,
+        ),
+    ]
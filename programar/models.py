@@ -94,6 +94,11 @@ class ProgramacaoItem(models.Model):
             models.Index(fields=["meta"]),
             models.Index(fields=["programacao", "meta"]),
             models.Index(fields=["remarcado_de"]),
+            models.Index(
+                fields=["programacao", "-id"],
+                name="idx_progitem_abertos",
+                condition=models.Q(concluido=False, cancelada=False, nao_realizada_justificada=False),
+            ),
         ]
 
     def __str__(self):
@@ -1,4 +1,31 @@
-from django.db.models import Q
+from django.db.models import Aggregate, Case, CharField, Exists, OuterRef, Q, Subquery, TextField, Value, When
+
+from programar.models import ProgramacaoItem, ProgramacaoItemServidor
+from programar.status import (
+    CANCELADA,
+    ENCERRADA_AUTOMATICAMENTE,
+    ENCERRADA_AUTOMATICAMENTE_MARKER,
+    EXECUTADA,
+    NAO_REALIZADA,
+    NAO_REALIZADA_JUSTIFICADA,
+    PENDENTE,
+    REMARCADA_CONCLUIDA,
+)
+
+SEPARADOR_NOMES = "\x1f"
+
+
+class AgregarTexto(Aggregate):
+    """Concatena textos do grupo no banco (STRING_AGG no Postgres, GROUP_CONCAT no SQLite)."""
+
+    function = "STRING_AGG"
+    output_field = TextField()
+
+    def __init__(self, expression, delimitador: str = SEPARADOR_NOMES, **extra):
+        super().__init__(expression, Value(delimitador), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function="GROUP_CONCAT", **extra_context)
 
 
 def item_conta_como_programado_q() -> Q:
@@ -7,3 +34,60 @@ def item_conta_como_programado_q() -> Q:
         | Q(concluido_em__isnull=True)
         | Q(nao_realizada_justificada=True)
     )
+
+
+def item_origem_remarcada_concluida_q() -> Q:
+    """Semi-join: item que foi remarcado e cuja remarcacao ja foi concluida."""
+    return Q(
+        Exists(
+            ProgramacaoItem.objects.filter(
+                remarcado_de_id=OuterRef("pk"),
+                concluido=True,
+                cancelada=False,
+            )
+        )
+    )
+
+
+def _item_execucao_status_regras() -> list[tuple[str, Q]]:
+    """Precedencia de programar.status.item_execucao_status_from_fields; a primeira regra que casa vence."""
+    return [
+        (ENCERRADA_AUTOMATICAMENTE, Q(observacao__contains=ENCERRADA_AUTOMATICAMENTE_MARKER)),
+        (REMARCADA_CONCLUIDA, Q(concluido=True, remarcado_de__isnull=False)),
+        (EXECUTADA, Q(concluido=True)),
+        (CANCELADA, Q(cancelada=True)),
+        (NAO_REALIZADA_JUSTIFICADA, Q(nao_realizada_justificada=True)),
+        (NAO_REALIZADA, Q(concluido_em__isnull=False)),
+    ]
+
+
+def item_execucao_status_case() -> Case:
+    """Status de execucao do item calculado no banco."""
+    return Case(
+        *(When(condicao, then=Value(status)) for status, condicao in _item_execucao_status_regras()),
+        default=Value(PENDENTE),
+        output_field=CharField(),
+    )
+
+
+def item_execucao_status_q() -> dict[str, Q]:
+    """Um filtro por status, mutuamente exclusivos, na mesma precedencia de item_execucao_status_case."""
+    filtros: dict[str, Q] = {}
+    anteriores = Q()
+    for status, condicao in _item_execucao_status_regras():
+        filtros[status] = condicao & ~anteriores if anteriores else condicao
+        anteriores |= condicao
+    filtros[PENDENTE] = ~anteriores
+    return filtros
+
+
+def servidores_nomes_subquery() -> Subquery:
+    """Nomes dos servidores do item agregados no banco, separados por SEPARADOR_NOMES."""
+    return Subquery(
+        ProgramacaoItemServidor.objects.filter(item_id=OuterRef("pk"))
+        .order_by()
+        .values("item_id")
+        .annotate(nomes=AgregarTexto("servidor__nome"))
+        .values("nomes")[:1],
+        output_field=TextField(),
+    )
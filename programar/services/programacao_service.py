@@ -8,7 +8,9 @@ from django.db.models import Q
 from django.conf import settings
 from django.utils import timezone
 
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from metas.models import Meta
+from metas.services import atualizar_contadores_metas
 from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
 from programar.status import (
     CANCELADA,
@@ -238,6 +240,12 @@ def salvar_programacao(unidade_id: int, data_ref: date, payload: dict[str, Any],
             ProgramacaoItemServidor.objects.filter(item_id__in=orfaos).delete()
             ProgramacaoItem.objects.filter(id__in=orfaos).delete()
 
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[data_ref])
+        atualizar_contadores_metas(
+            {item.meta_id for item in existentes.values()}
+            | set(ProgramacaoItem.objects.filter(programacao_id=prog.id).values_list("meta_id", flat=True))
+        )
+
     return {
         "ok": True,
         "programacao_id": prog.id,
@@ -306,6 +314,8 @@ def concluir_item(
                 "observacao",
             ]
         )
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[item.programacao.data])
+        atualizar_contadores_metas([item.meta_id])
         return item
 
 
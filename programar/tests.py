@@ -1,8 +1,10 @@
 import unittest
 import json
 from datetime import date, timedelta
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import RequestFactory
 from django.test import TestCase, override_settings
 from django.urls import reverse
@@ -10,6 +12,8 @@ from django.utils import timezone
 
 from atividades.models import Area, Atividade
 from core.models import No
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
+from descanso.models import Descanso
 from metas.models import Meta, MetaAlocacao, ProgressoMeta
 from plantao.models import Plantao, Semana, SemanaServidor
 from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
@@ -27,6 +31,7 @@ from programar.status import (
     item_execucao_status_from_fields,
     item_permanece_aberto,
 )
+from programar import views_legacy
 from programar.views_legacy import (
     _fetch_plantonistas_via_orm,
     _relatorio_status_opcao_realizada,
@@ -239,6 +244,7 @@ class ExpedienteAdminReportTest(unittest.TestCase):
 @override_settings(META_EXPEDIENTE_ID=777909)
 class MapaAtividadesProgramarPrintTests(TestCase):
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="tester_mapa_programar", password="123456")
         self.unidade = No.objects.create(nome="ULSAV Mapa Programar", tipo="setor")
@@ -303,6 +309,33 @@ class MapaAtividadesProgramarPrintTests(TestCase):
         self.assertIn("activity-done", html_out)
         self.assertNotIn("Expediente Administrativo</strong>", html_out)
 
+    def test_relatorio_reaproveita_html_ate_alteracao_no_dia(self):
+        params = {"start": "2026-08-01", "end": "2026-08-07", "hide_just": "1"}
+        url = reverse("programar:print_relatorio_semana")
+        primeiro = self.client.get(url, params).content.decode()
+
+        # Escrita direta, sem passar pelas views: o fragmento cacheado continua valido.
+        ProgramacaoItem.objects.filter(programacao=self.programacao, meta=self.meta).update(
+            observacao="Ajuste posterior"
+        )
+        self.assertEqual(self.client.get(url, params).content.decode(), primeiro)
+
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO, datas=[self.programacao.data])
+        self.assertIn("Ajuste posterior", self.client.get(url, params).content.decode())
+
+    def test_fragmento_ignora_alteracao_em_outro_dia(self):
+        params = {"start": "2026-08-01", "end": "2026-08-07"}
+        url = reverse("programar:relatorios_parcial")
+        self.client.get(url, params)
+
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO, datas=[date(2026, 8, 20)])
+        with patch(
+            "programar.views_legacy._build_programacao_semana_html",
+            wraps=views_legacy._build_programacao_semana_html,
+        ) as build:
+            self.client.get(url, params)
+        build.assert_not_called()
+
     def test_calendario_nao_exibe_botao_imprimir_mapa_antes_de_gerar_relatorio(self):
         response = self.client.get(reverse("programar:calendario"))
 
@@ -312,6 +345,7 @@ class MapaAtividadesProgramarPrintTests(TestCase):
 
 class PlantonistasRelatorioTest(TestCase):
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="tester_plantonista_report", password="123456")
         self.unidade = No.objects.create(nome="ULSAV Plantao", tipo="setor")
@@ -962,6 +996,7 @@ class ConcluirItemFormTests(TestCase):
 
 class MetasDisponiveisApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="tester_programar_api", password="123456")
         self.unidade = No.objects.create(nome="ULSAV API", tipo="setor")
@@ -1087,3 +1122,72 @@ class MetasDisponiveisApiTests(TestCase):
         self.assertEqual(response.status_code, 200)
         meta_payload = response.json()["metas"][0]
         self.assertEqual(meta_payload["programadas_total"], 0)
+
+    def test_metas_disponiveis_reutiliza_payload_ate_registrar_progresso(self):
+        alocacao = MetaAlocacao.objects.create(
+            meta=self.meta,
+            unidade=self.unidade,
+            quantidade_alocada=2,
+            atribuida_por=self.user,
+        )
+        url = reverse("programar:metas_disponiveis")
+        params = {"data": timezone.localdate().isoformat()}
+
+        with patch(
+            "programar.views_legacy._build_metas_disponiveis_payload",
+            wraps=views_legacy._build_metas_disponiveis_payload,
+        ) as build_mock:
+            primeira = self.client.get(url, params).json()
+            segunda = self.client.get(url, params).json()
+            self.assertEqual(build_mock.call_count, 1)
+            self.assertEqual(primeira, segunda)
+
+            ProgressoMeta.objects.create(alocacao=alocacao, quantidade=1, registrado_por=self.user)
+            terceira = self.client.get(url, params).json()
+
+        self.assertEqual(build_mock.call_count, 2)
+        self.assertEqual(terceira["metas"][0]["executado_unidade"], 1)
+
+    def test_metas_disponiveis_reutiliza_capacidade_ate_registrar_descanso(self):
+        servidor = Servidor.objects.create(unidade=self.unidade, nome="Capacidade")
+        url = reverse("programar:metas_disponiveis")
+
+        with patch(
+            "programar.views_legacy._build_capacidade_payload",
+            wraps=views_legacy._build_capacidade_payload,
+        ) as build_mock:
+            primeira = self.client.get(url).json()["capacidade"]
+            self.assertEqual(self.client.get(url).json()["capacidade"], primeira)
+            self.assertEqual(build_mock.call_count, 1)
+
+            hoje = timezone.localdate()
+            Descanso.objects.create(servidor=servidor, tipo=Descanso.Tipo.FERIAS, data_inicio=hoje, data_fim=hoje)
+            self.client.get(url)
+
+        self.assertEqual(build_mock.call_count, 2)
+
+    def test_metas_disponiveis_primeiro_mes_por_ano(self):
+        outra = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Meta antiga",
+            descricao="",
+            quantidade_alvo=1,
+            criado_por=self.user,
+            data_limite=date(2024, 3, 20),
+        )
+        Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Meta antiga 2",
+            descricao="",
+            quantidade_alvo=1,
+            criado_por=self.user,
+            data_limite=date(2024, 11, 2),
+        )
+        MetaAlocacao.objects.create(meta=outra, unidade=self.unidade, quantidade_alocada=1, atribuida_por=self.user)
+
+        response = self.client.get(reverse("programar:metas_disponiveis"))
+
+        earliest = response.json()["earliest_month_by_year"]
+        self.assertEqual(earliest["2024"], "2024-03")
+        limite = self.meta.data_limite
+        self.assertEqual(earliest[str(limite.year)], f"{limite.year}-{limite.month:02d}")
@@ -20,7 +20,8 @@ from django.contrib.auth.decorators import login_required
 from core.utils import get_unidade_atual_id
 from core.utils.security import safe_next_url
 from servidores.models import Servidor
-from descanso.models import Descanso, Feriado
+from descanso.models import Descanso
+from descanso.services import calendario_feriados, capacidade, feriados_do_periodo
 from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
 from programar.querysets import item_conta_como_programado_q
 from programar.status import (
@@ -39,15 +40,25 @@ from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseNotAll
 from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
 from metas.models import Meta, MetaAlocacao, ProgressoMeta
-from metas.services import meta_esta_concluida, resumo_execucao_meta
+from metas.services import atualizar_contadores_metas, meta_esta_concluida, resumo_execucao_meta
 from veiculos.models import Veiculo
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from django.db.models.functions import ExtractYear, TruncMonth
 from django.db import transaction
 from relatorios.services.programacao_history_service import (
     record_programacao_day_diff_after_commit,
     snapshot_programacao_dia,
 )
+from core.services.versoes import (
+    ESCOPO_CADASTROS,
+    ESCOPO_DESCANSO,
+    ESCOPO_FERIADOS,
+    ESCOPO_METAS,
+    ESCOPO_PROGRAMACAO,
+    cached_por_versao,
+    escopos_periodo,
+    incrementar_versao_dados,
+)
 
 
 from django.contrib import messages
@@ -448,17 +459,12 @@ def _servidores_status_para_data(
             "motivo": item.get("motivo"),
         })
 
-    feriados = (
-        Feriado.objects.select_related("cadastro")
-        .filter(cadastro__unidade_id=unidade_id, data=data_ref)
-        .order_by("id")
-    )
     feriados_final = [
         {
-            "descricao": f.descricao or "Feriado",
-            "cadastro": f.cadastro.descricao,
+            "descricao": f["descricao"] or "Feriado",
+            "cadastro": f["cadastro"],
         }
-        for f in feriados
+        for f in calendario_feriados(unidade_id, data_ref.year).do_dia(data_ref)
     ]
     plantao_final = _plantonistas_por_data(unidade_id, data_ref)
     plantao_final.sort(key=lambda x: str(x.get("nome") or "").lower())
@@ -878,6 +884,11 @@ def salvar_programacao(request):
             ProgramacaoItemServidor.objects.filter(item_id__in=orfaos).delete()
             ProgramacaoItem.objects.filter(id__in=orfaos).delete()
 
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[dia])
+        atualizar_contadores_metas(
+            {pi.meta_id for pi in existentes.values()}
+            | set(ProgramacaoItem.objects.filter(programacao=prog).values_list("meta_id", flat=True))
+        )
         after_snapshot = snapshot_programacao_dia(unidade_id, dia)
         record_programacao_day_diff_after_commit(
             unidade_id=unidade_id,
@@ -989,24 +1000,11 @@ def _pick_plantao_id(request, ds: date | None, de: date | None) -> int | None:
 
 
 def _pick_plantao_id_by_date(request, d_ref: date | None) -> int | None:
-    if not d_ref:
-        return None
     try:
-        from plantao.models import Plantao  # type: ignore
+        from plantao.services import plantao_id_por_data  # type: ignore
     except Exception:
         return None
-
-    unidade_id = get_unidade_atual_id(request)
-    try:
-        field_names = [f.name for f in Plantao._meta.fields]
-    except Exception:
-        field_names = []
-
-    qs = Plantao.objects.filter(inicio__lte=d_ref, fim__gte=d_ref)
-    if ("unidade" in field_names or "unidade_id" in field_names) and unidade_id:
-        qs = qs.filter(unidade_id=unidade_id)
-    plantao_id = qs.order_by("-inicio", "-id").values_list("id", flat=True).first()
-    return int(plantao_id) if plantao_id else None
+    return plantao_id_por_data(get_unidade_atual_id(request), d_ref)
 
 
 def _plantonista_ref_date_for_range(start: str, end: str) -> date | None:
@@ -1119,71 +1117,45 @@ def _fetch_plantonistas_via_orm(request, start: str, end: str) -> List[Dict[str,
     ref_date = _plantonista_ref_date_for_range(start, end)
 
     try:
-        from plantao.models import SemanaServidor  # type: ignore
+        from plantao.models import PlantaoDia  # type: ignore
         unidade_id = get_unidade_atual_id(request)
         plantao_id = request.GET.get("plantao_id") or request.session.get("plantao_id")
         if not plantao_id:
             plantao_id = _pick_plantao_id_by_date(request, de) or _pick_plantao_id(request, ds, de)
 
-        ss_qs = (
-            SemanaServidor.objects
-            .select_related("servidor", "semana", "semana__plantao")
-            .filter(
-                servidor__ativo=True,
-                semana__inicio__lte=de,
-                semana__fim__gte=ds,
-                semana__plantao__inicio__lte=de,
-                semana__plantao__fim__gte=ds,
-            )
-        )
-        if ref_date:
-            ss_qs = ss_qs.filter(
-                semana__inicio__lte=ref_date,
-                semana__fim__gte=ref_date,
-                semana__plantao__inicio__lte=ref_date,
-                semana__plantao__fim__gte=ref_date,
-            )
+        # Escala materializada por dia (ja recortada ao plantao): cada item da semana
+        # vira um periodo [primeiro dia, ultimo dia] dentro do intervalo.
+        dias_qs = PlantaoDia.objects.filter(servidor__ativo=True, data__range=(ds, de))
         if plantao_id:
-            ss_qs = ss_qs.filter(semana__plantao_id=plantao_id)
+            dias_qs = dias_qs.filter(plantao_id=plantao_id)
         if unidade_id:
-            try:
-                ss_qs = ss_qs.filter(semana__plantao__unidade_id=unidade_id)
-            except Exception:
-                ss_qs = ss_qs.filter(servidor__unidade_id=unidade_id)
-
-        ss_qs = ss_qs.order_by("servidor__nome", "semana__inicio", "ordem", "id")
+            dias_qs = dias_qs.filter(unidade_id=unidade_id)
+        linhas = (
+            dias_qs.values("item_id", "servidor_id", "servidor__nome", "item__telefone_snapshot", "ordem")
+            .annotate(inicio=Min("data"), fim=Max("data"))
+            .order_by("servidor__nome", "inicio", "ordem", "item_id")
+        )
+        if ref_date:
+            linhas = linhas.annotate(no_dia_ref=Count("id", filter=Q(data=ref_date)))
 
         by_server: Dict[Any, Dict[str, Any]] = {}
-        for ss in ss_qs:
-            servidor = getattr(ss, "servidor", None)
-            sid = getattr(servidor, "id", None)
-            nome = (getattr(servidor, "nome", "") or "").strip()
-            tel = (getattr(ss, "telefone_snapshot", "") or "").strip()
-            key: Any = sid if sid is not None else (nome.casefold(), tel)
-
-            item = by_server.get(key)
+        for linha in linhas:
+            # Relatorio semanal: so o plantonista escalado na data de referencia.
+            if not linha.get("no_dia_ref", 1):
+                continue
+            sid = linha["servidor_id"]
+            item = by_server.get(sid)
             if not item:
-                item = {"id": sid, "nome": nome, "telefone": tel, "periodos": []}
-                by_server[key] = item
-
-            sem = getattr(ss, "semana", None)
-            sem_ini = getattr(sem, "inicio", None)
-            sem_fim = getattr(sem, "fim", None)
-            plantao = getattr(sem, "plantao", None)
-            plantao_ini = getattr(plantao, "inicio", None)
-            plantao_fim = getattr(plantao, "fim", None)
-            if sem_ini and sem_fim:
-                ini = sem_ini if sem_ini >= ds else ds
-                fim = sem_fim if sem_fim <= de else de
-                if plantao_ini and ini < plantao_ini:
-                    ini = plantao_ini
-                if plantao_fim and fim > plantao_fim:
-                    fim = plantao_fim
-                if fim < ini:
-                    continue
-                periodo_label = f"{ini:%d/%m/%Y} a {fim:%d/%m/%Y}"
-                if periodo_label not in item["periodos"]:
-                    item["periodos"].append(periodo_label)
+                item = {
+                    "id": sid,
+                    "nome": (linha["servidor__nome"] or "").strip(),
+                    "telefone": (linha["item__telefone_snapshot"] or "").strip(),
+                    "periodos": [],
+                }
+                by_server[sid] = item
+            periodo_label = f"{linha['inicio']:%d/%m/%Y} a {linha['fim']:%d/%m/%Y}"
+            if periodo_label not in item["periodos"]:
+                item["periodos"].append(periodo_label)
 
         out = list(by_server.values())
         out.sort(key=lambda x: str(x.get("nome") or "").lower())
@@ -1403,7 +1375,21 @@ def _weekday_pt_short(idx: int) -> str:
     return ["seg.", "ter.", "qua.", "qui.", "sex.", "sáb.", "dom."][idx % 7]
 
 
-def _render_programacao_semana_html(request, start_iso: str, end_iso: str) -> str:
+def _relatorio_semana_flags(request) -> tuple[bool, bool]:
+    """(only_just, hide_just): filtros de conteudo, que tambem podem ser forcados via atributo do request."""
+    flags = []
+    for nome in ("only_just", "hide_just"):
+        try:
+            ativo = bool(getattr(request, f"_force_{nome}", False)) or (
+                str(request.GET.get(nome, "")).strip().lower() in {"1", "true", "yes", "on", "y"}
+            )
+        except Exception:
+            ativo = bool(getattr(request, f"_force_{nome}", False))
+        flags.append(ativo)
+    return flags[0], flags[1]
+
+
+def _build_programacao_semana_html(request, start_iso: str, end_iso: str) -> str:
     """
     Tabela por dia:
       1) Expediente administrativo (primeiro, sem S/N)
@@ -1471,15 +1457,9 @@ def _render_programacao_semana_html(request, start_iso: str, end_iso: str) -> st
 
     unidade_id = get_unidade_atual_id(request)
     feriados_map = {}
-    if unidade_id:
-        feriados_qs = (
-            Feriado.objects.select_related("cadastro")
-            .filter(cadastro__unidade_id=unidade_id, data__gte=ds, data__lte=de)
-            .order_by("data", "id")
-        )
-        for f in feriados_qs:
-            feriados_map.setdefault(f.data, [])
-            feriados_map[f.data].append(f.descricao or f.cadastro.descricao)
+    for f in feriados_do_periodo(unidade_id, ds, de):
+        feriados_map.setdefault(f["data"], [])
+        feriados_map[f["data"]].append(f["descricao"] or f["cadastro"])
 
     def _srv_list_html(nomes: list[str], *, with_boxes: bool = True, inline: bool = False, checked: bool = False) -> str:
         if not nomes:
@@ -1914,26 +1894,37 @@ def _render_programacao_semana_html(request, start_iso: str, end_iso: str) -> st
         + "</div>"
     )
 
-    # flags para filtrar conteúdo: permitem forçar via atributo do request
-    try:
-        only_just = bool(getattr(request, "_force_only_just", False)) or (
-            str(request.GET.get("only_just", "")).strip().lower() in {"1", "true", "yes", "on", "y"}
-        )
-    except Exception:
-        only_just = bool(getattr(request, "_force_only_just", False))
+    only_just, hide_just = _relatorio_semana_flags(request)
     if only_just:
         return style + bloco_atividades
-    try:
-        hide_just = bool(getattr(request, "_force_hide_just", False)) or (
-            str(request.GET.get("hide_just", "")).strip().lower() in {"1", "true", "yes", "on", "y"}
-        )
-    except Exception:
-        hide_just = bool(getattr(request, "_force_hide_just", False))
     if hide_just:
         return style + bloco_programacao
     return style + bloco_programacao + bloco_atividades
 
 
+def _render_programacao_semana_html(request, start_iso: str, end_iso: str) -> str:
+    """Tabela semanal cacheada por (unidade, periodo, filtros, versao dos dias e cadastros)."""
+    ds = _parse_iso(start_iso)
+    de = _parse_iso(end_iso)
+    unidade_id = get_unidade_atual_id(request)
+    if not ds or not de or not unidade_id:
+        return _build_programacao_semana_html(request, start_iso, end_iso)
+
+    only_just, hide_just = _relatorio_semana_flags(request)
+    return cached_por_versao(
+        "programacao_semana_html",
+        lambda: _build_programacao_semana_html(request, start_iso, end_iso),
+        unidade_id=unidade_id,
+        escopos=[
+            *escopos_periodo(ESCOPO_PROGRAMACAO, ds, de),
+            ESCOPO_DESCANSO,
+            ESCOPO_FERIADOS,
+            ESCOPO_CADASTROS,
+        ],
+        extra={"inicio": ds, "fim": de, "only_just": only_just, "hide_just": hide_just},
+    )
+
+
 
 
 # =============================================================================
@@ -2153,6 +2144,16 @@ def _render_programar_mapa_atividades_html(request, start: str, end: str) -> str
     if dt_end < dt_start:
         dt_end = dt_start
 
+    return cached_por_versao(
+        "programar_mapa_atividades_html",
+        lambda: _build_programar_mapa_atividades_html(unidade_id, dt_start, dt_end),
+        unidade_id=unidade_id,
+        escopos=[*escopos_periodo(ESCOPO_PROGRAMACAO, dt_start, dt_end), ESCOPO_CADASTROS],
+        extra={"inicio": dt_start, "fim": dt_end},
+    )
+
+
+def _build_programar_mapa_atividades_html(unidade_id: int, dt_start: date, dt_end: date) -> str:
     expediente_meta_id = getattr(settings, "META_EXPEDIENTE_ID", None)
     itens_qs = (
         ProgramacaoItem.objects
@@ -2668,15 +2669,58 @@ def metas_disponiveis(request):
     if not unidade_id:
         return JsonResponse({"metas": []})
 
-    atividade_id = request.GET.get("atividade")
+    atividade_id = (request.GET.get("atividade") or "").strip() or None
     meta_status_filter = (request.GET.get("meta_status") or "").strip().lower()
     if meta_status_filter not in {"andamento", "atrasada", "concluida", "encerrada"}:
         meta_status_filter = ""
+    data_ref = _parse_date((request.GET.get("data") or "").strip())
+    today = timezone.localdate()
+    payload = cached_por_versao(
+        "metas_disponiveis",
+        lambda: _build_metas_disponiveis_payload(unidade_id, atividade_id, meta_status_filter, data_ref, today),
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_METAS, ESCOPO_PROGRAMACAO],
+        extra={
+            "atividade": atividade_id,
+            "meta_status": meta_status_filter,
+            "data": data_ref.isoformat() if data_ref else None,
+            "hoje": today.isoformat(),
+        },
+    )
+    # cache proprio: a capacidade depende de descansos, feriados e cadastros, nao das metas
+    inicio_capacidade = max(data_ref or today, today)
+    fim_capacidade = inicio_capacidade.replace(day=monthrange(inicio_capacidade.year, inicio_capacidade.month)[1])
+    capacidade_payload = cached_por_versao(
+        "metas_disponiveis_capacidade",
+        lambda: _build_capacidade_payload(unidade_id, inicio_capacidade, fim_capacidade),
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_DESCANSO, ESCOPO_FERIADOS, ESCOPO_CADASTROS],
+        extra={"inicio": inicio_capacidade.isoformat(), "fim": fim_capacidade.isoformat()},
+    )
+    return JsonResponse({**payload, "capacidade": capacidade_payload})
+
+
+def _build_capacidade_payload(unidade_id: int, inicio: date, fim: date) -> dict[str, Any]:
+    resumo = capacidade([unidade_id], inicio, fim)
+    return {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "dias_uteis": resumo.dias_uteis.get(int(unidade_id), 0),
+        "pessoa_dias": resumo.pessoa_dias,
+        "capacidade_liquida": resumo.capacidade_liquida,
+    }
+
+
+def _build_metas_disponiveis_payload(
+    unidade_id: int,
+    atividade_id: str | None,
+    meta_status_filter: str,
+    data_ref: date | None,
+    today: date,
+) -> dict[str, Any]:
     only_encerradas = meta_status_filter == "encerrada"
     include_all_status = meta_status_filter == ""
     only_nao_encerradas = meta_status_filter in {"andamento", "atrasada", "concluida"}
-    data_ref = _parse_date((request.GET.get("data") or "").strip())
-    today = timezone.localdate()
     reference_month_start = (data_ref or today).replace(day=1)
     metas_com_itens_abertos_ids = (
         _meta_ids_com_itens_abertos(
@@ -2688,8 +2732,8 @@ def metas_disponiveis(request):
     )
     qs = (
         MetaAlocacao.objects
+        .with_saldo(com_meta=True)
         .select_related("meta", "meta__atividade")
-        .annotate(executado_total=Sum("progresso__quantidade"))
         .filter(unidade_id=unidade_id)
         .order_by("meta__data_limite", "meta__titulo")
     )
@@ -2746,12 +2790,12 @@ def metas_disponiveis(request):
                 ),
             }
         bucket[mid]["alocado_unidade"] += int(getattr(al, "quantidade_alocada", 0) or 0)
-        prog_sum = getattr(al, "executado_total", 0) or 0
-        bucket[mid]["executado_unidade"] += int(prog_sum)
+        bucket[mid]["executado_unidade"] += al.realizado
         bucket[mid].setdefault("programadas_total", 0)
 
     metas_sem_alocacao_qs = (
         Meta.objects
+        .with_execucao()
         .select_related("atividade")
         .filter(unidade_criadora_id=unidade_id, alocacoes__isnull=True)
         .order_by("data_limite", "titulo")
@@ -2808,19 +2852,25 @@ def metas_disponiveis(request):
         }
 
     metas_cadastradas_qs = Meta.objects.filter(
-        Q(alocacoes__unidade_id=unidade_id) |
-        Q(unidade_criadora_id=unidade_id, alocacoes__isnull=True)
-    ).distinct()
+        Q(Exists(MetaAlocacao.objects.filter(meta_id=OuterRef("pk"), unidade_id=unidade_id)))
+        | (
+            Q(unidade_criadora_id=unidade_id)
+            & ~Q(Exists(MetaAlocacao.objects.filter(meta_id=OuterRef("pk"))))
+        )
+    )
     if atividade_id:
         metas_cadastradas_qs = metas_cadastradas_qs.filter(atividade_id=atividade_id)
     earliest_month_by_year: Dict[str, str] = {}
-    for row in metas_cadastradas_qs.exclude(data_limite__isnull=True).values_list("data_limite", flat=True):
-        if not row:
-            continue
-        year_key = str(getattr(row, "year", ""))
-        month_key = f"{row.year}-{row.month:02d}"
-        if year_key and (year_key not in earliest_month_by_year or month_key < earliest_month_by_year[year_key]):
-            earliest_month_by_year[year_key] = month_key
+    primeiros_limites = (
+        metas_cadastradas_qs.exclude(data_limite__isnull=True)
+        .order_by()
+        .annotate(ano=ExtractYear("data_limite"))
+        .values("ano")
+        .annotate(primeiro_limite=Min("data_limite"))
+    )
+    for row in primeiros_limites:
+        primeiro_limite = row["primeiro_limite"]
+        earliest_month_by_year[str(row["ano"])] = f"{primeiro_limite.year}-{primeiro_limite.month:02d}"
 
     meta_ids = list(bucket.keys())
     if meta_ids:
@@ -2875,10 +2925,10 @@ def metas_disponiveis(request):
             str(x.get("nome") or "").lower(),
         )
     )
-    return JsonResponse({
+    return {
         "metas": metas,
         "earliest_month_by_year": earliest_month_by_year,
-    })
+    }
 
 
 @require_GET
@@ -3080,7 +3130,10 @@ def excluir_programacao_secure(request):
         )
         if not prog_locked:
             return JsonResponse({"ok": True, "deleted": False})
+        meta_ids = list(ProgramacaoItem.objects.filter(programacao_id=prog_locked.pk).values_list("meta_id", flat=True))
         prog_locked.delete()
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[data_ref])
+        atualizar_contadores_metas(meta_ids)
         after_snapshot = snapshot_programacao_dia(unidade_id, data_ref) if data_ref else None
         if data_ref:
             record_programacao_day_diff_after_commit(
@@ -3144,6 +3197,8 @@ def marcar_item_realizada(request, item_id: int):
             pi.nao_realizada_justificada = False
             pi.concluido_por_id = None
         pi.save(update_fields=["concluido", "concluido_em", "cancelada", "nao_realizada_justificada", "concluido_por_id"])
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[data_ref])
+        atualizar_contadores_metas([pi.meta_id])
         after_snapshot = snapshot_programacao_dia(unidade_id, data_ref) if data_ref else None
         if data_ref:
             record_programacao_day_diff_after_commit(
@@ -3445,6 +3500,8 @@ def concluir_item_form(request, item_id: int):
                     remarcado_de_id=remarcado_de_update_id,
                 )
             )
+            incrementar_versao_dados(unidade_ctx_id, ESCOPO_PROGRAMACAO, datas=[prog.data])
+            atualizar_contadores_metas([pi.meta_id])
             after_snapshot = snapshot_programacao_dia(unidade_ctx_id, prog.data)
             record_programacao_day_diff_after_commit(
                 unidade_id=unidade_ctx_id,
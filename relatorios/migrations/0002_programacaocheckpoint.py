@@ -0,0 +1,35 @@
+# Generated by Django 5.2.12 on 2026-10-18 22:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_no_options'),
+        ('relatorios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramacaoCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_programacao', models.DateField()),
+                ('evento_em', models.DateTimeField()),
+                ('total_eventos', models.PositiveIntegerField(default=0)),
+                ('estado', models.JSONField(blank=True, default=dict)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('historico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='relatorios.programacaohistorico')),
+                ('unidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints_programacao', to='core.no')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint da programacao',
+                'verbose_name_plural': 'Checkpoints da programacao',
+                'ordering': ['-evento_em', '-historico_id'],
+                'indexes': [models.Index(fields=['unidade', 'data_programacao', 'evento_em'], name='relatorios__unidade_35511c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('unidade', 'data_programacao', 'historico'), name='uq_prog_checkpoint_dia_evento')],
+            },
+        ),
+    ]
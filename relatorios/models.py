@@ -72,3 +72,37 @@ class ProgramacaoHistorico(models.Model):
         base = self.titulo_item or f"Item #{self.item_id or '-'}"
         return f"{self.get_evento_display()} - {base}"
 
+
+class ProgramacaoCheckpoint(models.Model):
+    unidade = models.ForeignKey(
+        "core.No",
+        on_delete=models.CASCADE,
+        related_name="checkpoints_programacao",
+    )
+    data_programacao = models.DateField()
+    historico = models.ForeignKey(
+        ProgramacaoHistorico,
+        on_delete=models.CASCADE,
+        related_name="checkpoints",
+    )
+    evento_em = models.DateTimeField()
+    total_eventos = models.PositiveIntegerField(default=0)
+    estado = models.JSONField(default=dict, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-evento_em", "-historico_id"]
+        indexes = [
+            models.Index(fields=["unidade", "data_programacao", "evento_em"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["unidade", "data_programacao", "historico"],
+                name="uq_prog_checkpoint_dia_evento",
+            ),
+        ]
+        verbose_name = "Checkpoint da programacao"
+        verbose_name_plural = "Checkpoints da programacao"
+
+    def __str__(self) -> str:
+        return f"Checkpoint {self.data_programacao} (unidade={self.unidade_id}, eventos={self.total_eventos})"
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from programar.models import Programacao, ProgramacaoItem, ProgramacaoItemServidor
 from programar.status import (
     EXECUTADA,
@@ -17,6 +18,7 @@ from programar.status import (
 )
 
 from relatorios.models import ProgramacaoHistorico
+from .programacao_replay_service import materializar_checkpoint_se_necessario
 
 
 def _snapshot_empty(data_ref: date) -> dict[str, Any]:
@@ -362,6 +364,9 @@ def record_programacao_day_diff(
 
     if historico:
         ProgramacaoHistorico.objects.bulk_create(historico)
+        # O historico e gravado apos o commit da alteracao; renova as secoes ja cacheadas.
+        incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=[data_ref])
+        materializar_checkpoint_se_necessario(unidade_id, data_ref)
 
 
 def record_programacao_day_diff_after_commit(
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from relatorios.models import ProgramacaoCheckpoint, ProgramacaoHistorico
+
+# Quantidade maxima de eventos percorridos entre dois checkpoints do mesmo dia.
+CHECKPOINT_INTERVALO_EVENTOS = 50
+
+
+def _estado_vazio(data_ref: date) -> dict[str, Any]:
+    return {
+        "programacao_id": None,
+        "data": data_ref.isoformat(),
+        "items": {},
+    }
+
+
+def _estado_from_checkpoint(checkpoint: ProgramacaoCheckpoint | None, data_ref: date) -> dict[str, Any]:
+    if checkpoint is None:
+        return _estado_vazio(data_ref)
+    raw = checkpoint.estado or {}
+    items: dict[int, dict[str, Any]] = {}
+    for raw_id, snapshot in (raw.get("items") or {}).items():
+        try:
+            items[int(raw_id)] = dict(snapshot or {})
+        except (TypeError, ValueError):
+            continue
+    return {
+        "programacao_id": raw.get("programacao_id"),
+        "data": raw.get("data") or data_ref.isoformat(),
+        "items": items,
+    }
+
+
+def _estado_to_json(estado: dict[str, Any]) -> dict[str, Any]:
+    # JSONField converte as chaves em texto; mantem isso explicito para o round-trip.
+    return {
+        "programacao_id": estado.get("programacao_id"),
+        "data": estado.get("data"),
+        "items": {str(item_id): snapshot for item_id, snapshot in (estado.get("items") or {}).items()},
+    }
+
+
+def aplicar_evento(estado: dict[str, Any], entry: ProgramacaoHistorico) -> dict[str, Any]:
+    """Aplica um evento do historico sobre o estado do dia (mutando e retornando o estado)."""
+    items = estado.setdefault("items", {})
+    if entry.evento == ProgramacaoHistorico.EVENTO_PROGRAMACAO_EXCLUIDA:
+        items.clear()
+        estado["programacao_id"] = None
+        return estado
+
+    if not entry.item_id:
+        return estado
+    item_id = int(entry.item_id)
+
+    if entry.evento == ProgramacaoHistorico.EVENTO_ATIVIDADE_REMOVIDA:
+        items.pop(item_id, None)
+        return estado
+
+    snapshot = entry.snapshot_depois or {}
+    if snapshot:
+        items[item_id] = dict(snapshot)
+    if entry.programacao_id:
+        estado["programacao_id"] = int(entry.programacao_id)
+    return estado
+
+
+def _checkpoint_base(unidade_id: int, data_ref: date, momento: datetime | None) -> ProgramacaoCheckpoint | None:
+    qs = ProgramacaoCheckpoint.objects.filter(unidade_id=unidade_id, data_programacao=data_ref)
+    if momento is not None:
+        qs = qs.filter(evento_em__lte=momento)
+    return qs.order_by("-evento_em", "-historico_id").first()
+
+
+def _eventos_apos(
+    unidade_id: int,
+    data_ref: date,
+    checkpoint: ProgramacaoCheckpoint | None,
+    momento: datetime | None,
+):
+    qs = ProgramacaoHistorico.objects.filter(unidade_id=unidade_id, data_programacao=data_ref)
+    if checkpoint is not None:
+        qs = qs.filter(
+            Q(criado_em__gt=checkpoint.evento_em)
+            | Q(criado_em=checkpoint.evento_em, id__gt=checkpoint.historico_id)
+        )
+    if momento is not None:
+        qs = qs.filter(criado_em__lte=momento)
+    return qs.order_by("criado_em", "id")
+
+
+def _salvar_checkpoint(
+    *,
+    unidade_id: int,
+    data_ref: date,
+    entry: ProgramacaoHistorico,
+    total_eventos: int,
+    estado: dict[str, Any],
+) -> None:
+    try:
+        with transaction.atomic():
+            ProgramacaoCheckpoint.objects.create(
+                unidade_id=unidade_id,
+                data_programacao=data_ref,
+                historico=entry,
+                evento_em=entry.criado_em,
+                total_eventos=total_eventos,
+                estado=_estado_to_json(estado),
+            )
+    except IntegrityError:
+        # Outro processo materializou o mesmo checkpoint; o conteudo e identico.
+        pass
+
+
+def reconstruir_programacao_dia(
+    unidade_id: int | None,
+    data_ref: date,
+    momento: datetime | None = None,
+    *,
+    materializar: bool = True,
+) -> dict[str, Any]:
+    """
+    Reconstroi o estado da programacao de (unidade, dia) no instante ``momento``
+    a partir do ProgramacaoHistorico, partindo do checkpoint mais recente.
+    Sem ``momento``, devolve o ultimo estado registrado no historico.
+    """
+    if not unidade_id:
+        return _estado_vazio(data_ref)
+    if momento is not None and timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+
+    checkpoint = _checkpoint_base(unidade_id, data_ref, momento)
+    estado = _estado_from_checkpoint(checkpoint, data_ref)
+    total_eventos = int(getattr(checkpoint, "total_eventos", 0) or 0)
+    desde_checkpoint = 0
+
+    for entry in _eventos_apos(unidade_id, data_ref, checkpoint, momento):
+        aplicar_evento(estado, entry)
+        total_eventos += 1
+        desde_checkpoint += 1
+        if materializar and desde_checkpoint >= CHECKPOINT_INTERVALO_EVENTOS:
+            _salvar_checkpoint(
+                unidade_id=unidade_id,
+                data_ref=data_ref,
+                entry=entry,
+                total_eventos=total_eventos,
+                estado=estado,
+            )
+            desde_checkpoint = 0
+
+    return estado
+
+
+def materializar_checkpoint_se_necessario(unidade_id: int | None, data_ref: date) -> bool:
+    """
+    Grava um novo checkpoint quando o dia acumulou CHECKPOINT_INTERVALO_EVENTOS
+    eventos desde o ultimo. Retorna True quando o replay foi materializado.
+    """
+    if not unidade_id:
+        return False
+    checkpoint = _checkpoint_base(unidade_id, data_ref, None)
+    pendentes = _eventos_apos(unidade_id, data_ref, checkpoint, None).count()
+    if pendentes < CHECKPOINT_INTERVALO_EVENTOS:
+        return False
+    reconstruir_programacao_dia(unidade_id, data_ref)
+    return True
+
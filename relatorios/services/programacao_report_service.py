@@ -5,10 +5,13 @@ from datetime import date, datetime, time
 from typing import Any
 
 from django.conf import settings
+from django.db.models import Count, Q
 from django.utils import timezone
 
+from core.services.versoes import ESCOPO_CADASTROS, ESCOPO_PROGRAMACAO, cached_por_versao, escopos_periodo
 from core.utils import get_unidade_atual_id
 from programar.models import ProgramacaoItem
+from programar.querysets import item_execucao_status_q
 from programar.status import (
     CANCELADA,
     ENCERRADA_AUTOMATICAMENTE,
@@ -19,7 +22,6 @@ from programar.status import (
     NAO_REALIZADA_JUSTIFICADA,
     PENDENTE,
     REMARCADA_CONCLUIDA,
-    item_execucao_status_from_fields,
 )
 
 from relatorios.models import ProgramacaoHistorico
@@ -113,7 +115,13 @@ def _current_items_in_period(unidade_id: int, data_inicial: date, data_final: da
     )
 
 
-def _current_programacao_indicator_counts(unidade_id: int, data_inicial: date, data_final: date) -> dict[str, Any]:
+def _current_programacao_indicator_counts(
+    unidade_id: int,
+    data_inicial: date,
+    data_final: date,
+    *,
+    today: date | None = None,
+) -> dict[str, Any]:
     qs = (
         ProgramacaoItem.objects.filter(
             programacao__unidade_id=unidade_id,
@@ -121,44 +129,64 @@ def _current_programacao_indicator_counts(unidade_id: int, data_inicial: date, d
             programacao__data__lte=data_final,
         )
         .exclude(meta_id__isnull=True)
-        .select_related("programacao")
-        .order_by("programacao__data", "id")
     )
     meta_expediente_id = _meta_expediente_id()
     if meta_expediente_id is not None:
         qs = qs.exclude(meta_id=meta_expediente_id)
 
-    counters = {
-        EXECUTADA: 0,
-        REMARCADA_CONCLUIDA: 0,
-        CANCELADA: 0,
-        NAO_REALIZADA: 0,
-        NAO_REALIZADA_JUSTIFICADA: 0,
-        ENCERRADA_AUTOMATICAMENTE: 0,
-        PENDENTE: 0,
-        "atrasada": 0,
-    }
-    today = timezone.localdate()
-    total = 0
-    for item in qs:
-        total += 1
-        status = item_execucao_status_from_fields(
-            bool(getattr(item, "concluido", False)),
-            getattr(item, "concluido_em", None),
-            bool(getattr(item, "cancelada", False)),
-            bool(getattr(item, "nao_realizada_justificada", False)),
-            getattr(item, "remarcado_de_id", None),
-            getattr(item, "observacao", "") or "",
-        )
-        if status in counters:
-            counters[status] += 1
-        programacao_data = getattr(getattr(item, "programacao", None), "data", None)
-        if status == PENDENTE and programacao_data and programacao_data < today:
-            counters["atrasada"] += 1
+    today = today or timezone.localdate()
+    status_q = item_execucao_status_q()
+    # Os aliases levam prefixo porque alguns status coincidem com nomes de campos (ex.: cancelada).
+    aggregates = {f"n_{status}": Count("id", filter=filtro) for status, filtro in status_q.items()}
+    aggregates["n_atrasada"] = Count("id", filter=status_q[PENDENTE] & Q(programacao__data__lt=today))
+    aggregates["n_total"] = Count("id")
+    row = qs.aggregate(**aggregates)
 
+    total = int(row.pop("n_total") or 0)
+    counters = {key.removeprefix("n_"): int(value or 0) for key, value in row.items()}
     return {"total": total, "counters": counters}
 
 
+def _history_indicator_counts(unidade_id: int, data_inicial: date, data_final: date) -> dict[str, int]:
+    history_qs = ProgramacaoHistorico.objects.filter(
+        unidade_id=unidade_id,
+        data_programacao__gte=data_inicial,
+        data_programacao__lte=data_final,
+        criado_em__gte=_dt_start(data_inicial),
+        criado_em__lte=_dt_end(data_final),
+    )
+    row = _filter_history_qs_for_reports(history_qs).aggregate(
+        adicionadas=Count("item_id", distinct=True, filter=Q(evento=ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA)),
+        alteradas=Count(
+            "item_id",
+            distinct=True,
+            filter=~Q(
+                evento__in=[
+                    ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA,
+                    ProgramacaoHistorico.EVENTO_ATIVIDADE_REMOVIDA,
+                    ProgramacaoHistorico.EVENTO_PROGRAMACAO_EXCLUIDA,
+                ]
+            ),
+        ),
+    )
+    return {key: int(value or 0) for key, value in row.items()}
+
+
+def _indicator_counts(unidade_id: int, data_inicial: date, data_final: date) -> dict[str, Any]:
+    """Contagens dos indicadores memoizadas por (unidade, periodo, versao da programacao)."""
+    today = timezone.localdate()
+    return cached_por_versao(
+        "relatorio_indicadores",
+        lambda: {
+            "atual": _current_programacao_indicator_counts(unidade_id, data_inicial, data_final, today=today),
+            "historico": _history_indicator_counts(unidade_id, data_inicial, data_final),
+        },
+        unidade_id=unidade_id,
+        escopos=[ESCOPO_PROGRAMACAO],
+        extra={"inicio": data_inicial, "fim": data_final, "hoje": today},
+    )
+
+
 def _history_items_map(unidade_id: int, data_inicial: date, data_final: date):
     start_dt = _dt_start(data_inicial)
     end_dt = _dt_end(data_final)
@@ -432,37 +460,13 @@ def _build_indicators_section(
     data_final: date,
     desempenho: dict[str, Any],
 ) -> dict[str, Any]:
-    history_qs = ProgramacaoHistorico.objects.filter(
-        unidade_id=unidade_id,
-        data_programacao__gte=data_inicial,
-        data_programacao__lte=data_final,
-        criado_em__gte=_dt_start(data_inicial),
-        criado_em__lte=_dt_end(data_final),
-    )
-    history_qs = _filter_history_qs_for_reports(history_qs)
-    added_ids = set(
-        item_id for item_id in history_qs.filter(evento=ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA).values_list("item_id", flat=True) if item_id
-    )
-    removed_ids = set(
-        item_id for item_id in history_qs.filter(evento=ProgramacaoHistorico.EVENTO_ATIVIDADE_REMOVIDA).values_list("item_id", flat=True) if item_id
-    )
-    changed_ids = set(
-        item_id
-        for item_id in history_qs.exclude(
-            evento__in=[
-                ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA,
-                ProgramacaoHistorico.EVENTO_ATIVIDADE_REMOVIDA,
-                ProgramacaoHistorico.EVENTO_PROGRAMACAO_EXCLUIDA,
-            ]
-        ).values_list("item_id", flat=True)
-        if item_id
-    )
-
-    current_indicators = _current_programacao_indicator_counts(unidade_id, data_inicial, data_final)
+    indicator_counts = _indicator_counts(unidade_id, data_inicial, data_final)
+    current_indicators = indicator_counts["atual"]
+    history_counts = indicator_counts["historico"]
     counters = current_indicators.get("counters", {})
     total_programadas = int(current_indicators.get("total", 0) or 0)
     total_desempenho = desempenho.get("total", 0)
-    total_adicionadas_historico = len(added_ids)
+    total_adicionadas_historico = history_counts["adicionadas"]
     total_removidas_desempenho = int((desempenho.get("counters", {}) or {}).get("removida", 0) or 0)
     total_canceladas_atuais = int(counters.get(CANCELADA, 0) or 0)
     total_canceladas_removidas = total_canceladas_atuais + total_removidas_desempenho
@@ -501,16 +505,27 @@ def _build_indicators_section(
             {"label": "Atividades encerradas automaticamente", "value": counters.get(ENCERRADA_AUTOMATICAMENTE, 0)},
             {"label": "Atividades pendentes", "value": counters.get(PENDENTE, 0)},
             {"label": "Atividades atrasadas", "value": counters.get("atrasada", 0)},
-            {"label": "Atividades alteradas", "value": len(changed_ids)},
-            {"label": "Atividades adicionadas", "value": len(added_ids)},
+            {"label": "Atividades alteradas", "value": history_counts["alteradas"]},
+            {"label": "Atividades adicionadas", "value": history_counts["adicionadas"]},
         ]
     }
 
 
+def _cached_section(nome: str, builder, unidade_id: int | None, data_inicial: date, data_final: date):
+    """Secao memoizada por (unidade, periodo, versao de cada dia da programacao)."""
+    return cached_por_versao(
+        f"relatorio_programacao_{nome}",
+        lambda: builder(unidade_id, data_inicial, data_final),
+        unidade_id=unidade_id,
+        escopos=[*escopos_periodo(ESCOPO_PROGRAMACAO, data_inicial, data_final), ESCOPO_CADASTROS],
+        extra={"inicio": data_inicial, "fim": data_final, "hoje": timezone.localdate()},
+    )
+
+
 def build_programacao_report(*, request, data_inicial: date, data_final: date, include_sections: dict[str, bool]):
     unidade_id = get_unidade_atual_id(request)
-    historico = _build_history_section(unidade_id, data_inicial, data_final) if include_sections.get("historico") else None
-    desempenho = _build_performance_section(unidade_id, data_inicial, data_final) if include_sections.get("desempenho") or include_sections.get("indicadores") else {"rows": [], "counters": {}, "total": 0}
+    historico = _cached_section("historico", _build_history_section, unidade_id, data_inicial, data_final) if include_sections.get("historico") else None
+    desempenho = _cached_section("desempenho", _build_performance_section, unidade_id, data_inicial, data_final) if include_sections.get("desempenho") or include_sections.get("indicadores") else {"rows": [], "counters": {}, "total": 0}
     indicadores = _build_indicators_section(unidade_id, data_inicial, data_final, desempenho) if include_sections.get("indicadores") else None
 
     return {
@@ -1,20 +1,35 @@
 from datetime import date, datetime, timedelta
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
 from atividades.models import Area, Atividade
 from core.models import No
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from metas.models import Meta
 from programar.models import Programacao, ProgramacaoItem
-from programar.status import CANCELADA, ENCERRADA_AUTOMATICAMENTE_MARKER, EXECUTADA, PENDENTE
-from relatorios.models import ProgramacaoHistorico
+from programar.querysets import item_execucao_status_case
+from programar.status import (
+    CANCELADA,
+    ENCERRADA_AUTOMATICAMENTE_MARKER,
+    EXECUTADA,
+    PENDENTE,
+    item_execucao_status_from_fields,
+)
+from relatorios.models import ProgramacaoCheckpoint, ProgramacaoHistorico
+from relatorios.services import programacao_replay_service as replay
+from relatorios.services import programacao_report_service as report_service
+from relatorios.services.programacao_history_service import record_programacao_day_diff
+from relatorios.views import _build_programacoes_encerradas_periodos
 
 
 class RelatorioProgramacaoTests(TestCase):
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="tester_relatorio", password="123456")
         self.unidade = No.objects.create(nome="ULSAV Relatorio", tipo="setor")
@@ -612,6 +627,50 @@ class RelatorioProgramacaoTests(TestCase):
         self.assertEqual(entries[0].item_id, item_campo.id)
         self.assertEqual(entries[0].evento, ProgramacaoHistorico.EVENTO_STATUS_ALTERADO)
 
+    def test_periodos_encerrados_agrupam_todos_os_meses_em_consultas_fixas(self):
+        programacao_abril = Programacao.objects.create(
+            data=date(2026, 4, 7),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        origem = ProgramacaoItem.objects.create(
+            programacao=programacao_abril,
+            meta=self.meta,
+            concluido=False,
+            concluido_em=timezone.now(),
+        )
+        ProgramacaoItem.objects.create(
+            programacao=programacao_abril,
+            meta=self.meta,
+            concluido=True,
+            concluido_em=timezone.now(),
+            remarcado_de=origem,
+        )
+        programacao_maio = Programacao.objects.create(
+            data=date(2026, 5, 5),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        ProgramacaoItem.objects.create(programacao=programacao_maio, meta=self.meta)
+        ProgramacaoItem.objects.create(programacao=programacao_maio, meta=self.meta, cancelada=True)
+
+        request = RequestFactory().get("/")
+        request.user = self.user
+        request.session = {"contexto_atual": self.unidade.id}
+        with self.assertNumQueries(3):
+            periodos = _build_programacoes_encerradas_periodos(request)
+
+        por_mes = {periodo["mes"].strftime("%Y-%m"): periodo for periodo in periodos}
+        self.assertEqual(list(por_mes.keys()), ["2026-05", "2026-04", "2026-03"])
+        self.assertEqual(por_mes["2026-03"]["total_atividades"], 2)
+        self.assertEqual(por_mes["2026-03"]["nao_realizadas"], 2)
+        self.assertEqual(por_mes["2026-04"]["total_atividades"], 1)
+        self.assertEqual(por_mes["2026-04"]["concluidas"], 1)
+        self.assertEqual(por_mes["2026-04"]["nao_realizadas"], 0)
+        self.assertEqual(por_mes["2026-05"]["pendentes"], 1)
+        self.assertEqual(por_mes["2026-05"]["canceladas"], 1)
+        self.assertEqual(por_mes["2026-05"]["percentual_solucionado"], 50.0)
+
     def test_encerrar_programacao_mes_bloqueia_item_pendente(self):
         programacao = Programacao.objects.create(
             data=date(2026, 4, 10),
@@ -812,3 +871,188 @@ class RelatorioProgramacaoTests(TestCase):
         self.assertEqual(periodo["pendentes"], 0)
         self.assertEqual(periodo["encerradas_auto"], 1)
         self.assertEqual(periodo["percentual_solucionado"], 100)
+
+
+class ProgramacaoReplayTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="tester_replay", password="123456")
+        self.unidade = No.objects.create(nome="ULSAV Replay", tipo="setor")
+        self.meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Vistoria de rebanho",
+            descricao="meta de teste",
+            quantidade_alvo=5,
+            criado_por=self.user,
+        )
+        self.data_ref = date(2026, 3, 10)
+
+    def _snapshot(self, item_id, status, **extra):
+        return {
+            "id": item_id,
+            "programacao_id": 1,
+            "programacao_data": self.data_ref.isoformat(),
+            "meta_id": self.meta.id,
+            "meta_titulo": "Vistoria de rebanho",
+            "status_execucao": status,
+            "servidores": [],
+            **extra,
+        }
+
+    def _evento(self, evento, item_id, quando, *, antes=None, depois=None):
+        entry = ProgramacaoHistorico.objects.create(
+            unidade=self.unidade,
+            usuario=self.user,
+            meta=self.meta,
+            data_programacao=self.data_ref,
+            programacao_id=1,
+            item_id=item_id,
+            evento=evento,
+            origem="teste",
+            snapshot_antes=antes or {},
+            snapshot_depois=depois or {},
+        )
+        ProgramacaoHistorico.objects.filter(pk=entry.pk).update(criado_em=quando)
+        return entry
+
+    def _momento(self, hora, minuto=0):
+        return timezone.make_aware(datetime(2026, 3, 10, hora, minuto))
+
+    def test_reconstroi_estado_do_dia_em_instantes_passados(self):
+        pendente = self._snapshot(101, PENDENTE)
+        executada = self._snapshot(101, EXECUTADA)
+        self._evento(ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA, 101, self._momento(7, 30), depois=pendente)
+        self._evento(ProgramacaoHistorico.EVENTO_STATUS_ALTERADO, 101, self._momento(9), antes=pendente, depois=executada)
+        self._evento(ProgramacaoHistorico.EVENTO_ATIVIDADE_REMOVIDA, 101, self._momento(12), antes=executada)
+
+        self.assertEqual(replay.reconstruir_programacao_dia(self.unidade.id, self.data_ref, self._momento(7))["items"], {})
+        estado_8h = replay.reconstruir_programacao_dia(self.unidade.id, self.data_ref, self._momento(8))
+        self.assertEqual(estado_8h["items"][101]["status_execucao"], PENDENTE)
+        estado_10h = replay.reconstruir_programacao_dia(self.unidade.id, self.data_ref, self._momento(10))
+        self.assertEqual(estado_10h["items"][101]["status_execucao"], EXECUTADA)
+        self.assertEqual(replay.reconstruir_programacao_dia(self.unidade.id, self.data_ref)["items"], {})
+
+    def test_replay_materializa_checkpoints_e_limita_eventos_percorridos(self):
+        anterior = self._snapshot(201, PENDENTE)
+        self._evento(ProgramacaoHistorico.EVENTO_ATIVIDADE_CRIADA, 201, self._momento(7), depois=anterior)
+        for minuto in range(1, 8):
+            atual = self._snapshot(201, PENDENTE, observacao=f"ajuste {minuto}")
+            self._evento(
+                ProgramacaoHistorico.EVENTO_OBSERVACAO_ALTERADA,
+                201,
+                self._momento(7, minuto),
+                antes=anterior,
+                depois=atual,
+            )
+            anterior = atual
+
+        with patch.object(replay, "CHECKPOINT_INTERVALO_EVENTOS", 3):
+            self.assertTrue(replay.materializar_checkpoint_se_necessario(self.unidade.id, self.data_ref))
+
+        checkpoints = list(
+            ProgramacaoCheckpoint.objects.filter(unidade=self.unidade, data_programacao=self.data_ref)
+            .order_by("evento_em")
+        )
+        self.assertEqual([cp.total_eventos for cp in checkpoints], [3, 6])
+        self.assertEqual(checkpoints[-1].estado["items"]["201"]["observacao"], "ajuste 5")
+
+        with self.assertNumQueries(2):
+            estado = replay.reconstruir_programacao_dia(self.unidade.id, self.data_ref, materializar=False)
+        self.assertEqual(estado["items"][201]["observacao"], "ajuste 7")
+
+        estado_passado = replay.reconstruir_programacao_dia(
+            self.unidade.id,
+            self.data_ref,
+            self._momento(7, 2),
+            materializar=False,
+        )
+        self.assertEqual(estado_passado["items"][201]["observacao"], "ajuste 2")
+
+    def test_record_diff_materializa_checkpoint_ao_atingir_intervalo(self):
+        antes = {"programacao_id": 1, "items": {}}
+        depois = {
+            "programacao_id": 1,
+            "items": {item_id: self._snapshot(item_id, PENDENTE) for item_id in (301, 302)},
+        }
+        with patch.object(replay, "CHECKPOINT_INTERVALO_EVENTOS", 2):
+            record_programacao_day_diff(
+                unidade_id=self.unidade.id,
+                data_ref=self.data_ref,
+                user=self.user,
+                before_snapshot=antes,
+                after_snapshot=depois,
+            )
+
+        checkpoint = ProgramacaoCheckpoint.objects.get(unidade=self.unidade, data_programacao=self.data_ref)
+        self.assertEqual(checkpoint.total_eventos, 2)
+        self.assertEqual(set(checkpoint.estado["items"].keys()), {"301", "302"})
+
+
+class ProgramacaoIndicadoresTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="tester_indicadores", password="123456")
+        self.unidade = No.objects.create(nome="ULSAV Indicadores", tipo="setor")
+        self.meta = Meta.objects.create(
+            unidade_criadora=self.unidade,
+            titulo="Inspecao de granjas",
+            descricao="meta de teste",
+            quantidade_alvo=10,
+            criado_por=self.user,
+        )
+        self.programacao = Programacao.objects.create(
+            data=date(2026, 3, 10),
+            unidade=self.unidade,
+            criado_por=self.user,
+        )
+        origem = ProgramacaoItem.objects.create(programacao=self.programacao, meta=self.meta, concluido=True)
+        variacoes = [
+            {},
+            {"remarcado_de": origem, "concluido": True},
+            {"cancelada": True},
+            {"nao_realizada_justificada": True, "concluido_em": timezone.now()},
+            {"concluido_em": timezone.now()},
+            {"observacao": f"encerrada {ENCERRADA_AUTOMATICAMENTE_MARKER}"},
+        ]
+        for campos in variacoes:
+            ProgramacaoItem.objects.create(programacao=self.programacao, meta=self.meta, **campos)
+
+    def _counts(self):
+        return report_service._indicator_counts(self.unidade.id, date(2026, 3, 1), date(2026, 3, 31))
+
+    def test_contagens_sql_coincidem_com_status_por_item(self):
+        esperado = {}
+        itens = ProgramacaoItem.objects.filter(programacao=self.programacao).annotate(
+            status_sql=item_execucao_status_case()
+        )
+        for item in itens:
+            status = item_execucao_status_from_fields(
+                item.concluido,
+                item.concluido_em,
+                item.cancelada,
+                item.nao_realizada_justificada,
+                item.remarcado_de_id,
+                item.observacao,
+            )
+            self.assertEqual(item.status_sql, status)
+            esperado[status] = esperado.get(status, 0) + 1
+
+        with patch.object(report_service.timezone, "localdate", return_value=date(2026, 4, 1)):
+            atual = self._counts()["atual"]
+
+        self.assertEqual(atual["total"], 7)
+        counters = atual.pop("counters")
+        atrasadas = counters.pop("atrasada")
+        self.assertEqual({k: v for k, v in counters.items() if v}, esperado)
+        self.assertEqual(atrasadas, esperado[PENDENTE])
+
+    def test_indicadores_memoizados_ate_incremento_da_versao(self):
+        self.assertEqual(self._counts()["atual"]["total"], 7)
+        ProgramacaoItem.objects.create(programacao=self.programacao, meta=self.meta)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self._counts()["atual"]["total"], 7)
+
+        incrementar_versao_dados(self.unidade.id, ESCOPO_PROGRAMACAO, datas=[self.programacao.data])
+        self.assertEqual(self._counts()["atual"]["total"], 8)
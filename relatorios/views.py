@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
+from typing import Any
 
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
@@ -12,9 +13,11 @@ from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_GET, require_POST
 
+from core.services.versoes import ESCOPO_PROGRAMACAO, incrementar_versao_dados
 from core.utils import get_unidade_atual_id
 from programar.models import Programacao
 from programar.models import ProgramacaoItem
+from programar.querysets import item_origem_remarcada_concluida_q
 from programar.status import ENCERRADA_AUTOMATICAMENTE_MARKER
 
 from .services.programacao_report_service import build_programacao_report
@@ -35,44 +38,29 @@ def _meta_expediente_id() -> int | None:
         return None
 
 
-def _build_programacoes_encerradas_periodos(request):
-    unidade_id = get_unidade_atual_id(request)
-    if not unidade_id:
-        return []
+_ITEM_COUNT_KEYS = (
+    "total_atividades",
+    "concluidas",
+    "justificadas",
+    "canceladas",
+    "nao_realizadas",
+    "encerradas_auto",
+    "encerradas_auto_abertas",
+    "pendentes",
+)
 
-    today = timezone.localdate()
+
+def _item_counts_por_mes(unidade_id: int) -> dict[Any, dict[str, int]]:
+    """Contagens de itens de todos os meses da unidade em uma unica consulta agrupada."""
+    itens_qs = ProgramacaoItem.objects.filter(programacao__unidade_id=unidade_id)
+    meta_expediente_id = _meta_expediente_id()
+    if meta_expediente_id is not None:
+        itens_qs = itens_qs.exclude(meta_id=meta_expediente_id)
+    itens_qs = itens_qs.exclude(item_origem_remarcada_concluida_q())
     rows = (
-        Programacao.objects.filter(unidade_id=unidade_id)
-        .annotate(mes=TruncMonth("data"))
+        itens_qs.annotate(mes=TruncMonth("programacao__data"))
         .values("mes")
         .annotate(
-            data_inicial=Min("data"),
-            data_final=Max("data"),
-            dias_programados=Count("data", distinct=True),
-            total_programacoes=Count("id"),
-            total_encerradas=Count("id", filter=Q(concluida=True)),
-        )
-        .order_by("-mes")
-    )
-    periodos = []
-    for row in rows:
-        mes = row.get("mes")
-        row["is_mes_atual"] = bool(mes and mes.year == today.year and mes.month == today.month)
-        total_programacoes = int(row.get("total_programacoes") or 0)
-        total_encerradas = int(row.get("total_encerradas") or 0)
-        row["is_encerrado"] = total_programacoes > 0 and total_encerradas >= total_programacoes
-        itens_qs = ProgramacaoItem.objects.filter(
-            programacao__unidade_id=unidade_id,
-            programacao__data__gte=row.get("data_inicial"),
-            programacao__data__lte=row.get("data_final"),
-        )
-        meta_expediente_id = _meta_expediente_id()
-        if meta_expediente_id is not None:
-            itens_qs = itens_qs.exclude(meta_id=meta_expediente_id)
-        origens_remarcadas_concluidas = _origens_remarcadas_concluidas_ids(itens_qs.values_list("id", flat=True))
-        if origens_remarcadas_concluidas:
-            itens_qs = itens_qs.exclude(id__in=origens_remarcadas_concluidas)
-        item_counts = itens_qs.aggregate(
             total_atividades=Count("id"),
             concluidas=Count("id", filter=Q(concluido=True)),
             justificadas=Count("id", filter=Q(nao_realizada_justificada=True)),
@@ -99,7 +87,43 @@ def _build_programacoes_encerradas_periodos(request):
                 ),
             ),
         )
-        row.update({key: int(value or 0) for key, value in item_counts.items()})
+        .order_by()
+    )
+    return {
+        row["mes"]: {key: int(row.get(key) or 0) for key in _ITEM_COUNT_KEYS}
+        for row in rows
+    }
+
+
+def _build_programacoes_encerradas_periodos(request):
+    unidade_id = get_unidade_atual_id(request)
+    if not unidade_id:
+        return []
+
+    today = timezone.localdate()
+    rows = (
+        Programacao.objects.filter(unidade_id=unidade_id)
+        .annotate(mes=TruncMonth("data"))
+        .values("mes")
+        .annotate(
+            data_inicial=Min("data"),
+            data_final=Max("data"),
+            dias_programados=Count("data", distinct=True),
+            total_programacoes=Count("id"),
+            total_encerradas=Count("id", filter=Q(concluida=True)),
+        )
+        .order_by("-mes")
+    )
+    item_counts_por_mes = _item_counts_por_mes(unidade_id)
+    item_counts_vazios = {key: 0 for key in _ITEM_COUNT_KEYS}
+    periodos = []
+    for row in rows:
+        mes = row.get("mes")
+        row["is_mes_atual"] = bool(mes and mes.year == today.year and mes.month == today.month)
+        total_programacoes = int(row.get("total_programacoes") or 0)
+        total_encerradas = int(row.get("total_encerradas") or 0)
+        row["is_encerrado"] = total_programacoes > 0 and total_encerradas >= total_programacoes
+        row.update(item_counts_por_mes.get(mes, item_counts_vazios))
         solucionadas = (
             row["concluidas"]
             + row["justificadas"]
@@ -133,21 +157,6 @@ def _itens_abertos_bloqueantes_q() -> Q:
     return Q(concluido=False, cancelada=False, nao_realizada_justificada=False)
 
 
-def _origens_remarcadas_concluidas_ids(item_ids) -> set[int]:
-    ids = [int(item_id) for item_id in item_ids if item_id]
-    if not ids:
-        return set()
-    return {
-        int(item_id)
-        for item_id in ProgramacaoItem.objects.filter(
-            remarcado_de_id__in=ids,
-            concluido=True,
-            cancelada=False,
-        ).values_list("remarcado_de_id", flat=True)
-        if item_id
-    }
-
-
 def pode_reabrir_programacao_mes(user) -> bool:
     if not getattr(user, "is_authenticated", False):
         return False
@@ -246,21 +255,21 @@ def encerrar_programacao_mes(request):
     now = timezone.now()
     meta_expediente_id = _meta_expediente_id()
     if meta_expediente_id is not None:
-        ProgramacaoItem.objects.filter(programacao__in=qs, meta_id=meta_expediente_id).update(
+        expediente_atualizados = ProgramacaoItem.objects.filter(programacao__in=qs, meta_id=meta_expediente_id).update(
             concluido=True,
             concluido_em=now,
             concluido_por=request.user,
             cancelada=False,
             nao_realizada_justificada=False,
         )
+        if expediente_atualizados:
+            incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=qs.values_list("data", flat=True))
 
     itens_abertos = ProgramacaoItem.objects.filter(programacao__in=qs).filter(_itens_abertos_bloqueantes_q())
     if meta_expediente_id is not None:
         itens_abertos = itens_abertos.exclude(meta_id=meta_expediente_id)
     itens_abertos = itens_abertos.exclude(observacao__contains=ENCERRADA_AUTOMATICAMENTE_MARKER)
-    origens_remarcadas_concluidas = _origens_remarcadas_concluidas_ids(itens_abertos.values_list("id", flat=True))
-    if origens_remarcadas_concluidas:
-        itens_abertos = itens_abertos.exclude(id__in=origens_remarcadas_concluidas)
+    itens_abertos = itens_abertos.exclude(item_origem_remarcada_concluida_q())
     bloqueios = itens_abertos.aggregate(
         pendentes=Count("id", filter=Q(concluido_em__isnull=True)),
         nao_realizadas=Count("id", filter=Q(concluido_em__isnull=False)),
@@ -293,6 +302,7 @@ def encerrar_programacao_mes(request):
         concluida_em=now,
         concluida_por=request.user,
     )
+    incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=qs.values_list("data", flat=True))
     return JsonResponse({
         "ok": True,
         "mes": mes_raw,
@@ -332,6 +342,7 @@ def reabrir_programacao_mes(request):
         concluida_em=None,
         concluida_por=None,
     )
+    incrementar_versao_dados(unidade_id, ESCOPO_PROGRAMACAO, datas=qs.values_list("data", flat=True))
     return JsonResponse({
         "ok": True,
         "mes": mes_raw,